@@ -0,0 +1,112 @@
+"""Load benchmark for /api/analyze against a local fake LLM server.
+
+Compares the legacy blocking OpenAI call (sync client + time.sleep backoff on the
+event loop) with the asyncio analysis path, both served by a single event loop.
+Every request sends a different resume from a different email and the analysis cache
+is disabled, so neither mode is answered by the cache, request coalescing or the
+duplicate-submission window:
+
+    python -m benchmarks.bench_analyze --requests 64 --concurrency 32 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.common import FakeLLMServer, configure_openai_env, percentiles, write_report
+from benchmarks.corpus import generate_corpus
+
+
+def _legacy_analyze_factory(server_module):
+    """The pre-asyncio implementation: a synchronous client call inside the request coroutine."""
+    from openai import OpenAI
+
+    client = OpenAI(max_retries=0)
+
+    async def legacy_openai_analyze(text):
+        for attempt in range(3):
+            try:
+                resp = client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[{"role": "user", "content": f"Analyze this resume:\n\n{text[:12000]}"}],
+                    temperature=0.2,
+                    response_format={"type": "json_object"},
+                )
+                data = json.loads(resp.choices[0].message.content or "{}")
+                return {
+                    "score": int(data.get("score", 60)),
+                    "summary": data.get("summary", ""),
+                    "suggested_tier": data.get("suggested_tier", "MID"),
+                    "bullet_recommendations": data.get("bullet_recommendations") or [],
+                    "gap_analysis": data.get("gap_analysis") or [],
+                }
+            except Exception:
+                time.sleep(0.7 * (attempt + 1))
+        prescore = server_module.prescore_resume(server_module.clean_resume_text(text))
+        return server_module._fallback_analysis(prescore, note=server_module.LLM_UNAVAILABLE_NOTE)
+
+    return legacy_openai_analyze
+
+
+async def _drive(app, resumes, mode: str, concurrency: int):
+    import httpx
+
+    limiter = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=600) as client:
+
+        async def one(i: int):
+            nonlocal errors
+            async with limiter:
+                started = time.perf_counter()
+                resp = await client.post(
+                    "/api/analyze",
+                    files={"file": (f"resume-{i}.txt", resumes[i].encode(), "text/plain")},
+                    data={"name": "Jordan Avery", "email": f"{mode}-{i}@example.com"},
+                )
+                latencies.append(time.perf_counter() - started)
+                if resp.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(len(resumes))))
+        elapsed = time.perf_counter() - started
+
+    return {"elapsed_s": elapsed, "rps": len(resumes) / elapsed, "errors": errors, "latency_s": percentiles(latencies)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM response latency in seconds")
+    args = parser.parse_args()
+
+    # Every request comes from one address; the per-client limits would cut the run short.
+    os.environ.setdefault("RATE_LIMITS_ENABLED", "false")
+    # Each mode gets its own documents, so the second run cannot reuse anything from the first.
+    corpus = [text for text, _ in generate_corpus(2 * args.requests)]
+    with FakeLLMServer(latency=args.latency) as llm:
+        configure_openai_env(llm.base_url)
+        import server
+
+        # Measure the LLM path itself, not cache hits.
+        server.analysis_cache = server.AnalysisCache(0, server.ANALYSIS_CACHE_TTL_SECONDS)
+        async_analyze = server._openai_analyze
+        results = {}
+        modes = (("blocking", _legacy_analyze_factory(server)), ("async", async_analyze))
+        for offset, (mode, impl) in enumerate(modes):
+            server._openai_analyze = impl
+            resumes = corpus[offset * args.requests:(offset + 1) * args.requests]
+            results[mode] = asyncio.run(_drive(server.app, resumes, mode, args.concurrency))
+        server._openai_analyze = async_analyze
+
+    results["speedup"] = results["async"]["rps"] / results["blocking"]["rps"]
+    write_report("analyze_load", {"config": vars(args), "results": results})
+
+
+if __name__ == "__main__":
+    main()
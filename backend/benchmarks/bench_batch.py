@@ -0,0 +1,147 @@
+"""Batch analysis benchmark against a local fake LLM server.
+
+Scores the same generated resumes two ways, in-process over ASGI:
+one /api/analyze request per file (the pre-batch workflow), and a single
+/api/analyze/batch request carrying them all as a zip.
+
+    python -m benchmarks.bench_batch --files 100 --latency 0.5 --concurrency 1
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import zipfile
+
+from benchmarks.common import FakeLLMServer, configure_openai_env, percentiles, write_report
+from benchmarks.corpus import generate_corpus
+
+CONTACT = {"name": "Bench Recruiter", "email": "bench@example.com"}
+
+
+def _openai_counters(server_module):
+    completions = prompt_tokens = 0.0
+    for line in server_module.metrics.render().splitlines():
+        if line.startswith("resumeshortlist_openai_attempts_total{") and 'outcome="ok"' in line:
+            completions += float(line.rsplit(" ", 1)[1])
+        elif line.startswith('resumeshortlist_openai_tokens_total{kind="prompt"}'):
+            prompt_tokens += float(line.rsplit(" ", 1)[1])
+    return completions, prompt_tokens
+
+
+async def _per_file(client, documents, concurrency):
+    limiter = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index, text):
+        async with limiter:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/analyze", files={"file": (f"resume-{index}.txt", text.encode(), "text/plain")}, data=CONTACT
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(index, text) for index, text in enumerate(documents)))
+    return latencies
+
+
+async def _batch(client, documents):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for index, text in enumerate(documents):
+            bundle.writestr(f"resumes/resume-{index}.txt", text)
+
+    started = time.perf_counter()
+    first_result = None
+    result_times = []
+    async with client.stream(
+        "POST", "/api/analyze/batch", files={"files": ("resumes.zip", archive.getvalue(), "application/zip")}, data=CONTACT
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if '"status"' in line:
+                elapsed = time.perf_counter() - started
+                first_result = first_result if first_result is not None else elapsed
+                result_times.append(elapsed)
+                assert json.loads(line)["status"] == "ok", line
+    return first_result, result_times
+
+
+async def _run(args, server_module):
+    import httpx
+
+    transport = httpx.ASGITransport(app=server_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        corpus = generate_corpus(2 * args.files, args.seed)
+        legacy_docs = [text for text, _ in corpus[: args.files]]
+        batch_docs = [text for text, _ in corpus[args.files:]]
+
+        completions_before, tokens_before = _openai_counters(server_module)
+        started = time.perf_counter()
+        latencies = await _per_file(client, legacy_docs, args.concurrency)
+        legacy_seconds = time.perf_counter() - started
+        completions_mid, tokens_mid = _openai_counters(server_module)
+
+        started = time.perf_counter()
+        first_result, result_times = await _batch(client, batch_docs)
+        batch_seconds = time.perf_counter() - started
+        completions_after, tokens_after = _openai_counters(server_module)
+
+    return {
+        "per_file": {
+            "wall_seconds": legacy_seconds,
+            "files_per_second": args.files / legacy_seconds,
+            "request_latency": percentiles(latencies),
+            "llm_completions": completions_mid - completions_before,
+            "prompt_tokens": tokens_mid - tokens_before,
+        },
+        "batch": {
+            "wall_seconds": batch_seconds,
+            "files_per_second": args.files / batch_seconds,
+            "first_result_seconds": first_result,
+            "result_arrival": percentiles(result_times),
+            "llm_completions": completions_after - completions_mid,
+            "prompt_tokens": tokens_after - tokens_mid,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM latency per completion (s)")
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel /api/analyze requests for the per-file run")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    # Every request comes from one address and one email; the per-client limits would cut the run short.
+    os.environ.setdefault("RATE_LIMITS_ENABLED", "false")
+    with FakeLLMServer(latency=args.latency) as fake_llm:
+        configure_openai_env(fake_llm.base_url)
+        import server
+
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+
+            server.db = AsyncMongoMockClient()["bench"]
+        except ImportError:
+            server.db = None
+        results = asyncio.run(_run(args, server))
+
+    write_report(
+        "batch_analyze",
+        {
+            "files": args.files,
+            "llm_latency_seconds": args.latency,
+            "per_file_concurrency": args.concurrency,
+            "pack_max_resumes": server.BATCH_PACK_MAX_RESUMES,
+            "speedup": results["per_file"]["wall_seconds"] / results["batch"]["wall_seconds"],
+            **results,
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
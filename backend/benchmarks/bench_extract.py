@@ -0,0 +1,192 @@
+"""Micro-benchmarks for the CPU-bound helpers: PDF/DOCX text extraction and order serialization.
+
+Extraction runs in-process (no pool) over PDF and DOCX renderings of the generated corpus, or over
+the .pdf/.docx files in a directory; _serialize_order runs over synthetic order documents. Long
+multi-page PDFs are read both serially and through the page-parallel pool path (extract_document_text),
+and image-only "scanned" PDFs through the OCR lane (rendering them needs Pillow; OCR needs pytesseract
+and the tesseract binary, otherwise only the cost of finding the blank pages is measured):
+
+    python -m benchmarks.bench_extract --documents 50 --orders 20000
+    python -m benchmarks.bench_extract --corpus ~/resumes --tag real
+    python -m benchmarks.bench_extract --long-pages 40 --scanned 5
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from benchmarks.common import percentiles, write_report
+from benchmarks.corpus import generate_corpus, render_docx, render_pdf, render_scanned_pdf
+
+ORDER_STATUSES = ("analysis_complete", "checkout_started", "paid", "revised", "delivered")
+
+
+def _fixtures(args):
+    if args.corpus:
+        files = sorted(Path(args.corpus).rglob("*"))
+        pdfs = [path.read_bytes() for path in files if path.suffix.lower() == ".pdf"]
+        docxs = [path.read_bytes() for path in files if path.suffix.lower() == ".docx"]
+        return pdfs, docxs
+    texts = [text for text, _ in generate_corpus(args.documents, args.seed)]
+    return [render_pdf(text) for text in texts], [render_docx(text) for text in texts]
+
+
+def _bench_extractor(extract, documents, repeat):
+    samples, pages = [], 0
+    for _ in range(repeat):
+        for document in documents:
+            started = time.perf_counter()
+            text = extract(document)
+            samples.append(time.perf_counter() - started)
+            pages += text.count("\f") + 1
+    total = sum(samples)
+    return {
+        "documents": len(documents),
+        "mean_bytes": sum(len(document) for document in documents) / max(1, len(documents)),
+        "calls": len(samples),
+        "docs_per_second": len(samples) / total if total else 0.0,
+        "seconds_per_doc": percentiles(samples),
+        "pages_seen": pages,
+    }
+
+
+def _long_documents(args) -> list:
+    """Generated resumes concatenated page by page until each document has --long-pages pages."""
+    pages = [page for text, _ in generate_corpus(args.long_documents * args.long_pages, args.seed) for page in text.split("\f")]
+    return [
+        render_pdf("\f".join(pages[start:start + args.long_pages]))
+        for start in range(0, args.long_documents * args.long_pages, args.long_pages)
+    ]
+
+
+def _bench_pool_extractor(server, documents, repeat):
+    """extract_document_text("pdf") end to end: page runs fanned out over the pool, early exit and OCR lane."""
+
+    async def run():
+        await server.extract_document_text("pdf", documents[0])  # spawn the pool workers outside the timing
+        samples, pages, chars = [], 0, 0
+        for _ in range(repeat):
+            for document in documents:
+                started = time.perf_counter()
+                text = await server.extract_document_text("pdf", document)
+                samples.append(time.perf_counter() - started)
+                pages += text.count("\f") + 1
+                chars += len(text.strip())
+        return samples, pages, chars
+
+    samples, pages, chars = asyncio.run(run())
+    total = sum(samples)
+    return {
+        "documents": len(documents),
+        "calls": len(samples),
+        "docs_per_second": len(samples) / total if total else 0.0,
+        "seconds_per_doc": percentiles(samples),
+        "pages_seen": pages,
+        "chars_per_doc": chars / max(1, len(samples)),
+    }
+
+
+def _scanned_documents(args):
+    try:
+        return [render_scanned_pdf(text) for text, _ in generate_corpus(args.scanned, args.seed + 1)]
+    except ImportError:
+        return None
+
+
+def _synthetic_order(rng: random.Random, now: datetime):
+    upload_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    status = rng.choice(ORDER_STATUSES)
+    paid = status in ("paid", "revised", "delivered")
+    return {
+        "_id": upload_id,
+        "upload_id": upload_id,
+        "status": status,
+        "tier": rng.choice(("ENTRY", "MID", "SENIOR", "EXEC", "CSUITE")),
+        "score": rng.randint(30, 90),
+        "created_at": now - timedelta(minutes=rng.randint(0, 100000)),
+        "original_filename": f"resume-{rng.randint(1, 9999)}.pdf",
+        "revised_filename": "resume-revised.docx" if status in ("revised", "delivered") else None,
+        "original_r2_key": f"uploads/{upload_id}/original.pdf",
+        "revised_r2_key": f"uploads/{upload_id}/revised.docx" if status in ("revised", "delivered") else None,
+        "customer": {"name": "Bench Customer", "email": "bench@example.com", "phone": "555-0100"},
+        "payment": {"session_id": f"cs_test_{upload_id}", "status": "paid", "paid_at": now} if paid else {},
+        "delivery": {"status": "sent", "attempts": 1, "sent_at": now} if status == "delivered" else {},
+        "storage": {"status": "stored", "key": f"uploads/{upload_id}/original.pdf"},
+        "analysis": {
+            "score": 61,
+            "summary": "Solid operator with thin metrics. Tighten targeting.",
+            "suggested_tier": "MID",
+            "bullet_recommendations": ["Quantify outcomes."] * 4,
+            "gap_analysis": [{"category": "Impact", "finding": "Few metrics."}] * 3,
+        },
+    }
+
+
+def _bench_serialize(serialize, orders, batch):
+    # One call takes microseconds, so time batches and report the per-call cost of each batch.
+    samples = []
+    for start in range(0, len(orders), batch):
+        chunk = orders[start:start + batch]
+        started = time.perf_counter()
+        for order in chunk:
+            serialize(order)
+        samples.append((time.perf_counter() - started) / len(chunk))
+    total = sum(sample * batch for sample in samples)
+    return {
+        "orders": len(orders),
+        "batch": batch,
+        "calls_per_second": len(orders) / total if total else 0.0,
+        "seconds_per_call": percentiles(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=50, help="generated resumes per format")
+    parser.add_argument("--corpus", type=Path, help="directory of .pdf/.docx files to use instead")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--long-documents", type=int, default=10)
+    parser.add_argument("--long-pages", type=int, default=40, help="pages per long PDF")
+    parser.add_argument("--scanned", type=int, default=5, help="image-only PDFs for the OCR lane (needs Pillow)")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=500, help="orders per timed serialization batch")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tag", default="", help="suffix for the report name, to keep runs side by side")
+    args = parser.parse_args()
+
+    import server
+
+    pdfs, docxs = _fixtures(args)
+    long_pdfs = _long_documents(args)
+    scanned = _scanned_documents(args)
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    orders = [_synthetic_order(rng, now) for _ in range(args.orders)]
+
+    write_report(
+        f"micro{'-' + args.tag if args.tag else ''}",
+        {
+            "config": {
+                **{key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+                "extract_workers": server.EXTRACT_WORKERS,
+                "pages_per_task": server.EXTRACT_PDF_PAGES_PER_TASK,
+            },
+            "extract_text_from_pdf": _bench_extractor(server.extract_text_from_pdf, pdfs, args.repeat),
+            "extract_text_from_docx": _bench_extractor(server.extract_text_from_docx, docxs, args.repeat),
+            "multi_page_pdf_serial": _bench_extractor(server.extract_text_from_pdf, long_pdfs, args.repeat),
+            "multi_page_pdf_parallel": _bench_pool_extractor(server, long_pdfs, args.repeat),
+            "scanned_pdf": (
+                {"ocr_enabled": server.OCR_ENABLED, **_bench_pool_extractor(server, scanned, 1)}
+                if scanned
+                else {"skipped": "Pillow is not installed"}
+            ),
+            "serialize_order": _bench_serialize(server._serialize_order, orders, args.batch),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""End-to-end load harness for the API, fully offline.
+
+The app runs under uvicorn on a background thread with local stand-ins: a fake OpenAI server, a fake
+Stripe API, moto for R2 and mongomock for Mongo. An httpx async driver then runs each scenario at a
+fixed concurrency and records latency percentiles, throughput and status codes:
+
+    python -m benchmarks.bench_load --requests 200 --concurrency 32
+    python -m benchmarks.bench_load --scenarios analyze,admin_orders --tag before
+    python -m benchmarks.compare results/load-before.json results/load-after.json
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+from benchmarks.common import (
+    FakeLLMServer,
+    FakeStripeServer,
+    MotoS3Server,
+    ServerThread,
+    configure_openai_env,
+    configure_stripe_env,
+    percentiles,
+    write_report,
+)
+from benchmarks.corpus import generate_corpus, render_pdf
+
+SCENARIOS = ("analyze", "analyze_duplicates", "checkout", "verify_session", "admin_orders")
+CONTACT = {"name": "Load Tester", "email": "load@example.com"}
+
+
+async def _run_scenario(client, requests: int, concurrency: int, make_request):
+    limiter = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], Counter()
+
+    async def one(index: int):
+        async with limiter:
+            started = time.perf_counter()
+            try:
+                response = await make_request(index)
+                statuses[str(response.status_code)] += 1
+                return response
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+    report = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": requests / elapsed,
+        "latency_seconds": percentiles(latencies),
+        "status_codes": dict(statuses),
+    }
+    return report, [response for response in responses if response is not None]
+
+
+async def _drive(base_url: str, args):
+    import httpx
+
+    pdfs = [render_pdf(text) for text, _ in generate_corpus(args.requests, args.seed)]
+    upload_ids = []
+    reports = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        scenarios = {
+            "analyze": lambda i: client.post(
+                "/api/analyze", files={"file": (f"resume-{i}.pdf", pdfs[i % len(pdfs)], "application/pdf")}, data=CONTACT
+            ),
+            # Double clicks and retries: a few distinct files from one email, submitted over and over.
+            "analyze_duplicates": lambda i: client.post(
+                "/api/analyze",
+                files={"file": (f"resume-{i % args.duplicate_files}.pdf", pdfs[-1 - i % args.duplicate_files], "application/pdf")},
+                data={**CONTACT, "email": "retry@example.com"},
+            ),
+            "checkout": lambda i: client.post(
+                "/api/checkout",
+                json={"price_key": "MID", "upload_id": upload_ids[i % len(upload_ids)] if upload_ids else None, **CONTACT},
+            ),
+            # A fixed pool of session IDs: the first sight of each goes to Stripe, repeats hit the cache.
+            "verify_session": lambda i: client.post(
+                "/api/verify-session", data={"session_id": f"cs_test_load_{i % args.verify_sessions}"}
+            ),
+            "admin_orders": lambda i: client.get("/api/admin/orders", params={"limit": 50}),
+        }
+        for name in args.scenarios:
+            report, responses = await _run_scenario(client, args.requests, args.concurrency, scenarios[name])
+            if name == "analyze":
+                upload_ids = [response.json()["upload_id"] for response in responses if response.status_code == 200]
+            reports[name] = report
+            print(f"{name}: {report['throughput_rps']:.1f} rps, p95 {report['latency_seconds']['p95'] * 1000:.0f} ms")
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--stripe-latency", type=float, default=0.15)
+    parser.add_argument("--verify-sessions", type=int, default=50)
+    parser.add_argument("--duplicate-files", type=int, default=5, help="distinct files behind analyze_duplicates")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--tag", default="", help="suffix for the report name, to keep runs side by side")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    from mongomock_motor import AsyncMongoMockClient
+
+    # Every request comes from one address and one email; the per-client limits would cut the run short.
+    os.environ.setdefault("RATE_LIMITS_ENABLED", "false")
+    with FakeLLMServer(latency=args.llm_latency) as llm, FakeStripeServer(latency=args.stripe_latency) as fake_stripe, MotoS3Server():
+        configure_openai_env(llm.base_url)
+        configure_stripe_env(fake_stripe.url)
+        # Configuration is read at import, so the server module is imported only once the stand-ins are up.
+        import server
+
+        server.db = AsyncMongoMockClient()["bench"]
+        with ServerThread(server.app) as app_server:
+            reports = asyncio.run(_drive(app_server.url, args))
+
+    write_report(
+        f"load{'-' + args.tag if args.tag else ''}",
+        {
+            "config": {key: value for key, value in vars(args).items() if key != "tag"},
+            "scenarios": reports,
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Size and cost of stored analyses and analysis responses.
+
+Analyses are built locally (the pre-score fallback path, so no LLM is needed) for the generated corpus.
+For each one the report compares:
+- the stored `analysis` sub-document as BSON, full dict (pre-v2) against the compact v2 form
+- the /api/analyze JSON body: the old shape, which repeated `bullet_recommendations` as `bullets`,
+  the current one, a `?fields=score,tier` response, and the current one gzip- and Brotli-encoded
+It also times pack/unpack and building the response model.
+
+    python -m benchmarks.bench_payload --documents 500
+"""
+import argparse
+import gzip
+import json
+import time
+import uuid
+
+from benchmarks.common import percentiles, write_report
+from benchmarks.corpus import generate_corpus
+
+
+def _legacy_response(upload_id, filename, analysis):
+    return {
+        "upload_id": upload_id,
+        "filename": filename,
+        "score": analysis["score"],
+        "summary": analysis["summary"],
+        "suggested_tier": analysis["suggested_tier"],
+        "bullet_recommendations": analysis["bullet_recommendations"],
+        "bullets": analysis["bullet_recommendations"],
+        "gap_analysis": analysis["gap_analysis"],
+    }
+
+
+def _timed(function, values):
+    samples = []
+    for value in values:
+        started = time.perf_counter()
+        function(value)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def _encoded(payload: dict) -> bytes:
+    # The same separators Starlette's JSONResponse uses.
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tag", default="", help="suffix for the report name, to keep runs side by side")
+    args = parser.parse_args()
+
+    import bson
+
+    import server
+
+    analyses = [
+        server._fallback_analysis(server.prescore_resume(server.clean_resume_text(text)))
+        for text, _ in generate_corpus(args.documents, args.seed)
+    ]
+    ids = [str(uuid.uuid4()) for _ in analyses]
+    packed = [server._pack_analysis(analysis) for analysis in analyses]
+    selected = server._response_fields("score,tier")
+
+    sizes = {
+        "stored_full_bson": [len(bson.encode({"analysis": analysis})) for analysis in analyses],
+        "stored_compact_bson": [len(bson.encode({"analysis": compact})) for compact in packed],
+        "response_legacy_json": [
+            len(_encoded(_legacy_response(upload_id, "resume.pdf", analysis))) for upload_id, analysis in zip(ids, analyses)
+        ],
+        "response_json": [
+            len(_encoded(server._analysis_response(upload_id, "resume.pdf", analysis))) for upload_id, analysis in zip(ids, analyses)
+        ],
+        "response_score_tier_json": [
+            len(_encoded(server._analysis_response(upload_id, "resume.pdf", analysis, selected)))
+            for upload_id, analysis in zip(ids, analyses)
+        ],
+    }
+    bodies = [_encoded(server._analysis_response(upload_id, "resume.pdf", analysis)) for upload_id, analysis in zip(ids, analyses)]
+    sizes["response_gzip"] = [len(gzip.compress(body, compresslevel=server.GZIP_LEVEL, mtime=0)) for body in bodies]
+    if server.BROTLI_AVAILABLE:
+        import brotli
+
+        sizes["response_brotli"] = [len(brotli.compress(body, quality=server.BROTLI_QUALITY)) for body in bodies]
+
+    mean_bytes = {name: sum(values) / len(values) for name, values in sizes.items()}
+    write_report(
+        f"payload{'-' + args.tag if args.tag else ''}",
+        {
+            "config": {key: value for key, value in vars(args).items() if key != "tag"},
+            "mean_bytes": mean_bytes,
+            "stored_reduction": 1 - mean_bytes["stored_compact_bson"] / mean_bytes["stored_full_bson"],
+            "response_reduction": 1 - mean_bytes["response_json"] / mean_bytes["response_legacy_json"],
+            "brotli_available": server.BROTLI_AVAILABLE,
+            "seconds": {
+                "pack": _timed(server._pack_analysis, analyses),
+                "unpack": _timed(server._unpack_analysis, packed),
+                "response_model": _timed(lambda analysis: server._analysis_response("id", "resume.pdf", analysis), analyses),
+                "gzip": _timed(lambda body: gzip.compress(body, compresslevel=server.GZIP_LEVEL, mtime=0), bodies),
+            },
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Latency and gate check for the local pre-scoring engine (prescore_resume).
+
+    python -m benchmarks.bench_prescore --documents 500
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import percentiles, write_report
+from benchmarks.corpus import generate_corpus
+
+NON_RESUMES = (
+    "Invoice 2024-{n}\nBill to: Globex Corporation\nQty Description Unit price Amount\n"
+    + "1 Consulting services, March {n} $1,200.00 $1,200.00\n" * 12
+    + "Subtotal $14,400.00\nTax $1,152.00\nTotal due $15,552.00\nPayment is due within 30 days.",
+    "Dear Hiring Manager,\n\nI am writing to express my interest in the open role at your company. "
+    * 6
+    + "\n\nSincerely,\nJordan Rivera",
+    "Chapter {n}\n\n"
+    + "The river ran high that spring and the town gathered on the bridge to watch the water rise. " * 15,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import server
+
+    rng = random.Random(args.seed)
+    resumes = [text for text, _ in generate_corpus(args.documents, args.seed)]
+    others = [rng.choice(NON_RESUMES).replace("{n}", str(i)) for i in range(max(1, args.documents // 5))]
+
+    seconds, scores, resume_flags, other_flags = [], [], [], []
+    labelled = [(text, True) for text in resumes] + [(text, False) for text in others]
+    for text, is_resume in labelled:
+        started = time.perf_counter()
+        prescore = server.prescore_resume(server.clean_resume_text(text))
+        seconds.append(time.perf_counter() - started)
+        if is_resume:
+            resume_flags.append(prescore["is_resume"])
+            scores.append(prescore["score"])
+        else:
+            other_flags.append(prescore["is_resume"])
+
+    write_report(
+        "prescore",
+        {
+            "documents": len(resumes) + len(others),
+            "clean_and_score_seconds": percentiles(seconds),
+            "resume_scores": percentiles(scores),
+            "resumes_accepted": round(sum(resume_flags) / len(resume_flags), 4),
+            "non_resumes_rejected": round(1 - sum(other_flags) / len(other_flags), 4),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""R2 storage benchmark against a local S3-compatible stand-in (moto server).
+
+Compares the legacy pattern (a new boto3 client per operation, blocking the event loop)
+with the pooled process-wide client driven through the async helpers:
+
+    python -m benchmarks.bench_r2 --objects 200 --size-kb 256 --concurrency 16
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from benchmarks.common import free_port, percentiles, write_report
+
+BUCKET = "resumeshortlist-bench"
+
+
+def _configure_r2_env(endpoint: str) -> None:
+    os.environ.update(
+        R2_BUCKET=BUCKET,
+        R2_ACCOUNT_ID="bench",
+        R2_ACCESS_KEY_ID="bench",
+        R2_SECRET_ACCESS_KEY="bench",
+        R2_ENDPOINT=endpoint,
+    )
+
+
+def _fresh_client(endpoint: str, region: str = "auto"):
+    import boto3
+
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+        region_name=region,
+    )
+
+
+async def _timed(samples, coro):
+    started = time.perf_counter()
+    await coro
+    samples.append(time.perf_counter() - started)
+
+
+async def _run_legacy(endpoint: str, payload: bytes, objects: int, concurrency: int):
+    limiter = asyncio.Semaphore(concurrency)
+    latencies = {"upload": [], "download": [], "delete": []}
+
+    async def op(kind: str, key: str):
+        # Mirrors the old helpers: build a client, then make a blocking call on the event loop.
+        async with limiter:
+            started = time.perf_counter()
+            client = _fresh_client(endpoint)
+            if kind == "upload":
+                client.put_object(Bucket=BUCKET, Key=key, Body=payload, ContentType="application/pdf")
+            elif kind == "download":
+                client.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+            else:
+                client.delete_object(Bucket=BUCKET, Key=key)
+            latencies[kind].append(time.perf_counter() - started)
+
+    return await _phases(op, objects, latencies, "legacy")
+
+
+async def _run_pooled(payload: bytes, objects: int, concurrency: int):
+    import server
+
+    limiter = asyncio.Semaphore(concurrency)
+    latencies = {"upload": [], "download": [], "delete": []}
+
+    async def op(kind: str, key: str):
+        async with limiter:
+            if kind == "upload":
+                spool = server.SpooledUpload(key, "application/pdf")
+                spool.write(payload)
+                spool.finish()
+                try:
+                    await _timed(latencies[kind], server._r2_upload(key, spool))
+                finally:
+                    spool.close()
+            elif kind == "download":
+                await _timed(latencies[kind], server._r2_download(key))
+            else:
+                await _timed(latencies[kind], server._r2_delete(key))
+
+    return await _phases(op, objects, latencies, "pooled")
+
+
+async def _phases(op, objects: int, latencies, prefix: str):
+    report = {}
+    for kind in ("upload", "download", "delete"):
+        started = time.perf_counter()
+        await asyncio.gather(*(op(kind, f"bench/{prefix}/{i}.pdf") for i in range(objects)))
+        elapsed = time.perf_counter() - started
+        report[kind] = {"ops_per_s": objects / elapsed, "elapsed_s": elapsed, "latency_s": percentiles(latencies[kind])}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=200)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    port = free_port()
+    moto_server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    moto_server.start()
+    endpoint = f"http://127.0.0.1:{port}"
+    try:
+        _configure_r2_env(endpoint)
+        # moto only accepts a bucket without a location constraint from us-east-1.
+        _fresh_client(endpoint, region="us-east-1").create_bucket(Bucket=BUCKET)
+        payload = os.urandom(args.size_kb * 1024)
+        results = {
+            "legacy": asyncio.run(_run_legacy(endpoint, payload, args.objects, args.concurrency)),
+            "pooled": asyncio.run(_run_pooled(payload, args.objects, args.concurrency)),
+        }
+    finally:
+        moto_server.stop()
+
+    results["speedup"] = {
+        kind: results["pooled"][kind]["ops_per_s"] / results["legacy"][kind]["ops_per_s"]
+        for kind in ("upload", "download", "delete")
+    }
+    write_report("r2_storage", {"config": vars(args), "results": results})
+
+
+if __name__ == "__main__":
+    main()
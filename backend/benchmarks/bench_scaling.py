@@ -0,0 +1,144 @@
+"""Multi-worker scaling of /api/analyze: throughput at 1, 2, 4... server worker processes.
+
+For each worker count the app is started as a real multi-process server, either uvicorn --workers or
+gunicorn with gunicorn.conf.py (as in production). It is pointed at a local fake LLM and driven at a fixed
+concurrency with unique PDF resumes. The report records throughput, latency and scaling efficiency
+(rps at N workers / (N x rps at 1 worker)), plus how long each server took to shut down on SIGTERM.
+The workers share state through Mongo only when --mongo-url is given. Without it each worker keeps its
+own caches and limits, which does not change this workload since every document is unique.
+
+    python -m benchmarks.bench_scaling --workers 1,2,4 --requests 400 --concurrency 64
+    python -m benchmarks.bench_scaling --server gunicorn --mongo-url mongodb://localhost:27017 --tag gunicorn
+
+Scaling is bounded by the cores available to the server processes and by this driver, which shares the
+machine. Run it on a box with at least as many cores as the largest worker count.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.bench_load import CONTACT, _run_scenario
+from benchmarks.common import FakeLLMServer, free_port, write_report
+from benchmarks.corpus import generate_corpus, render_pdf
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _server_command(server: str, workers: int, port: int):
+    if server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "server:app", "--bind", f"127.0.0.1:{port}", "--workers", str(workers)]
+    return [
+        sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]  # fmt: skip
+
+
+async def _wait_ready(client, process, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with {process.returncode} before it was ready")
+        try:
+            if (await client.get("/api/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("server did not become ready")
+
+
+async def _drive(base_url: str, process, pdfs, args):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await _wait_ready(client, process)
+
+        def analyze(i):
+            return client.post(
+                "/api/analyze",
+                files={"file": (f"resume-{i}.pdf", pdfs[i % len(pdfs)], "application/pdf")},
+                data={**CONTACT, "email": f"scale-{i}@example.com"},
+            )
+
+        # Warm every worker (lazy SDK imports, extraction pool spawn) before the timed run.
+        await _run_scenario(client, args.concurrency, args.concurrency, lambda i: analyze(len(pdfs) - 1 - i))
+        report, _ = await _run_scenario(client, args.requests, args.concurrency, analyze)
+    return report
+
+
+def _run_workers(workers: int, pdfs, llm_url: str, args):
+    port = free_port()
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": llm_url,
+        # A large deployment-wide cap, so the LLM share per worker is never what limits the run.
+        "OPENAI_MAX_CONCURRENCY": str(16 * args.concurrency),
+        "WEB_CONCURRENCY": str(workers),
+        "RATE_LIMITS_ENABLED": "false",
+    }
+    if args.mongo_url:
+        env.update(MONGO_URL=args.mongo_url, DB_NAME=f"bench_scaling_{int(time.time())}")
+    else:
+        env.pop("MONGO_URL", None)
+    process = subprocess.Popen(_server_command(args.server, workers, port), cwd=BACKEND_DIR, env=env)
+    try:
+        report = asyncio.run(_drive(f"http://127.0.0.1:{port}", process, pdfs, args))
+    finally:
+        started = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=90)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        shutdown_seconds = time.perf_counter() - started
+    return {**report, "shutdown_seconds": shutdown_seconds, "exit_code": process.returncode}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--server", choices=("uvicorn", "gunicorn"), default="uvicorn")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--mongo-url", default="", help="share state between workers through this Mongo")
+    parser.add_argument("--seed", type=int, default=17)
+    parser.add_argument("--tag", default="", help="suffix for the report name, to keep runs side by side")
+    args = parser.parse_args()
+    counts = [int(value) for value in args.workers.split(",") if value.strip()]
+
+    # Unique documents for the warm-up and the timed run, so nothing is answered from a cache.
+    pdfs = [render_pdf(text) for text, _ in generate_corpus(args.requests + args.concurrency, args.seed)]
+    runs = {}
+    with FakeLLMServer(latency=args.llm_latency) as llm:
+        for workers in counts:
+            runs[str(workers)] = _run_workers(workers, pdfs, llm.base_url, args)
+            print(
+                f"{workers} worker(s): {runs[str(workers)]['throughput_rps']:.1f} rps, "
+                f"p95 {runs[str(workers)]['latency_seconds']['p95'] * 1000:.0f} ms, "
+                f"shutdown {runs[str(workers)]['shutdown_seconds']:.1f} s"
+            )
+
+    baseline = runs[str(counts[0])]["throughput_rps"] / counts[0]
+    write_report(
+        f"scaling{'-' + args.tag if args.tag else ''}",
+        {
+            "config": {**{key: value for key, value in vars(args).items() if key != "tag"}, "cpus": os.cpu_count()},
+            "runs": runs,
+            "scaling_efficiency": {
+                workers: round(run["throughput_rps"] / (int(workers) * baseline), 3) for workers, run in runs.items()
+            },
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Cold-start benchmark: how long `import server` takes and what it pulls in.
+
+Each repeat imports the server module in a fresh interpreter under `python -X importtime`, records the
+cumulative import time of `server` and the slowest modules underneath it, and flags any heavyweight SDK
+that was imported eagerly (they should only load through ServiceContainer or inside the functions that
+use them). It then measures, in-process, the time from import to the first /api/health response and the
+duration of services.warm_up(). With --budget-ms the run exits non-zero when the median import time is
+over budget, so it can guard against regressions in CI:
+
+    python -m benchmarks.bench_startup --repeat 5 --budget-ms 800
+    python -m benchmarks.bench_startup --tag before
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.common import percentiles, write_report
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+EAGER_SDKS = ("stripe", "openai", "motor", "pymongo", "boto3", "botocore", "numpy", "pypdf", "docx", "tiktoken", "pytesseract")
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def _import_profile():
+    """One cold `import server`: (seconds per module imported directly by it, server cumulative, everything it loaded, wall)."""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode:
+        raise SystemExit(f"`import server` failed:\n{completed.stderr[-2000:]}")
+    # importtime prints a module after everything it imported, indented two spaces per level, so the
+    # entries just above the top-level `server` line are its subtree.
+    subtree = []
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if len(indent) > 1:
+            subtree.append((len(indent), name, int(cumulative) / 1e6))
+        elif name == "server":
+            direct = {}
+            for depth, child, seconds in subtree:
+                if depth == 3:
+                    root = child.split(".")[0]
+                    direct[root] = direct.get(root, 0.0) + seconds
+            loaded = {child.split(".")[0] for _, child, _ in subtree}
+            return direct, int(cumulative) / 1e6, loaded, wall
+        else:
+            subtree = []
+    raise SystemExit("`import server` did not show up in the -X importtime output")
+
+
+def _in_process_startup():
+    """Import, first /api/health over ASGI, then a full warm-up, all timed in this interpreter."""
+    import httpx
+
+    started = time.perf_counter()
+    import server
+
+    imported = time.perf_counter() - started
+
+    async def first_health():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/api/health")
+            response.raise_for_status()
+            return response.json()
+
+    health = asyncio.run(first_health())
+    first_response = time.perf_counter() - started
+    loaded_before_warm_up = sorted(name for name in EAGER_SDKS if name in sys.modules)
+
+    warm_started = time.perf_counter()
+    server.services.warm_up()
+    warm_up = time.perf_counter() - warm_started
+    return {
+        "import_seconds": imported,
+        "first_health_seconds": first_response,
+        "warm_up_seconds": warm_up,
+        "health": health,
+        "sdks_loaded_before_warm_up": loaded_before_warm_up,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="cold imports, each in a fresh interpreter")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level modules to report")
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="fail when the median `import server` exceeds this")
+    parser.add_argument("--tag", default="", help="suffix for the report name, to keep runs side by side")
+    args = parser.parse_args()
+
+    samples, walls, per_module, loaded = [], [], {}, set()
+    for _ in range(args.repeat):
+        direct, server_seconds, modules, wall = _import_profile()
+        samples.append(server_seconds)
+        walls.append(wall)
+        loaded |= modules
+        for name, seconds in direct.items():
+            per_module.setdefault(name, []).append(seconds)
+    slowest = sorted(per_module.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    eager = sorted(name for name in EAGER_SDKS if name in loaded)
+    median_ms = statistics.median(samples) * 1000
+
+    write_report(
+        f"startup{'-' + args.tag if args.tag else ''}",
+        {
+            "config": {key: value for key, value in vars(args).items() if key != "tag"},
+            "import_server_seconds": percentiles(samples),
+            "interpreter_wall_seconds": percentiles(walls),
+            "slowest_modules_seconds": {
+                name: statistics.median(values) for name, values in slowest[: args.top]
+            },
+            "eager_sdks": eager,
+            "in_process": _in_process_startup(),
+        },
+    )
+    if eager:
+        print(f"Imported eagerly by `import server`: {', '.join(eager)}")
+    if args.budget_ms and median_ms > args.budget_ms:
+        print(f"`import server` took {median_ms:.0f} ms (median), over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
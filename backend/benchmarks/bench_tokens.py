@@ -0,0 +1,82 @@
+"""Prompt-size benchmark for the resume preprocessing stage.
+
+Counts the tokens the analysis prompt would carry with the old `text[:12000]` cut and with
+prepare_resume_text(), over a generated corpus or a directory of real resumes:
+
+    python -m benchmarks.bench_tokens --documents 200
+    python -m benchmarks.bench_tokens --corpus ~/resumes --budget 2500
+    python -m benchmarks.bench_tokens --budget 800 --legacy-chars 3200   # tight budget, same nominal size
+"""
+import argparse
+import time
+from pathlib import Path
+
+from benchmarks.common import percentiles, write_report
+from benchmarks.corpus import generate_corpus, load_corpus
+
+LEGACY_CHAR_LIMIT = 12000
+
+
+def _summary(values):
+    stats = percentiles(values)
+    stats["total"] = sum(values)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200, help="generated resumes (ignored with --corpus)")
+    parser.add_argument("--corpus", type=Path, help="directory of .pdf/.docx/.txt resumes")
+    parser.add_argument("--budget", type=int, default=None, help="token budget (default ANALYSIS_INPUT_TOKEN_BUDGET)")
+    parser.add_argument("--legacy-chars", type=int, default=LEGACY_CHAR_LIMIT, help="character cut of the old path")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import server
+
+    budget = args.budget or server.ANALYSIS_INPUT_TOKEN_BUDGET
+    corpus = load_corpus(args.corpus) if args.corpus else generate_corpus(args.documents, args.seed)
+    encoder = server._token_encoder()
+
+    raw_tokens, legacy_tokens, prepared_tokens, prep_seconds = [], [], [], []
+    legacy_kept_latest = prepared_kept_latest = checked = 0
+    for text, facts in corpus:
+        legacy = text[:args.legacy_chars]
+        started = time.perf_counter()
+        prepared = server.prepare_resume_text(text, budget)
+        prep_seconds.append(time.perf_counter() - started)
+
+        raw_tokens.append(server.count_tokens(text))
+        legacy_tokens.append(server.count_tokens(legacy))
+        prepared_tokens.append(server.count_tokens(prepared))
+
+        latest_role = " ".join(facts["latest_role"].split())
+        if latest_role:
+            checked += 1
+            legacy_kept_latest += latest_role in " ".join(legacy.split())
+            prepared_kept_latest += latest_role in prepared
+
+    legacy_total = sum(legacy_tokens)
+    report = {
+        "documents": len(corpus),
+        "source": str(args.corpus) if args.corpus else f"generated(seed={args.seed})",
+        "tokenizer": f"tiktoken:{encoder.name}" if encoder is not None else "estimate:chars/4",
+        "token_budget": budget,
+        "legacy_char_limit": args.legacy_chars,
+        "raw_tokens": _summary(raw_tokens),
+        "legacy_prompt_tokens": _summary(legacy_tokens),
+        "prepared_prompt_tokens": _summary(prepared_tokens),
+        "token_reduction_vs_legacy": round(1 - sum(prepared_tokens) / legacy_total, 4) if legacy_total else 0.0,
+        "over_budget_documents": sum(1 for tokens in prepared_tokens if tokens > budget),
+        "preprocess_seconds": percentiles(prep_seconds),
+    }
+    if checked:
+        report["latest_role_retained"] = {
+            "legacy": round(legacy_kept_latest / checked, 4),
+            "prepared": round(prepared_kept_latest / checked, 4),
+        }
+    write_report("prompt_tokens", report)
+
+
+if __name__ == "__main__":
+    main()
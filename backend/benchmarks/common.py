@@ -0,0 +1,263 @@
+"""Shared helpers for the backend benchmarks: local stand-in services and report output."""
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": sum(ordered) / len(ordered),
+        "max": ordered[-1],
+    }
+
+
+def write_report(name: str, data: Dict[str, Any]) -> Path:
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    payload = {"benchmark": name, "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), **data}
+    path = RESULTS_DIR / f"{name}.json"
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True))
+    print(json.dumps(payload, indent=2, sort_keys=True))
+    print(f"Report written to {path}")
+    return path
+
+
+def _fake_llm_app(latency: float, extra_result_latency: float):
+    import asyncio
+
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    analysis = {
+        "score": 58,
+        "summary": "Solid operator with thin metrics. Tighten targeting.",
+        "suggested_tier": "MID",
+        "bullet_recommendations": ["Quantify outcomes.", "Lead with verbs.", "Trim density.", "Add keywords."],
+        "gap_analysis": [
+            {"category": "Impact", "finding": "Few metrics."},
+            {"category": "ATS Compliance", "finding": "Parses cleanly."},
+            {"category": "Targeting", "finding": "Too broad."},
+        ],
+    }
+
+    async def chat_completions(request):
+        body = await request.json()
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        # Packed batch prompts introduce each resume with "### Resume <n>" and expect one result per resume.
+        packed = prompt.count("### Resume ")
+        content = {"results": [{"resume": n, **analysis} for n in range(1, packed + 1)]} if packed else analysis
+        # Completion time grows with the length of the answer.
+        await asyncio.sleep(latency * (1 + extra_result_latency * max(0, packed - 1)))
+        return JSONResponse(
+            {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o-mini"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": json.dumps(content)},
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": 120 * max(1, packed),
+                    "total_tokens": len(prompt) // 4 + 120 * max(1, packed),
+                },
+            }
+        )
+
+    return Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+
+
+class ServerThread:
+    """Run an ASGI app under uvicorn on a background thread, on its own event loop."""
+
+    def __init__(self, app, port: int = 0):
+        import uvicorn
+
+        self.port = port or free_port()
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "ServerThread":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Stand-in server did not start")
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+class FakeLLMServer(ServerThread):
+    """OpenAI-compatible /v1/chat/completions endpoint that answers after a fixed latency.
+
+    A packed prompt carrying n resumes takes `latency * (1 + extra_result_latency * (n - 1))`.
+    """
+
+    def __init__(self, latency: float = 0.5, port: int = 0, extra_result_latency: float = 0.5):
+        super().__init__(_fake_llm_app(latency, extra_result_latency), port=port)
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+
+def _fake_stripe_app(latency: float):
+    import asyncio
+    import uuid
+
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    def session(session_id: str, form=None) -> Dict[str, Any]:
+        form = form or {}
+        return {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.test/{session_id}",
+            "payment_status": "paid",
+            "client_reference_id": form.get("client_reference_id") or None,
+            "customer_details": {"email": form.get("metadata[email]") or "bench@example.com"},
+            "amount_total": 10000,
+            "currency": "usd",
+            "metadata": {},
+        }
+
+    async def create_session(request):
+        form = await request.form()
+        await asyncio.sleep(latency)
+        return JSONResponse(session(f"cs_test_{uuid.uuid4().hex}", form))
+
+    async def retrieve_session(request):
+        await asyncio.sleep(latency)
+        return JSONResponse(session(request.path_params["session_id"]))
+
+    return Starlette(
+        routes=[
+            Route("/v1/checkout/sessions", create_session, methods=["POST"]),
+            Route("/v1/checkout/sessions/{session_id}", retrieve_session, methods=["GET"]),
+        ]
+    )
+
+
+class FakeStripeServer(ServerThread):
+    """Stripe API stand-in for checkout session create/retrieve; every session reports as paid."""
+
+    def __init__(self, latency: float = 0.15, port: int = 0):
+        super().__init__(_fake_stripe_app(latency), port=port)
+
+
+def configure_stripe_env(api_base: str) -> None:
+    os.environ["STRIPE_SECRET_KEY"] = "sk_test_bench"
+    for tier in ("ENTRY", "MID", "SENIOR", "EXEC", "CSUITE", "INTERVIEW"):
+        os.environ[f"PRICE_{tier}"] = f"price_bench_{tier.lower()}"
+    import stripe
+
+    stripe.api_base = api_base
+
+
+class MotoS3Server:
+    """moto's S3 server on a free port with one bucket, exposed to the server through the R2_* settings."""
+
+    def __init__(self, bucket: str = "resumeshortlist-bench"):
+        self.bucket = bucket
+        self.port = free_port()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "MotoS3Server":
+        import boto3
+        from moto.server import ThreadedMotoServer
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self._server = ThreadedMotoServer(ip_address="127.0.0.1", port=self.port, verbose=False)
+        self._server.start()
+        os.environ.update(
+            R2_BUCKET=self.bucket,
+            R2_ACCOUNT_ID="bench",
+            R2_ACCESS_KEY_ID="bench",
+            R2_SECRET_ACCESS_KEY="bench",
+            R2_ENDPOINT=self.url,
+        )
+        # moto only accepts a bucket without a location constraint from us-east-1.
+        boto3.client(
+            "s3", endpoint_url=self.url, aws_access_key_id="bench", aws_secret_access_key="bench", region_name="us-east-1"
+        ).create_bucket(Bucket=self.bucket)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.stop()
+
+
+def configure_openai_env(base_url: str) -> None:
+    os.environ["OPENAI_API_KEY"] = "sk-bench"
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+
+SAMPLE_RESUME = """Jordan Avery
+Senior Product Manager | jordan.avery@example.com | (555) 010-2030
+
+EXPERIENCE
+Acme Corp - Senior Product Manager (2019 - Present)
+- Led a cross-functional team of 12 to launch a billing platform used by 40,000 customers.
+- Grew annual recurring revenue by 28% through pricing experiments and packaging changes.
+- Reduced churn 15% by shipping onboarding improvements informed by 60 customer interviews.
+
+Globex - Product Manager (2015 - 2019)
+- Owned the mobile roadmap across iOS and Android with 2M monthly active users.
+- Delivered a payments integration that cut checkout time by 35%.
+
+EDUCATION
+B.S. Computer Science, State University
+
+SKILLS
+Roadmapping, SQL, Experimentation, Stakeholder Management, Agile
+"""
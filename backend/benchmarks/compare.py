@@ -0,0 +1,38 @@
+"""Side-by-side diff of two benchmark reports (any results/*.json written by write_report):
+
+    python -m benchmarks.compare results/load-before.json results/load-after.json
+"""
+import argparse
+import json
+from pathlib import Path
+
+
+def _flatten(data, prefix=""):
+    for key, value in sorted(data.items()):
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, float(value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--filter", default="", help="only show metrics whose path contains this text")
+    args = parser.parse_args()
+
+    baseline = dict(_flatten(json.loads(args.baseline.read_text())))
+    candidate = dict(_flatten(json.loads(args.candidate.read_text())))
+    rows = [path for path in baseline if path in candidate and args.filter in path]
+    width = max((len(path) for path in rows), default=10)
+    print(f"{'metric':<{width}}  {'baseline':>14}  {'candidate':>14}  {'change':>9}")
+    for path in rows:
+        before, after = baseline[path], candidate[path]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{path:<{width}}  {before:>14.6g}  {after:>14.6g}  {change:>9}")
+
+
+if __name__ == "__main__":
+    main()
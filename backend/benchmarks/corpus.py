@@ -0,0 +1,237 @@
+"""Deterministic sample resumes that look like pypdf output: per-page headers and footers, page numbers,
+whitespace runs, hyphenated line breaks and bullet glyphs. render_pdf()/render_docx() turn them into
+upload fixtures, and render_scanned_pdf() into image-only PDFs for the OCR path. Real documents can be
+used instead with load_corpus(directory).
+"""
+import io
+import random
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+FIRST_NAMES = ("Jordan", "Priya", "Alex", "Morgan", "Wei", "Sam", "Fatima", "Lucas", "Ana", "Kwame")
+LAST_NAMES = ("Rivera", "Shah", "Nguyen", "Okafor", "Kim", "Schmidt", "Haddad", "Silva", "Cohen", "Walsh")
+TITLES = ("Software Engineer", "Product Manager", "Data Analyst", "Marketing Lead", "Operations Manager", "Controller")
+COMPANIES = ("Northwind", "Globex", "Initech", "Umbrella Health", "Stark Logistics", "Wayne Capital", "Hooli", "Vandelay")
+VERBS = ("Led", "Built", "Delivered", "Owned", "Reduced", "Scaled", "Launched", "Negotiated", "Automated", "Managed")
+OBJECTS = (
+    "the quarterly planning process across four regional teams",
+    "a customer onboarding pipeline used by enterprise accounts",
+    "vendor contracts and renewals for the infrastructure budget",
+    "reporting dashboards for finance and operations leadership",
+    "the migration of legacy services to a managed cloud platform",
+    "hiring and mentoring for a cross-functional delivery team",
+)
+OUTCOMES = ("cutting cost by {n}%", "growing revenue {n}%", "saving {n} hours a month", "for {n}k users", "")
+SKILLS = ("Python", "SQL", "Excel", "Tableau", "Salesforce", "AWS", "Kubernetes", "Figma", "Jira", "Power BI", "Go")
+BULLET_GLYPHS = ("•", "●", "▪", "-")
+HEADINGS = {
+    "summary": ("SUMMARY", "Professional Summary", "P R O F I L E"),
+    "experience": ("EXPERIENCE", "Work History", "Professional Experience", "E X P E R I E N C E"),
+    "skills": ("SKILLS", "Core Competencies", "Technical Skills"),
+    "education": ("EDUCATION", "Education & Training"),
+    "certifications": ("CERTIFICATIONS", "Licenses"),
+    "interests": ("INTERESTS", "Hobbies"),
+    "references": ("REFERENCES",),
+}
+
+
+def _noisy(rng: random.Random, line: str) -> str:
+    """Extractor-style whitespace: doubled spaces and trailing padding."""
+    words = line.split(" ")
+    out = words[0]
+    for word in words[1:]:
+        out += " " * rng.choice((1, 1, 1, 2, 3)) + word
+    return out + " " * rng.choice((0, 0, 1, 4))
+
+
+def _wrap(rng: random.Random, text: str, width: int = 70) -> List[str]:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + len(word) + 1 > width:
+            if rng.random() < 0.3 and len(word) > 7:
+                cut = len(word) // 2
+                lines.append(f"{current} {word[:cut]}-")
+                current = word[cut:]
+                continue
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    if current:
+        lines.append(current)
+    return lines
+
+
+def generate_resume(rng: random.Random) -> Tuple[str, Dict[str, str]]:
+    """One resume as page-separated ("\\f") text, plus facts the benchmark checks for (e.g. the latest role)."""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    title = rng.choice(TITLES)
+    contact = f"{name} | {name.split()[0].lower()}@example.com | (555) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}"
+
+    sections: Dict[str, List[str]] = {}
+    sections["summary"] = _wrap(
+        rng,
+        f"{title} with {rng.randint(3, 20)} years of experience in " + ", ".join(rng.sample(OBJECTS, 2)) + ".",
+    )
+    experience: List[str] = []
+    year = 2025
+    roles = rng.randint(3, 9)
+    latest_role = ""
+    for _ in range(roles):
+        start = year - rng.randint(1, 4)
+        role = f"{rng.choice(TITLES)}, {rng.choice(COMPANIES)}    {start} - {year if year < 2025 else 'Present'}"
+        latest_role = latest_role or role
+        experience.append(role)
+        for _ in range(rng.randint(3, 7)):
+            outcome = rng.choice(OUTCOMES).format(n=rng.randint(5, 60))
+            bullet = f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} {outcome}".strip()
+            wrapped = _wrap(rng, bullet)
+            experience.append(f"{rng.choice(BULLET_GLYPHS)} {wrapped[0]}")
+            experience.extend(wrapped[1:])
+        year = start
+    sections["experience"] = experience
+    sections["skills"] = _wrap(rng, ", ".join(rng.sample(SKILLS, rng.randint(5, len(SKILLS)))))
+    sections["education"] = [f"B.S. {rng.choice(('Economics', 'Computer Science', 'Biology'))}, State University  {year - 4}"]
+    sections["certifications"] = [f"{rng.choice(('PMP', 'CPA', 'AWS Solutions Architect', 'Six Sigma'))} {year + 2}"]
+    sections["interests"] = _wrap(rng, "Distance running, community theatre, volunteer tutoring, and woodworking.")
+    sections["references"] = ["Available upon request."]
+
+    order = ["summary", "experience", "skills", "education", "certifications", "interests", "references"]
+    if rng.random() < 0.35:
+        # Education- or skills-first layouts push the experience section down the page.
+        order.remove("experience")
+        order.insert(3, "experience")
+
+    body: List[str] = [name, title]
+    for section in order:
+        body.append(rng.choice(HEADINGS[section]))
+        body.extend(sections[section])
+
+    lines_per_page = rng.randint(38, 55)
+    chunks = [body[i:i + lines_per_page] for i in range(0, len(body), lines_per_page)]
+    pages = []
+    for number, chunk in enumerate(chunks, start=1):
+        page = [contact] + [_noisy(rng, line) for line in chunk]
+        page.append(f"Page {number} of {len(chunks)}")
+        pages.append("\n".join(page))
+    return "\f".join(pages), {"name": name, "latest_role": latest_role}
+
+
+def generate_corpus(count: int, seed: int = 7) -> List[Tuple[str, Dict[str, str]]]:
+    rng = random.Random(seed)
+    return [generate_resume(rng) for _ in range(count)]
+
+
+def load_corpus(directory: Path) -> List[Tuple[str, Dict[str, str]]]:
+    """Extract every .pdf/.docx/.txt under `directory` with the server's extractors."""
+    import server
+
+    documents = []
+    for path in sorted(Path(directory).rglob("*")):
+        suffix = path.suffix.lower()
+        if suffix == ".pdf":
+            text = server.extract_text_from_pdf(str(path))
+        elif suffix == ".docx":
+            text = server.extract_text_from_docx(str(path))
+        elif suffix == ".txt":
+            text = path.read_text(errors="replace")
+        else:
+            continue
+        documents.append((text, {"name": path.name, "latest_role": ""}))
+    return documents
+
+
+def _pdf_escape(line: str) -> bytes:
+    encoded = line.encode("cp1252", "replace")
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _serialize_pdf(objects: List[bytes]) -> bytes:
+    """Number `objects` from 1 (object 1 must be the catalog) and write them out with an xref table."""
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def _stream_object(dictionary: str, data: bytes) -> bytes:
+    return f"<< {dictionary} /Length {len(data)} >>\nstream\n".encode() + data + b"\nendstream"
+
+
+def render_pdf(text: str) -> bytes:
+    """A minimal text PDF (Helvetica, one page per form feed) that pypdf can extract; no PDF library needed."""
+    # Objects 1-3 are the catalog, page tree and font; each page adds its content stream and page object.
+    objects: List[bytes] = [b"", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for page in text.split("\f"):
+        stream = b"BT /F1 10 Tf 12 TL 50 780 Td " + b" ".join(b"(" + _pdf_escape(line) + b") Tj T*" for line in page.split("\n")) + b" ET"
+        objects.append(_stream_object("", stream))
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {len(objects)} 0 R >>".encode()
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+    return _serialize_pdf(objects)
+
+
+def render_image_pdf(images: List[Tuple[int, int, bytes]]) -> bytes:
+    """A PDF whose pages are each one 8-bit grayscale image (width, height, pixels) and nothing else, like a scan."""
+    objects: List[bytes] = [b"<< /Type /Catalog /Pages 2 0 R >>", b""]
+    kids = []
+    for width, height, pixels in images:
+        objects.append(
+            _stream_object(
+                f"/Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray "
+                f"/BitsPerComponent 8 /Filter /FlateDecode",
+                zlib.compress(pixels),
+            )
+        )
+        objects.append(_stream_object("", b"q 612 0 0 792 0 0 cm /Im1 Do Q"))
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /XObject << /Im1 {len(objects) - 1} 0 R >> >> "
+            f"/Contents {len(objects)} 0 R >>".encode()
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+    return _serialize_pdf(objects)
+
+
+def render_scanned_pdf(text: str, dpi: int = 150) -> bytes:
+    """`text` drawn onto page-sized images (needs Pillow), so only OCR can get it back."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    font = ImageFont.load_default(size=dpi // 9)
+    images = []
+    for page in text.split("\f"):
+        image = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(image)
+        for number, line in enumerate(page.split("\n")):
+            draw.text((dpi // 2, dpi // 2 + number * dpi // 6), line, fill=0, font=font)
+        images.append((width, height, image.tobytes()))
+    return render_image_pdf(images)
+
+
+def render_docx(text: str) -> bytes:
+    import docx
+
+    document = docx.Document()
+    for number, page in enumerate(text.split("\f")):
+        if number:
+            document.add_page_break()
+        for line in page.split("\n"):
+            document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
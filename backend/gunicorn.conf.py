@@ -0,0 +1,54 @@
+"""Production run profile: gunicorn supervising uvicorn workers.
+
+    cd backend && gunicorn server:app
+
+gunicorn picks this file up from the working directory. Every setting can be overridden from the
+environment. Each worker is a separate process with its own event loop, extraction pool and LLM share.
+Coordination between workers goes through Mongo: rate limits, the analysis cache, the job and email
+queues, idempotency keys and submission leases.
+"""
+import multiprocessing
+import os
+
+cpus = multiprocessing.cpu_count()
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8001')}")
+worker_class = "uvicorn.workers.UvicornWorker"
+# The request path is I/O-bound (LLM, Mongo, R2) and CPU-heavy parsing runs in each worker's extraction
+# pool, so one event loop per core is enough; more workers would only compete for the same cores.
+workers = int(os.environ.get("WEB_CONCURRENCY") or cpus)
+# Split the cores between the workers' extraction pools instead of giving every worker one process per core.
+extract_workers = int(os.environ.get("EXTRACT_WORKERS") or max(1, cpus // workers))
+
+# server.py reads these at import, in each worker: WEB_CONCURRENCY divides OPENAI_MAX_CONCURRENCY between the
+# workers, so the deployment as a whole stays under the provider's concurrency limit.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ["EXTRACT_WORKERS"] = str(extract_workers)
+
+# Render terminates client connections at one load balancer, which appends the client address to
+# X-Forwarded-For. Per-IP rate limits count one proxy hop from the right to find the client; set
+# RATE_LIMIT_TRUSTED_PROXIES to the actual number of proxies anywhere else (0 when clients connect directly,
+# since a client could otherwise forge the header). forwarded_allow_ips lets uvicorn report the same client
+# address in access logs; the app is only reachable through the proxy, so every peer is trusted.
+os.environ.setdefault("RATE_LIMIT_TRUSTED_PROXIES", "1")
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "*")
+
+# Workers import the app themselves after the fork. Importing it is cheap (SDKs load lazily), and nothing
+# with threads or sockets ends up shared between processes.
+preload_app = False
+
+# On SIGTERM gunicorn stops accepting connections and each worker finishes its in-flight requests, then
+# runs the app's lifespan shutdown, which drains the queue workers for up to SHUTDOWN_DRAIN_SECONDS.
+# graceful_timeout has to cover both before the worker is killed.
+shutdown_drain_seconds = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", "20"))
+request_drain_seconds = float(os.environ.get("REQUEST_DRAIN_SECONDS", "45"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", str(int(request_drain_seconds + shutdown_drain_seconds + 5))))
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+keepalive = int(os.environ.get("KEEPALIVE", "5"))
+
+# Restarting workers now and then bounds slow leaks. The jitter keeps them from all restarting at once.
+max_requests = int(os.environ.get("MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", "500"))
+
+accesslog = os.environ.get("ACCESS_LOG", "-")
+loglevel = os.environ.get("LOG_LEVEL", "info")
@@ -1,55 +1,862 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi import FastAPI, APIRouter, UploadFile, File, Form, Header, HTTPException, Request, Response
 from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Any, Dict
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
+from typing import TYPE_CHECKING, List, Optional, Any, Dict, Mapping, Union
+from types import MappingProxyType
 import os
+import asyncio
+import importlib.util
 import logging
 import uuid
-from datetime import datetime, timezone
+import base64
+import tempfile
+import hashlib
+import unicodedata
+import math
+import re
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
 import io
+import gzip
+import zipfile
 import json
 import time
 import smtplib
 import ssl
+import signal
+import socket
+import multiprocessing
+import threading
+import contextvars
+import functools
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from email.message import EmailMessage
 
-import pypdf
-import docx
-import stripe
-from openai import OpenAI
-import boto3
+# The SDKs (stripe, openai, motor/pymongo, boto3, numpy, pypdf, python-docx, tiktoken, pytesseract) are
+# imported where they are used, so importing this module stays cheap; see ServiceContainer.
+if TYPE_CHECKING:
+    import numpy as np
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / ".env")
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+
+class RequestIdLogFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s")
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(RequestIdLogFilter())
 logger = logging.getLogger("resumeshortlist-backend")
 
-stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
 
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
-mongo_url = os.environ.get("MONGO_URL")
-db = None
-mongo_client = None
-if mongo_url:
+class MetricsRegistry:
+    """Minimal in-process Prometheus registry: labelled counters and histograms, rendered in text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta: Dict[str, tuple] = {}
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._histograms: Dict[str, Dict[tuple, list]] = {}
+        self._collectors: List[Any] = []
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._meta[name] = ("counter", help_text, None)
+        self._counters[name] = {}
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS) -> None:
+        self._meta[name] = ("histogram", help_text, buckets)
+        self._histograms[name] = {}
+
+    def add_collector(self, collect) -> None:
+        """collect() returns [(name, type, help, [(labels, value), ...])] for values owned elsewhere."""
+        self._collectors.append(collect)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        buckets = self._meta[name][2]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms[name]
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * len(buckets), 0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @staticmethod
+    def _labels(pairs) -> str:
+        if not pairs:
+            return ""
+        rendered = []
+        for key, value in pairs:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            rendered.append(f'{key}="{value}"')
+        return "{" + ",".join(rendered) + "}"
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines += [f"# HELP {name} {self._meta[name][1]}", f"# TYPE {name} counter"]
+                lines += [f"{name}{self._labels(key)} {value}" for key, value in series.items()]
+            for name, series in self._histograms.items():
+                buckets = self._meta[name][2]
+                lines += [f"# HELP {name} {self._meta[name][1]}", f"# TYPE {name} histogram"]
+                for key, (counts, total, count) in series.items():
+                    for bound, bucket_count in zip(buckets, counts):
+                        lines.append(f"{name}_bucket{self._labels(key + (('le', repr(bound)),))} {bucket_count}")
+                    lines.append(f"{name}_bucket{self._labels(key + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{self._labels(key)} {total}")
+                    lines.append(f"{name}_count{self._labels(key)} {count}")
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{self._labels(tuple(sorted(labels.items())))} {value}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.histogram("resumeshortlist_stage_seconds", "Latency of pipeline stages (extraction, LLM, R2, Mongo, SMTP).")
+metrics.counter("resumeshortlist_stage_errors_total", "Pipeline stages that raised.")
+metrics.histogram("resumeshortlist_http_request_seconds", "HTTP request latency by route.")
+metrics.counter("resumeshortlist_http_requests_total", "HTTP requests by route and status.")
+metrics.histogram("resumeshortlist_openai_request_seconds", "Latency of individual OpenAI completion attempts.")
+metrics.counter("resumeshortlist_openai_attempts_total", "OpenAI completion attempts by outcome.")
+metrics.counter("resumeshortlist_openai_tokens_total", "OpenAI tokens consumed, by kind.")
+metrics.counter("resumeshortlist_analysis_results_total", "Analyses returned, by source (llm, cache, local, fallback, not_resume).")
+metrics.counter("resumeshortlist_llm_admissions_total", "LLM slot requests by outcome (admitted, queue_full, queue_timeout).")
+metrics.histogram("resumeshortlist_llm_queue_seconds", "Time spent waiting for an LLM slot, by lane.")
+metrics.counter("resumeshortlist_rate_limited_total", "Requests refused by a rate limit, by rule.")
+metrics.counter("resumeshortlist_pdf_early_exits_total", "PDFs whose remaining pages were skipped once enough text was read.")
+metrics.counter("resumeshortlist_ocr_pages_total", "PDF pages sent to OCR, by outcome (ok, empty, error, timeout, shed).")
+metrics.counter("resumeshortlist_compressed_responses_total", "JSON responses sent compressed, by content encoding.")
+metrics.counter("resumeshortlist_coalesced_requests_total", "Requests that started (leader) or joined an in-flight duplicate, by flight.")
+metrics.counter("resumeshortlist_duplicate_submissions_total", "Requests answered from an earlier submission, by how it was matched.")
+metrics.counter("resumeshortlist_r2_dedup_total", "Original uploads by outcome (uploaded, already_stored, orphan_removed).")
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Record how long a block takes under resumeshortlist_stage_seconds{stage=...}."""
+    started = time.perf_counter()
     try:
-        mongo_client = AsyncIOMotorClient(mongo_url)
-        db = mongo_client[os.environ.get("DB_NAME", "resumeshortlist")]
-        logger.info("MongoDB connected.")
-    except Exception as e:
-        logger.error(f"Mongo connection failed. Running without DB. Error: {e}")
-        db = None
-        mongo_client = None
-else:
+        yield
+    except BaseException:
+        metrics.inc("resumeshortlist_stage_errors_total", stage=stage)
+        raise
+    finally:
+        metrics.observe("resumeshortlist_stage_seconds", time.perf_counter() - started, stage=stage)
+
+
+STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
+
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", "45"))
+# Deployment-wide cap on concurrent completions; each of the WEB_CONCURRENCY uvicorn workers takes an equal share.
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "32"))
+WEB_CONCURRENCY = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+OPENAI_MAX_QUEUE = int(os.environ.get("OPENAI_MAX_QUEUE", "64"))
+OPENAI_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_QUEUE_TIMEOUT_SECONDS", "20"))
+# Fraction of the LLM slots that background callers (analysis jobs, batch requests) may hold at once.
+OPENAI_BACKGROUND_SHARE = float(os.environ.get("OPENAI_BACKGROUND_SHARE", "0.5"))
+OPENAI_MAX_ATTEMPTS = 3
+
+
+class LlmOverloaded(Exception):
+    """The LLM wait line is full (or the wait ran out); answered with 503 and Retry-After."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM capacity exhausted; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LlmAdmission:
+    """Concurrency cap for LLM completions with two priority lanes and a bounded interactive wait line.
+
+    A freed slot goes to the longest-waiting interactive caller first, and background callers (analysis
+    jobs, batch requests) never hold more than `background_limit` slots, so a large batch or a job backlog
+    cannot queue ahead of /api/analyze. Interactive callers queue only while fewer than `max_queue` of them
+    are waiting, and for at most `queue_timeout` seconds; past either bound they get LlmOverloaded straight
+    away. Background callers are already throttled upstream, so they wait as long as it takes.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, background_share: float = 0.5):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # At least one slot either way, and one kept free for interactive callers whenever there are two.
+        self.background_limit = max(1, min(max_concurrency - 1, int(max_concurrency * background_share)))
+        self.in_flight = 0
+        self.in_flight_background = 0
+        self.waiting = {"interactive": 0, "background": 0}
+        self._waiters: Dict[str, "deque[asyncio.Future]"] = {"interactive": deque(), "background": deque()}
+        # Moving average of completion time (seeded with a typical one), used to size Retry-After.
+        self._latency_seconds = 5.0
+
+    @property
+    def saturated(self) -> bool:
+        # Counted rather than read off the slots so that callers arriving in the same tick see each other.
+        queued = self.in_flight + self.waiting["interactive"] - self.max_concurrency
+        return queued >= self.max_queue
+
+    def retry_after(self) -> int:
+        backlog = self.waiting["interactive"] + self.waiting["background"] + 1
+        return min(60, max(1, math.ceil(self._latency_seconds * backlog / self.max_concurrency)))
+
+    def _reject(self, outcome: str) -> LlmOverloaded:
+        metrics.inc("resumeshortlist_llm_admissions_total", outcome=outcome)
+        return LlmOverloaded(self.retry_after())
+
+    def check(self) -> None:
+        """Fail fast, before any work is done, if an interactive caller would be turned away."""
+        if self.saturated:
+            raise self._reject("queue_full")
+
+    def _has_room(self, lane: str) -> bool:
+        if self.in_flight >= self.max_concurrency:
+            return False
+        return lane == "interactive" or self.in_flight_background < self.background_limit
+
+    def _take(self, lane: str) -> None:
+        self.in_flight += 1
+        if lane == "background":
+            self.in_flight_background += 1
+
+    def _release(self, lane: str) -> None:
+        self.in_flight -= 1
+        if lane == "background":
+            self.in_flight_background -= 1
+        self._grant()
+
+    def _grant(self) -> None:
+        """Hand free slots to waiters, interactive lane first; the slot is taken on the waiter's behalf."""
+        for lane in ("interactive", "background"):
+            waiters = self._waiters[lane]
+            while waiters and self._has_room(lane):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    self._take(lane)
+
+    async def _acquire(self, lane: str, timeout: Optional[float]) -> None:
+        # Skip the line only when nobody who would be served first is waiting.
+        served_first = ("interactive",) if lane == "interactive" else ("interactive", "background")
+        if self._has_room(lane) and not any(self._waiters[first] for first in served_first):
+            self._take(lane)
+            return
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters[lane].append(waiter)
+        # A timer rather than asyncio.wait_for, which on 3.11 swallows a cancellation that arrives just as the
+        # slot is granted.
+        timer = loop.call_later(timeout, self._expire, waiter) if timeout is not None else None
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # The slot was granted just as the wait ended; pass it on.
+                self._release(lane)
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters[lane].remove(waiter)
+                except ValueError:
+                    pass
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    @staticmethod
+    def _expire(waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_exception(asyncio.TimeoutError())
+
+    @asynccontextmanager
+    async def slot(self, interactive: bool = True):
+        if interactive:
+            self.check()
+        lane = "interactive" if interactive else "background"
+        queued_at = time.perf_counter()
+        self.waiting[lane] += 1
+        try:
+            await self._acquire(lane, self.queue_timeout if interactive else None)
+        except asyncio.TimeoutError:
+            raise self._reject("queue_timeout") from None
+        finally:
+            self.waiting[lane] -= 1
+        metrics.inc("resumeshortlist_llm_admissions_total", outcome="admitted")
+        metrics.observe("resumeshortlist_llm_queue_seconds", time.perf_counter() - queued_at, lane=lane)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(lane)
+            self._latency_seconds = 0.8 * self._latency_seconds + 0.2 * (time.perf_counter() - started)
+
+
+llm_admission = LlmAdmission(
+    max(1, OPENAI_MAX_CONCURRENCY // WEB_CONCURRENCY),
+    OPENAI_MAX_QUEUE,
+    OPENAI_QUEUE_TIMEOUT_SECONDS,
+    OPENAI_BACKGROUND_SHARE,
+)
+metrics.add_collector(
+    lambda: [
+        (
+            "resumeshortlist_llm_in_flight",
+            "gauge",
+            "LLM completions running in this process, by lane.",
+            [
+                ({"lane": "interactive"}, llm_admission.in_flight - llm_admission.in_flight_background),
+                ({"lane": "background"}, llm_admission.in_flight_background),
+            ],
+        ),
+        (
+            "resumeshortlist_llm_waiting",
+            "gauge",
+            "Callers waiting for an LLM slot, by lane.",
+            [({"lane": lane}, count) for lane, count in llm_admission.waiting.items()],
+        ),
+    ]
+)
+
+MONGO_URL = os.environ.get("MONGO_URL")
+DB_NAME = os.environ.get("DB_NAME", "resumeshortlist")
+# Seconds after startup before warm_up_services() builds the clients; 0 starts as soon as the app is serving.
+WARM_UP_DELAY_SECONDS = float(os.environ.get("WARM_UP_DELAY_SECONDS", "0"))
+# On shutdown (SIGTERM), how long queue workers and background uploads get to finish before they are
+# cancelled. Keep it under the process manager's grace period (gunicorn graceful_timeout, k8s terminationGracePeriodSeconds).
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", "20"))
+
+
+class ServiceContainer:
+    """Per-process resources: third-party clients and the long-running worker tasks.
+
+    SDKs are imported and their clients constructed on first use, so importing this module costs little
+    more than FastAPI and a cold instance (and every extraction pool worker) answers /api/health straight
+    away. warm_up() builds everything ahead of the first real request; it runs on a worker thread once the
+    app is serving. The app lifespan starts the workers through start_workers() and, on shutdown, drain()
+    lets each finish the job in hand before the clients are closed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._instances: Dict[str, Any] = {}
+        self._tasks: Dict[str, List[asyncio.Task]] = {}
+        self.warmed_up = asyncio.Event()
+        self.draining = asyncio.Event()
+
+    def _get(self, name: str, build):
+        if name not in self._instances:
+            with self._lock:
+                if name not in self._instances:
+                    with timed_stage(f"init_{name}"):
+                        self._instances[name] = build()
+        return self._instances[name]
+
+    @property
+    def stripe(self):
+        def build():
+            import stripe
+
+            stripe.api_key = STRIPE_SECRET_KEY
+            return stripe
+
+        return self._get("stripe", build)
+
+    @property
+    def openai(self):
+        """The AsyncOpenAI client, or None without OPENAI_API_KEY."""
+
+        def build():
+            if not OPENAI_API_KEY:
+                return None
+            from openai import AsyncOpenAI
+
+            # Retries are handled in _llm_json_completion with awaitable backoff, so the SDK's own retry loop is disabled.
+            return AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT_SECONDS, max_retries=0)
+
+        return self._get("openai", build)
+
+    @property
+    def mongo_client(self):
+        def build():
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            # Motor connects lazily too; this only parses the URL and sets up the pool.
+            return AsyncIOMotorClient(MONGO_URL)
+
+        return self._get("mongo_client", build)
+
+    @property
+    def db(self):
+        return self._get("db", lambda: self.mongo_client[DB_NAME])
+
+    def warm_up(self) -> None:
+        """Import every SDK and build every configured client. Blocking; call it from a worker thread."""
+        steps = [("stripe", lambda: self.stripe), ("openai", lambda: self.openai), ("r2", _r2_client)]
+        if MONGO_URL:
+            steps.append(("mongo", lambda: self.db))
+        steps += [("prescore", _tier_matrix), ("extractors", _import_extractors)]
+        if OPENAI_API_KEY:
+            # tiktoken fetches its BPE file on first use; do that here rather than inside the first request.
+            steps.append(("tokenizer", _token_encoder))
+        for name, step in steps:
+            try:
+                step()
+            except Exception as e:
+                logger.error(f"Warm-up of {name} failed; it will be retried on first use: {e!r}")
+
+    def start_workers(self, name: str, count: int, worker) -> None:
+        self._tasks.setdefault(name, []).extend(asyncio.create_task(worker(worker_id)) for worker_id in range(count))
+
+    def worker_counts(self) -> Dict[str, int]:
+        return {name: sum(1 for task in tasks if not task.done()) for name, tasks in self._tasks.items()}
+
+    async def drain(self, timeout: float) -> None:
+        """Ask every worker to stop after its current job; cancel whatever is still running after `timeout`."""
+        self.draining.set()
+        tasks = [task for group in self._tasks.values() for task in group]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=max(0.0, timeout))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def close(self) -> None:
+        client = self._instances.pop("mongo_client", None)
+        self._instances.pop("db", None)
+        if client is not None:
+            client.close()
+
+
+services = ServiceContainer()
+
+
+class _LazyDatabase:
+    """Stands in for the Motor database until it is first used, so `db.collection` works as before."""
+
+    def __getattr__(self, name: str):
+        return getattr(services.db, name)
+
+    def __getitem__(self, name: str):
+        return services.db[name]
+
+
+db = _LazyDatabase() if MONGO_URL else None
+if db is None:
     logger.warning("MONGO_URL not set. Running without DB persistence.")
 
-app = FastAPI()
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+UPLOAD_SPOOL_THRESHOLD_BYTES = int(os.environ.get("UPLOAD_SPOOL_THRESHOLD_BYTES", str(1024 * 1024)))
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR") or None
+UPLOAD_CHUNK_BYTES = 256 * 1024
+# Multipart framing and the name/email form fields ride along with the file.
+REQUEST_BODY_SLACK_BYTES = 64 * 1024
+# /api/analyze/batch takes many files (or one zip) per request.
+BATCH_MAX_UPLOAD_BYTES = int(float(os.environ.get("BATCH_MAX_UPLOAD_MB", "250")) * 1024 * 1024)
+
+
+class RequestContextMiddleware:
+    """Tag each request with an X-Request-ID (reused from the caller when present) and record HTTP metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for header, value in scope.get("headers") or []:
+            if header == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        token = request_id_var.set(request_id or uuid.uuid4().hex)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id_var.get().encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded; unmatched paths share one label.
+            route_label = getattr(route, "path", None) or "unmatched"
+            metrics.observe("resumeshortlist_http_request_seconds", time.perf_counter() - started, route=route_label)
+            metrics.inc(
+                "resumeshortlist_http_requests_total",
+                route=route_label,
+                method=scope["method"],
+                status=str(status_code),
+            )
+            request_id_var.reset(token)
+
+
+class BodySizeLimitMiddleware:
+    """Reject oversized request bodies before they are parsed or spooled.
+
+    A Content-Length over the limit is refused up front; chunked bodies are counted as they arrive
+    and cut off as soon as they cross the limit. `path_limits` overrides the limit for exact paths.
+    """
+
+    def __init__(self, app, max_body_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        max_body_bytes = self.path_limits.get(scope["path"], self.max_body_bytes)
+        for header, value in scope.get("headers") or []:
+            if header == b"content-length" and value.isdigit() and int(value) > max_body_bytes:
+                await self._reject(send, max_body_bytes)
+                return
+
+        received = 0
+        response_started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    # Answer here rather than raise: an exception would surface inside the app's body parser,
+                    # which turns it into a 400. The app sees a disconnect and whatever it sends is dropped.
+                    rejected = True
+                    if not response_started:
+                        await self._reject(send, max_body_bytes)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            # The app may fail on the disconnect it was handed; the 413 has already been sent.
+            if not rejected:
+                raise
+
+    async def _reject(self, send, max_body_bytes: int) -> None:
+        limit_mb = max_body_bytes // (1024 * 1024)
+        body = json.dumps({"detail": f"Upload too large. The limit is {limit_mb} MB."}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+RATE_LIMITS_ENABLED = os.environ.get("RATE_LIMITS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Reverse proxies in front of the app that append to X-Forwarded-For; 0 trusts only the socket peer address.
+# Per-IP limits are keyed on the client address, so behind a proxy this must be set (Render: 1, which
+# gunicorn.conf.py defaults to), or every visitor shares the proxy's bucket.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+RATE_LIMIT_LOCAL_BUCKETS = 10000
+
+
+def _rate_limit_setting(name: str, default: str) -> tuple:
+    """RATE_LIMIT_<NAME>="<burst>/<per hour>" as (bucket size, tokens refilled per second)."""
+    burst, per_hour = os.environ.get(f"RATE_LIMIT_{name}", default).split("/")
+    return float(burst), float(per_hour) / 3600
+
+
+RATE_LIMITS = {
+    "analyze_ip": _rate_limit_setting("ANALYZE_IP", "20/120"),
+    "analyze_email": _rate_limit_setting("ANALYZE_EMAIL", "5/30"),
+    "batch_ip": _rate_limit_setting("BATCH_IP", "3/12"),
+    # Charged one token per file in the batch.
+    "batch_email": _rate_limit_setting("BATCH_EMAIL", "1000/2000"),
+}
+# Per-IP limits are taken in AdmissionControlMiddleware, before the upload is read; per-email limits once
+# the form has been validated.
+RATE_LIMITED_PATHS = {"/api/analyze": "analyze_ip", "/api/analyze/jobs": "analyze_ip", "/api/analyze/batch": "batch_ip"}
+# Answered by an LLM call within the request, so these fail fast with 503 while the LLM wait line is full.
+LLM_ADMISSION_PATHS = ("/api/analyze",)
+
+
+class RateLimited(Exception):
+    """The caller's token bucket is empty; answered with 429 and Retry-After."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Rate limited; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    """Token buckets kept in Mongo (rate_limits) so every worker process draws from the same budget.
+
+    A single pipeline find_one_and_update refills the bucket for the time elapsed and takes the tokens,
+    so concurrent requests cannot overdraw it. Without Mongo, or when it errors, buckets are held
+    in-process instead.
+    """
+
+    def __init__(self, rules: Dict[str, tuple]):
+        self.rules = rules
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def _take_shared(self, key: str, burst: float, rate: float, cost: float, now: float) -> tuple:
+        from pymongo import ReturnDocument
+
+        refilled = {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [{"$subtract": [now, {"$ifNull": ["$refilled_at", now]}]}, rate]}]}
+        bucket = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": {"$min": [burst, refilled]}, "refilled_at": now}},
+                {
+                    "$set": {
+                        "allowed": {"$gte": ["$tokens", cost]},
+                        "tokens": {"$cond": [{"$gte": ["$tokens", cost]}, {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                        # A bucket left alone until it is full again is indistinguishable from a new one.
+                        "expires_at": datetime.fromtimestamp(now + burst / rate, timezone.utc),
+                    }
+                },
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return bucket["tokens"], bucket["allowed"]
+
+    def _take_local(self, key: str, burst: float, rate: float, cost: float, now: float) -> tuple:
+        tokens, refilled_at = self._local.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - refilled_at) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._local[key] = (tokens, now)
+        while len(self._local) > RATE_LIMIT_LOCAL_BUCKETS:
+            self._local.popitem(last=False)
+        return tokens, allowed
+
+    async def take(self, rule: str, subject: str, cost: float = 1.0) -> None:
+        """Spend `cost` tokens from `subject`'s bucket for `rule`, or raise RateLimited."""
+        if not RATE_LIMITS_ENABLED:
+            return
+        burst, rate = self.rules[rule]
+        # A request bigger than the whole bucket waits for a full bucket rather than never fitting.
+        cost = min(cost, burst)
+        key = f"{rule}:{subject}"
+        now = time.time()
+        result = None
+        if db is not None:
+            try:
+                result = await self._take_shared(key, burst, rate, cost, now)
+            except Exception as e:
+                logger.error(f"Rate limit lookup failed for {rule}; using the in-process bucket: {e}")
+        tokens, allowed = result or self._take_local(key, burst, rate, cost, now)
+        if not allowed:
+            metrics.inc("resumeshortlist_rate_limited_total", rule=rule)
+            raise RateLimited(max(1, math.ceil((cost - tokens) / rate)))
+
+
+rate_limiter = TokenBucketLimiter(RATE_LIMITS)
+
+
+_untrusted_forwarding_reported = False
+
+
+def _client_ip(scope) -> str:
+    global _untrusted_forwarding_reported
+    for header, value in scope.get("headers") or []:
+        if header == b"x-forwarded-for":
+            if not RATE_LIMIT_TRUSTED_PROXIES:
+                if not _untrusted_forwarding_reported:
+                    _untrusted_forwarding_reported = True
+                    logger.error(
+                        "Requests arrive through a proxy (X-Forwarded-For) but RATE_LIMIT_TRUSTED_PROXIES is 0, so "
+                        "per-IP rate limits apply to the proxy address and all clients share one bucket. Set it to "
+                        "the number of proxies in front of the app."
+                    )
+                break
+            hops = [hop.strip() for hop in value.decode("latin-1").split(",") if hop.strip()]
+            if hops:
+                # Each trusted proxy appends its peer, so the client is the entry just before theirs.
+                return hops[max(0, len(hops) - RATE_LIMIT_TRUSTED_PROXIES)]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _email_subject(email: str) -> str:
+    return hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()[:32]
+
+
+def _admission_error_response(exc: Union[RateLimited, LlmOverloaded]) -> JSONResponse:
+    if isinstance(exc, RateLimited):
+        status_code, detail = 429, "Too many requests. Please try again later."
+    else:
+        status_code, detail = 503, "The analyzer is at capacity. Please try again shortly."
+    return JSONResponse({"detail": detail}, status_code=status_code, headers={"Retry-After": str(exc.retry_after)})
+
+
+class AdmissionControlMiddleware:
+    """Turn away expensive requests before their bodies are read.
+
+    Paths in `llm_paths` get 503 while the LLM wait line is full; paths in `path_rules` get 429 once the
+    client IP has spent its token bucket. Both responses carry Retry-After.
+    """
+
+    def __init__(self, app, path_rules: Dict[str, str], llm_paths: tuple = ()):
+        self.app = app
+        self.path_rules = path_rules
+        self.llm_paths = llm_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        try:
+            if path in self.llm_paths:
+                llm_admission.check()
+            if path in self.path_rules:
+                await rate_limiter.take(self.path_rules[path], _client_ip(scope))
+        except (RateLimited, LlmOverloaded) as e:
+            await _admission_error_response(e)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "512"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+# Quality 4-5 is the usual choice for on-the-fly Brotli: close to gzip -9 in size at gzip -6 speed.
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "5"))
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+
+
+def _accepted_encodings(scope) -> set:
+    for header, value in scope.get("headers") or []:
+        if header == b"accept-encoding":
+            accepted = set()
+            for part in value.decode("latin-1").lower().split(","):
+                coding, _, params = part.strip().partition(";")
+                if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                    accepted.add(coding.strip())
+            return accepted
+    return set()
+
+
+class JSONCompressionMiddleware:
+    """Brotli- or gzip-encode JSON responses, whichever the client accepts (Brotli preferred).
+
+    Only complete application/json bodies of at least `minimum_size` bytes are touched. Streaming responses
+    (NDJSON batches, server-sent events) pass through as they are, so each line still reaches the client
+    as soon as it is written.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted_encodings(scope)
+        encoding = "br" if BROTLI_AVAILABLE and "br" in accepted else "gzip" if "gzip" in accepted else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def compressing_send(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            pending, start = start, None
+            headers = MutableHeaders(scope=pending)
+            body = message.get("body", b"")
+            if (
+                message.get("more_body")
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith("application/json")
+                or len(body) < self.minimum_size
+            ):
+                await send(pending)
+                await send(message)
+                return
+            if encoding == "br":
+                import brotli
+
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            metrics.inc("resumeshortlist_compressed_responses_total", encoding=encoding)
+            await send(pending)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, compressing_send)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup and shutdown steps are defined at the end of this module, next to the workers they manage.
+    await _start_background_services()
+    try:
+        yield
+    finally:
+        await _stop_background_services()
+
+
+app = FastAPI(lifespan=lifespan)
 
 VERCEL_PREVIEW_REGEX = r"^https:\/\/resumeshortlist(?:-ai)?(?:-[a-z0-9]+-shortlistais-projects)?\.vercel\.app$"
 cors_raw = os.environ.get("CORS_ORIGINS", "")
@@ -58,6 +865,15 @@ for local in ["http://localhost:3000", "http://127.0.0.1:3000"]:
     if local not in allow_origins:
         allow_origins.append(local)
 
+# Innermost, so it sees the handler's own JSONResponse and nothing else rewrites the body afterwards.
+app.add_middleware(JSONCompressionMiddleware)
+# Registered before CORS so CORS stays outermost and 413/429/503 responses still carry CORS headers.
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_bytes=MAX_UPLOAD_BYTES + REQUEST_BODY_SLACK_BYTES,
+    path_limits={"/api/analyze/batch": BATCH_MAX_UPLOAD_BYTES + REQUEST_BODY_SLACK_BYTES},
+)
+app.add_middleware(AdmissionControlMiddleware, path_rules=RATE_LIMITED_PATHS, llm_paths=LLM_ADMISSION_PATHS)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -65,11 +881,17 @@ app.add_middleware(
     allow_origin_regex=VERCEL_PREVIEW_REGEX,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(RequestContextMiddleware)
 
 api_router = APIRouter(prefix="/api")
 
 
+class BulkRevisionRequest(BaseModel):
+    upload_ids: List[str] = Field(..., min_length=1, max_length=200)
+
+
 class CheckoutRequest(BaseModel):
     price_key: str
     include_interview_prep: bool = False
@@ -79,286 +901,2883 @@ class CheckoutRequest(BaseModel):
     phone: Optional[str] = None
 
 
-def extract_text_from_pdf(file_content: bytes) -> str:
+class GapFinding(BaseModel):
+    category: str = ""
+    finding: str
+
+
+class AnalysisResult(BaseModel):
+    score: int = Field(..., ge=0, le=100)
+    summary: str
+    suggested_tier: str
+    bullet_recommendations: List[str]
+    gap_analysis: List[GapFinding]
+
+
+class AnalysisResponse(AnalysisResult):
+    upload_id: str
+    filename: Optional[str] = None
+
+
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACT_TIMEOUT_SECONDS = float(os.environ.get("EXTRACT_TIMEOUT_SECONDS", "15"))
+EXTRACT_MAX_PDF_PAGES = int(os.environ.get("EXTRACT_MAX_PDF_PAGES", "40"))
+# Long PDFs are split into runs of this many pages, parsed on separate pool workers.
+EXTRACT_PDF_PAGES_PER_TASK = int(os.environ.get("EXTRACT_PDF_PAGES_PER_TASK", "4"))
+# Once the leading pages hold this much text, the rest are skipped: it is far more than the analysis prompt
+# (ANALYSIS_INPUT_TOKEN_BUDGET tokens) can carry even after cleanup.
+EXTRACT_ENOUGH_TEXT_CHARS = int(os.environ.get("EXTRACT_ENOUGH_TEXT_CHARS", "60000"))
+
+# Pages without a text layer (scans, image exports) go to a separate, smaller OCR pool so slow OCR never
+# holds the parsing workers.
+OCR_ENABLED = (
+    os.environ.get("OCR_ENABLED", "true").lower() in ("1", "true", "yes")
+    and importlib.util.find_spec("pytesseract") is not None
+)
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "1"))
+OCR_MAX_PAGES = int(os.environ.get("OCR_MAX_PAGES", "3"))
+OCR_MAX_PENDING_PAGES = int(os.environ.get("OCR_MAX_PENDING_PAGES", "12"))
+OCR_TIMEOUT_SECONDS = float(os.environ.get("OCR_TIMEOUT_SECONDS", "30"))
+OCR_LANGUAGE = os.environ.get("OCR_LANGUAGE", "eng")
+OCR_MIN_PAGE_CHARS = 16
+
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+_ocr_pending_pages = 0
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def _raise_extraction_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+DocumentSource = Union[bytes, str]
+
+
+def _document_stream(source: DocumentSource):
+    """Parsers accept raw bytes for small in-memory uploads, or the path of a spooled upload."""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def _extract_pdf_pages(source: DocumentSource, start: int, stop: int) -> tuple:
+    """(page count, text of pages start..stop), capped at EXTRACT_MAX_PDF_PAGES."""
+    import pypdf
+
+    pages = pypdf.PdfReader(_document_stream(source)).pages
+    stop = min(stop, len(pages), EXTRACT_MAX_PDF_PAGES)
+    return len(pages), [pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def extract_text_from_pdf(source: DocumentSource) -> str:
     try:
-        pdf_reader = pypdf.PdfReader(io.BytesIO(file_content))
-        text = ""
-        for page in pdf_reader.pages:
-            text += (page.extract_text() or "") + "\n"
-        return text
+        page_count, texts = _extract_pdf_pages(source, 0, EXTRACT_MAX_PDF_PAGES)
+        if page_count > EXTRACT_MAX_PDF_PAGES:
+            logger.warning(f"PDF has {page_count} pages; extracting the first {EXTRACT_MAX_PDF_PAGES}.")
+        # Form feeds keep page boundaries so repeated headers and footers can be found before the LLM call.
+        return "\f".join(texts)
+    except ExtractionTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error reading PDF: {e}")
         return ""
 
 
-def extract_text_from_docx(file_content: bytes) -> str:
+def extract_text_from_docx(source: DocumentSource) -> str:
+    import docx
+
     try:
-        d = docx.Document(io.BytesIO(file_content))
+        d = docx.Document(_document_stream(source))
         return "\n".join([(p.text or "") for p in d.paragraphs])
+    except ExtractionTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error reading DOCX: {e}")
         return ""
 
 
-def _fallback_analysis() -> Dict[str, Any]:
-    return {
-        "score": 65,
-        "summary": "Automated analysis unavailable. Add more measurable impact and tighten targeting.",
-        "suggested_tier": "MID",
-        "bullet_recommendations": [
-            "Add hard metrics ($, %, volume, team size) to each role.",
-            "Replace passive phrasing with leadership verbs (Led, Owned, Delivered).",
-            "Strengthen the top section: headline + 6–10 role-specific keywords.",
-            "Reduce density: 3–5 bullets per role, one line each where possible.",
-        ],
-        "gap_analysis": [
-            {"category": "Impact", "finding": "The resume lists responsibilities more than quantified outcomes."},
-            {"category": "Targeting", "finding": "Keywords and role signals are too broad for recruiter filtering."},
-            {"category": "Clarity", "finding": "Bullets are dense; key wins are not immediately scannable."},
-        ],
-    }
+def ocr_pdf_page(source: DocumentSource, index: int, timeout: float = OCR_TIMEOUT_SECONDS) -> str:
+    """OCR the images on one PDF page with Tesseract. Needs pytesseract, Pillow and the tesseract binary."""
+    import pypdf
+    import pytesseract
 
+    page = pypdf.PdfReader(_document_stream(source)).pages[index]
+    texts = []
+    for image in page.images:
+        texts.append(pytesseract.image_to_string(image.image, lang=OCR_LANGUAGE, timeout=timeout))
+    return "\n".join(text.strip() for text in texts if text.strip())
 
-def _price_id_for_key(key: str) -> Optional[str]:
-    normalized = (key or "").strip().upper()
-    return os.environ.get(f"STRIPE_PRICE_{normalized}") or os.environ.get(f"PRICE_{normalized}")
 
+def _import_extractors() -> None:
+    import docx  # noqa: F401
+    import pypdf  # noqa: F401
 
-def _interview_price_id() -> Optional[str]:
-    return os.environ.get("STRIPE_PRICE_INTERVIEW") or os.environ.get("PRICE_INTERVIEW")
 
+def _with_alarm(timeout: float, func, *args):
+    """Runs inside an extraction pool process. SIGALRM aborts a parse that overruns its budget."""
+    if not hasattr(signal, "setitimer"):
+        return func(*args)
+    previous = signal.signal(signal.SIGALRM, _raise_extraction_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
 
-def _openai_analyze(text: str) -> Dict[str, Any]:
-    if not openai_client:
-        return _fallback_analysis()
 
-    system_msg = """
-Return ONLY valid JSON:
-{
-  "score": 0-100,
-  "summary": "2 sentences",
-  "suggested_tier": "ENTRY|MID|SENIOR|EXEC|CSUITE",
-  "bullet_recommendations": ["...", "...", "...", "..."],
-  "gap_analysis": [
-    {"category":"Impact","finding":"..."},
-    {"category":"ATS Compliance","finding":"..."},
-    {"category":"Targeting","finding":"..."}
-  ]
-}
-Be strict. Typical score 45–65.
-""".strip()
+def _extract_document_worker(kind: str, source: DocumentSource, timeout: float) -> str:
+    extractor = extract_text_from_pdf if kind == "pdf" else extract_text_from_docx
+    return _with_alarm(timeout, extractor, source)
+
+
+def _extract_pdf_pages_worker(source: DocumentSource, start: int, stop: int, timeout: float) -> tuple:
+    try:
+        return _with_alarm(timeout, _extract_pdf_pages, source, start, stop)
+    except ExtractionTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading PDF pages {start}-{stop}: {e}")
+        return 0, []
+
+
+def _ocr_page_worker(source: DocumentSource, index: int, timeout: float) -> Optional[str]:
+    # Tesseract runs as a subprocess that pytesseract kills on timeout, so no alarm is needed here.
+    try:
+        return ocr_pdf_page(source, index, timeout)
+    except Exception as e:
+        logger.error(f"OCR of PDF page {index} failed: {e}")
+        return None
+
+
+def _spawn_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+
+
+def _terminate_pool(pool: Optional[ProcessPoolExecutor]) -> None:
+    """Kill switch: terminate every worker so a wedged parse cannot hold a core."""
+    if pool is None:
+        return
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+    global _extract_pool
+    if _extract_pool is None:
+        _extract_pool = _spawn_pool(EXTRACT_WORKERS)
+    return _extract_pool
+
+
+def _reset_extract_pool() -> None:
+    global _extract_pool
+    pool, _extract_pool = _extract_pool, None
+    _terminate_pool(pool)
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = _spawn_pool(OCR_WORKERS)
+    return _ocr_pool
+
+
+def _reset_ocr_pool() -> None:
+    global _ocr_pool
+    pool, _ocr_pool = _ocr_pool, None
+    _terminate_pool(pool)
+
+
+async def _extract_pdf_text_layer(source: DocumentSource, deadline: float) -> List[str]:
+    """Per-page text, with runs of EXTRACT_PDF_PAGES_PER_TASK pages parsed in parallel.
+
+    The first run also reports the page count, so a short resume is still a single pool task. Runs are
+    consumed in page order and the remainder is cancelled once EXTRACT_ENOUGH_TEXT_CHARS have been read.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_extract_pool()
+
+    # With a single worker, splitting would only add re-parses, so the document stays one task.
+    pages_per_task = EXTRACT_PDF_PAGES_PER_TASK if EXTRACT_WORKERS > 1 else EXTRACT_MAX_PDF_PAGES
+
+    def submit(start: int):
+        budget = max(0.1, deadline - time.monotonic())
+        stop = start + pages_per_task
+        return loop.run_in_executor(pool, _extract_pdf_pages_worker, source, start, stop, budget)
+
+    page_count, pages = await submit(0)
+    if page_count > EXTRACT_MAX_PDF_PAGES:
+        logger.warning(f"PDF has {page_count} pages; extracting the first {EXTRACT_MAX_PDF_PAGES}.")
+    chars = sum(len(page) for page in pages)
+    pending = []
+    if chars < EXTRACT_ENOUGH_TEXT_CHARS:
+        last_page = min(page_count, EXTRACT_MAX_PDF_PAGES)
+        pending = [submit(start) for start in range(len(pages), last_page, pages_per_task)]
+    try:
+        for future in pending:
+            _, texts = await future
+            pages.extend(texts)
+            chars += sum(len(text) for text in texts)
+            if chars >= EXTRACT_ENOUGH_TEXT_CHARS:
+                metrics.inc("resumeshortlist_pdf_early_exits_total")
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+    return pages
+
+
+async def _ocr_blank_pages(source: DocumentSource, pages: List[str]) -> List[str]:
+    """Fill in pages that have no text layer from the OCR lane, up to OCR_MAX_PAGES per document.
+
+    When OCR_MAX_PENDING_PAGES are already queued the document is not OCRed at all rather than waiting.
+    """
+    global _ocr_pending_pages
+    blank = [index for index, text in enumerate(pages) if len(text.strip()) < OCR_MIN_PAGE_CHARS][:OCR_MAX_PAGES]
+    if not blank or not OCR_ENABLED or sum(len(text) for text in pages) >= EXTRACT_ENOUGH_TEXT_CHARS:
+        return pages
+    if _ocr_pending_pages + len(blank) > OCR_MAX_PENDING_PAGES:
+        metrics.inc("resumeshortlist_ocr_pages_total", len(blank), outcome="shed")
+        logger.warning(f"OCR lane is full; skipping {len(blank)} page(s) without a text layer.")
+        return pages
+
+    loop = asyncio.get_running_loop()
+    pool = _get_ocr_pool()
+    _ocr_pending_pages += len(blank)
+
+    async def ocr(index: int) -> None:
+        outcome = "error"
+        try:
+            future = loop.run_in_executor(pool, _ocr_page_worker, source, index, OCR_TIMEOUT_SECONDS)
+            text = await asyncio.wait_for(future, timeout=OCR_TIMEOUT_SECONDS + 5)
+            if text is not None:
+                outcome = "ok" if text.strip() else "empty"
+                if text.strip():
+                    pages[index] = text
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.error(f"OCR of page {index} did not finish in {OCR_TIMEOUT_SECONDS}s; recycling OCR workers.")
+            _reset_ocr_pool()
+        except BrokenProcessPool as e:
+            logger.error(f"OCR pool broke ({e}); recycling workers.")
+            _reset_ocr_pool()
+        finally:
+            metrics.inc("resumeshortlist_ocr_pages_total", outcome=outcome)
+
+    try:
+        with timed_stage("ocr"):
+            await asyncio.gather(*(ocr(index) for index in blank))
+    finally:
+        _ocr_pending_pages -= len(blank)
+    return pages
+
+
+async def extract_document_text(kind: str, source: DocumentSource) -> str:
+    """Parse a PDF or DOCX on the extraction process pool without blocking the event loop.
+
+    PDFs are parsed page-parallel, and pages with no text layer are then OCRed on their own pool (outside
+    the parse deadline). Raises ExtractionTimeout when the document cannot be parsed within
+    EXTRACT_TIMEOUT_SECONDS.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = time.monotonic() + EXTRACT_TIMEOUT_SECONDS
+    if kind == "pdf":
+        parse = _extract_pdf_text_layer(source, deadline)
+    else:
+        parse = loop.run_in_executor(_get_extract_pool(), _extract_document_worker, kind, source, EXTRACT_TIMEOUT_SECONDS)
+    try:
+        # The workers enforce the timeout themselves; the outer deadline only fires if a parse is stuck in C code.
+        result = await asyncio.wait_for(parse, timeout=EXTRACT_TIMEOUT_SECONDS + 5)
+    except asyncio.TimeoutError:
+        logger.error(f"{kind.upper()} extraction did not finish in {EXTRACT_TIMEOUT_SECONDS}s; recycling workers.")
+        _reset_extract_pool()
+        raise ExtractionTimeout()
+    except BrokenProcessPool as e:
+        logger.error(f"Extraction pool broke ({e}); recycling workers.")
+        _reset_extract_pool()
+        return ""
+    if kind != "pdf":
+        return result
+    # Form feeds keep page boundaries so repeated headers and footers can be found before the LLM call.
+    return "\f".join(await _ocr_blank_pages(source, result))
+
+
+class SpooledUpload:
+    """An upload copied off the request in fixed-size chunks.
+
+    Small files stay in memory; once memory_limit (UPLOAD_SPOOL_THRESHOLD_BYTES by default) is crossed the
+    data moves to a named temp file so parsers (including extraction pool workers) can read it by path
+    without another copy.
+    """
+
+    def __init__(
+        self, filename: Optional[str], content_type: Optional[str], memory_limit: int = UPLOAD_SPOOL_THRESHOLD_BYTES
+    ):
+        self.filename = filename
+        self.content_type = content_type or "application/octet-stream"
+        self.memory_limit = memory_limit
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.path: Optional[str] = None
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file = None
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self.sha256.update(chunk)
+        if self._buffer is not None and self._buffer.tell() + len(chunk) > self.memory_limit:
+            self._file = tempfile.NamedTemporaryFile(prefix="upload-", dir=UPLOAD_SPOOL_DIR, delete=False)
+            self.path = self._file.name
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        if self._buffer is not None:
+            self._buffer.write(chunk)
+        else:
+            self._file.write(chunk)
+
+    def finish(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._buffer.tell() if self._buffer is not None else 0
+
+    @property
+    def source(self) -> DocumentSource:
+        return self._buffer.getvalue() if self._buffer is not None else self.path
+
+    def open(self):
+        """A fresh binary reader over the upload, for streaming it elsewhere (e.g. to R2)."""
+        if self._buffer is not None:
+            return io.BytesIO(self._buffer.getbuffer())
+        return open(self.path, "rb")
+
+    def read_bytes(self) -> bytes:
+        with self.open() as handle:
+            return handle.read()
+
+    def close(self) -> None:
+        self.finish()
+        self._buffer = None
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+async def spool_upload(
+    file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES, memory_limit: int = UPLOAD_SPOOL_THRESHOLD_BYTES
+) -> SpooledUpload:
+    """Copy an UploadFile into a SpooledUpload chunk by chunk, failing with 413 once max_bytes is exceeded."""
+    spool = SpooledUpload(file.filename, file.content_type, memory_limit)
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            if spool.size + len(chunk) > max_bytes:
+                raise HTTPException(
+                    status_code=413, detail=f"Upload too large. The limit is {max_bytes // (1024 * 1024)} MB."
+                )
+            if spool.size + len(chunk) > memory_limit:
+                await asyncio.to_thread(spool.write, chunk)
+            else:
+                spool.write(chunk)
+        spool.finish()
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+PRICE_TIERS = ("ENTRY", "MID", "SENIOR", "EXEC", "CSUITE", "INTERVIEW")
+
+
+def _load_price_table() -> Mapping[str, str]:
+    """Tier -> Stripe price ID, read once at import and frozen.
+
+    STRIPE_PRICE_TABLE may point at the JSON written by setup_stripe.py / setup_stripe_cad.py --output;
+    otherwise (and for tiers missing from the file) STRIPE_PRICE_<TIER> or PRICE_<TIER> is used.
+    Entries that are not price_ IDs are dropped so checkout reports them as missing.
+    """
+    prices: Dict[str, str] = {}
+    table_path = os.environ.get("STRIPE_PRICE_TABLE")
+    if table_path:
+        try:
+            prices.update(json.loads(Path(table_path).read_text()).get("prices") or {})
+        except Exception as e:
+            logger.error(f"Could not read STRIPE_PRICE_TABLE {table_path}: {e}")
+    for tier in PRICE_TIERS:
+        prices.setdefault(tier, os.environ.get(f"STRIPE_PRICE_{tier}") or os.environ.get(f"PRICE_{tier}") or "")
+
+    table = {}
+    for tier, price_id in prices.items():
+        tier = tier.strip().upper()
+        if str(price_id).startswith("price_"):
+            table[tier] = price_id
+        elif price_id:
+            logger.error(f"Ignoring invalid Stripe price for {tier}: expected price_..., got {price_id!r}")
+    missing = [tier for tier in PRICE_TIERS if tier not in table]
+    if STRIPE_SECRET_KEY and missing:
+        logger.warning(f"No Stripe price configured for: {', '.join(missing)}")
+    return MappingProxyType(table)
+
+
+STRIPE_PRICE_TABLE = _load_price_table()
+
+
+STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+PAYMENT_STATUS_CACHE_SIZE = 4096
+# Paid is final. Unpaid can flip within seconds (webhook lag, delayed payment methods), so it is held briefly.
+PAYMENT_PAID_TTL_SECONDS = 3600
+PAYMENT_UNPAID_TTL_SECONDS = float(os.environ.get("PAYMENT_UNPAID_TTL_SECONDS", "10"))
+STRIPE_PAID_EVENTS = ("checkout.session.completed", "checkout.session.async_payment_succeeded")
+
+
+class TTLCache:
+    """Small in-process LRU whose entries each carry their own expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+payment_status_cache = TTLCache(PAYMENT_STATUS_CACHE_SIZE)
+
+
+def _session_email(session: Dict[str, Any]) -> Optional[str]:
+    return (session.get("customer_details") or {}).get("email")
+
+
+async def _record_payment(session: Dict[str, Any], recorded_by: str) -> bool:
+    """Mark the session's order paid. Only the first caller writes; later webhooks and verifications are no-ops."""
+    upload_id = session.get("client_reference_id") or (session.get("metadata") or {}).get("upload_id")
+    if db is None or not upload_id:
+        return False
+    result = await db.resume_requests.update_one(
+        {"upload_id": upload_id, "payment.status": {"$ne": "paid"}},
+        {
+            "$set": {
+                "payment": {
+                    "session_id": session["id"],
+                    "status": "paid",
+                    "paid_at": datetime.now(timezone.utc),
+                    "email": _session_email(session),
+                    "amount_total": session.get("amount_total"),
+                    "currency": session.get("currency"),
+                    "recorded_by": recorded_by,
+                },
+                "status": "paid",
+            }
+        },
+    )
+    return result.modified_count == 1
+
+
+ANALYSIS_SYSTEM_PROMPT = """
+Return ONLY valid JSON:
+{
+  "score": 0-100,
+  "summary": "2 sentences",
+  "suggested_tier": "ENTRY|MID|SENIOR|EXEC|CSUITE",
+  "bullet_recommendations": ["...", "...", "...", "..."],
+  "gap_analysis": [
+    {"category":"Impact","finding":"..."},
+    {"category":"ATS Compliance","finding":"..."},
+    {"category":"Targeting","finding":"..."}
+  ]
+}
+Be strict. Typical score 45–65.
+""".strip()
+PACKED_ANALYSIS_SYSTEM_PROMPT = """
+You will receive several resumes, each introduced by a line "### Resume <n>". Analyze each one independently.
+Return ONLY valid JSON with one entry per resume, in order:
+{
+  "results": [
+    {
+      "resume": <n>,
+      "score": 0-100,
+      "summary": "2 sentences",
+      "suggested_tier": "ENTRY|MID|SENIOR|EXEC|CSUITE",
+      "bullet_recommendations": ["...", "...", "...", "..."],
+      "gap_analysis": [
+        {"category":"Impact","finding":"..."},
+        {"category":"ATS Compliance","finding":"..."},
+        {"category":"Targeting","finding":"..."}
+      ]
+    }
+  ]
+}
+Be strict. Typical score 45–65.
+""".strip()
+# Bump whenever ANALYSIS_SYSTEM_PROMPT or the response post-processing changes so cached analyses are not reused.
+ANALYSIS_PROMPT_VERSION = "2"
+
+ANALYSIS_CACHE_SIZE = int(os.environ.get("ANALYSIS_CACHE_SIZE", "1024"))
+ANALYSIS_CACHE_TTL_SECONDS = int(os.environ.get("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def _openai_model() -> str:
+    return os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+
+
+def _normalize_resume_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def _analysis_cache_key(text: str) -> str:
+    digest = hashlib.sha256()
+    for part in (ANALYSIS_PROMPT_VERSION, _openai_model(), _normalize_resume_text(text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+ANALYSIS_INPUT_TOKEN_BUDGET = int(os.environ.get("ANALYSIS_INPUT_TOKEN_BUDGET", "3000"))
+# Hard bound on the raw text the preprocessor looks at; 40 extracted pages are well under this.
+ANALYSIS_MAX_INPUT_CHARS = int(os.environ.get("ANALYSIS_MAX_INPUT_CHARS", "200000"))
+CHARS_PER_TOKEN_ESTIMATE = 4
+HEADER_FOOTER_SCAN_LINES = 3
+
+_token_encoder_state: Dict[str, Any] = {}
+
+_CID_GLYPH_RE = re.compile(r"\(cid:\d+\)")
+_CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0e-\x1f\x7f]")
+_BULLET_RE = re.compile(r"^[•●▪■◦‣⁃∙*·]\s+")
+_SPACED_CAPS_RE = re.compile(r"^(?:[A-Z&] ){2,}[A-Z&]$")
+# At most three digits, so a year on a line of its own ("2019") is never taken for a page number.
+_PAGE_NUMBER_RE = re.compile(r"^(?:page\s*)?\d{1,3}(?:\s*(?:of|/)\s*\d{1,3})?$|^-\s*\d{1,3}\s*-$")
+
+RESUME_SECTION_ALIASES = {
+    "summary": (
+        "summary", "professional summary", "executive summary", "career summary", "profile",
+        "professional profile", "about me", "objective", "career objective",
+    ),
+    "experience": (
+        "experience", "work experience", "professional experience", "relevant experience", "employment",
+        "employment history", "work history", "career history",
+    ),
+    "skills": (
+        "skills", "technical skills", "key skills", "core competencies", "competencies", "areas of expertise",
+        "expertise", "technologies", "tools", "skills and tools",
+    ),
+    "achievements": ("achievements", "key achievements", "accomplishments", "awards", "honors", "awards and honors"),
+    "education": ("education", "academic background", "qualifications", "education and training"),
+    "certifications": (
+        "certifications", "certificates", "licenses", "certifications and licenses", "licenses and certifications",
+        "training", "courses",
+    ),
+    "projects": ("projects", "key projects", "selected projects"),
+    "publications": ("publications", "patents", "presentations", "speaking"),
+    "volunteer": ("volunteer", "volunteering", "volunteer experience", "community involvement", "leadership"),
+    "languages": ("languages",),
+    "interests": ("interests", "hobbies", "hobbies and interests"),
+    "references": ("references",),
+}
+_SECTION_BY_HEADING = {alias: name for name, aliases in RESUME_SECTION_ALIASES.items() for alias in aliases}
+# Packing order when the budget is tight. "header" is the name/contact block before the first heading.
+RESUME_SECTION_PRIORITY = (
+    "header", "summary", "experience", "skills", "achievements", "education", "certifications", "projects",
+    "publications", "volunteer", "languages", "other", "interests", "references",
+)
+
+
+def _token_encoder():
+    """tiktoken encoder for the configured model, resolved once; None when tiktoken or its BPE file is unavailable."""
+    model = _openai_model()
+    if model in _token_encoder_state:
+        return _token_encoder_state[model]
+    encoder = None
+    try:
+        import tiktoken
+    except ImportError:  # optional: prompt budgets fall back to a characters-per-token estimate
+        tiktoken = None
+    if tiktoken is not None:
+        try:
+            try:
+                encoder = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoder = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken encoder unavailable ({e!r}); estimating tokens from characters.")
+    _token_encoder_state[model] = encoder
+    return encoder
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoder = _token_encoder()
+    if encoder is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN_ESTIMATE)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def _clean_resume_line(line: str) -> str:
+    line = _CID_GLYPH_RE.sub("", line)
+    line = " ".join(line.split())
+    if _SPACED_CAPS_RE.match(line):
+        line = line.replace(" ", "")
+    return _BULLET_RE.sub("- ", line)
+
+
+def _line_signature(line: str) -> str:
+    return re.sub(r"\d+", "#", line.lower())
+
+
+def _strip_repeated_headers_footers(pages: List[List[str]]) -> List[List[str]]:
+    """Drop page numbers that open or close a page, and lines that open or close most pages.
+
+    The first page keeps its copy of repeated lines (usually the name).
+    """
+    edge_counts: Dict[str, int] = {}
+    for lines in pages:
+        edges = {_line_signature(line) for line in lines[:HEADER_FOOTER_SCAN_LINES] + lines[-HEADER_FOOTER_SCAN_LINES:]}
+        for signature in edges:
+            edge_counts[signature] = edge_counts.get(signature, 0) + 1
+    threshold = max(2, math.ceil(len(pages) * 0.6))
+    # Bare numbers all share one signature, so years would count as repeated; page numbers are matched below.
+    repeated = (
+        {signature for signature, count in edge_counts.items() if count >= threshold and signature.strip("# ")}
+        if len(pages) > 1
+        else set()
+    )
+
+    cleaned = []
+    for page_index, lines in enumerate(pages):
+        kept = []
+        last = len(lines) - 1
+        for i, line in enumerate(lines):
+            signature = _line_signature(line)
+            if (i == 0 or i == last) and _PAGE_NUMBER_RE.match(line.lower()):
+                continue
+            at_edge = i < HEADER_FOOTER_SCAN_LINES or last - i < HEADER_FOOTER_SCAN_LINES
+            if at_edge and signature in repeated and page_index > 0:
+                continue
+            kept.append(line)
+        cleaned.append(kept)
+    return cleaned
+
+
+def clean_resume_text(text: str) -> str:
+    """Collapse extractor layout noise: ligatures, glyph ids, whitespace runs, hyphenated breaks, page furniture."""
+    text = unicodedata.normalize("NFKC", (text or "")[:ANALYSIS_MAX_INPUT_CHARS])
+    text = _CONTROL_CHARS_RE.sub("", text.replace("\r\n", "\n").replace("\r", "\n"))
+    pages = []
+    for page in text.split("\f"):
+        lines = [line for line in (_clean_resume_line(raw) for raw in page.split("\n")) if line]
+        pages.append(lines)
+    pages = _strip_repeated_headers_footers(pages)
+
+    merged: List[str] = []
+    for line in (line for lines in pages for line in lines):
+        # pypdf splits words hyphenated across lines ("manage-" / "ment"); rejoin them.
+        if merged and merged[-1].endswith("-") and merged[-1][-2:-1].isalpha() and line[:1].islower():
+            merged[-1] = merged[-1][:-1] + line
+        else:
+            merged.append(line)
+    return "\n".join(merged)
+
+
+def _section_for_heading(line: str) -> Optional[str]:
+    if len(line) > 40 or len(line.split()) > 5:
+        return None
+    heading = re.sub(r"[^a-z ]", "", line.lower().replace("&", "and")).strip()
+    return _SECTION_BY_HEADING.get(" ".join(heading.split()))
+
+
+def split_resume_sections(text: str) -> List[tuple]:
+    """[(section, [lines])] in document order; text before the first recognised heading is the "header"."""
+    sections: List[tuple] = [("header", [])]
+    for line in text.split("\n"):
+        name = _section_for_heading(line)
+        if name is not None:
+            sections.append((name, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(name, lines) for name, lines in sections if lines]
+
+
+def prepare_resume_text(text: str, token_budget: int = ANALYSIS_INPUT_TOKEN_BUDGET) -> str:
+    """Clean the extracted text and, if it is over budget, keep the most informative sections that fit.
+
+    Sections are admitted in RESUME_SECTION_PRIORITY order and an oversized section keeps its leading lines,
+    which is where the most recent roles sit. The result is re-assembled in document order.
+    """
+    return pack_resume_sections(clean_resume_text(text), token_budget)
+
+
+def pack_resume_sections(cleaned: str, token_budget: int = ANALYSIS_INPUT_TOKEN_BUDGET) -> str:
+    """The budget-packing half of prepare_resume_text(), for text that has already been cleaned."""
+    if count_tokens(cleaned) <= token_budget:
+        return cleaned
+
+    sections = split_resume_sections(cleaned)
+    priority = {name: rank for rank, name in enumerate(RESUME_SECTION_PRIORITY)}
+    order = sorted(range(len(sections)), key=lambda i: (priority.get(sections[i][0], priority["other"]), i))
+    remaining = token_budget
+    kept: Dict[int, List[str]] = {}
+    for index in order:
+        lines = sections[index][1]
+        taken = []
+        for line in lines:
+            cost = count_tokens(line) + 1
+            if cost > remaining:
+                break
+            taken.append(line)
+            remaining -= cost
+        if len(taken) == 1 and len(lines) > 1 and sections[index][0] != "header":
+            # A heading without any of its content is noise; give its tokens back.
+            remaining += count_tokens(taken[0]) + 1
+        elif taken:
+            kept[index] = taken
+    return "\n".join(line for index in sorted(kept) for line in kept[index])
+
+
+ACTION_VERBS = frozenset(
+    """
+    accelerated achieved administered advised analyzed architected automated boosted built championed closed coached
+    collaborated completed consolidated coordinated created cut decreased defined delivered deployed designed developed
+    directed doubled drove eliminated established executed expanded generated grew guided headed hired implemented
+    improved increased initiated introduced launched led managed mentored migrated modernized negotiated optimized
+    orchestrated organized oversaw owned partnered pioneered planned produced published raised redesigned reduced
+    refactored resolved restructured revamped saved scaled secured shipped simplified spearheaded streamlined
+    strengthened supervised trained transformed tripled won wrote
+    """.split()
+)
+# Role signals per seniority tier; coverage of the suggested tier doubles as a targeting signal.
+TIER_KEYWORDS = {
+    "ENTRY": ("intern", "internship", "assistant", "junior", "trainee", "graduate", "coursework", "gpa", "entry", "volunteer"),
+    "MID": ("analyst", "specialist", "engineer", "coordinator", "consultant", "associate", "project", "stakeholders", "cross-functional", "clients"),
+    "SENIOR": ("senior", "lead", "manager", "principal", "staff", "architect", "mentored", "roadmap", "budget", "hired"),
+    "EXEC": ("director", "head", "vp", "vice", "p&l", "portfolio", "organization", "transformation", "strategy", "executive"),
+    "CSUITE": ("ceo", "cfo", "coo", "cto", "cmo", "chief", "founder", "investors", "board", "ipo"),
+}
+TIERS = tuple(TIER_KEYWORDS)
+_TIER_VOCAB = tuple(sorted({word for words in TIER_KEYWORDS.values() for word in words}))
+# Upper bound (years of experience) for each tier, used as a prior alongside keyword coverage.
+TIER_YEARS = (2, 6, 12, 20, float("inf"))
+SECTION_WEIGHTS = {"experience": 0.35, "education": 0.2, "skills": 0.2, "summary": 0.15, "contact": 0.1}
+PRESCORE_WEIGHTS = {
+    "impact_density": 0.3,
+    "action_verb_ratio": 0.2,
+    "keyword_coverage": 0.15,
+    "bullet_length": 0.1,
+    "section_completeness": 0.25,
+}
+BULLET_WORDS_RANGE = (8, 30)
+PRESCORE_MIN_WORDS = 60
+# Score for a weighted signal total of 0 and of 1. The signals measure structure, which plenty of average
+# resumes get right, while the LLM grades content strictly (typical 45-65), so a perfect checklist tops out
+# at 70 and the fallback stays in the same range as the answers it stands in for.
+PRESCORE_SCORE_RANGE = (10, 70)
+
+_WORD_RE = re.compile(r"[a-z][a-z&+#.\-]*")
+_METRIC_RE = re.compile(r"\d|[$€£%]")
+_YEAR_RE = re.compile(r"\b(19[6-9]\d|20[0-4]\d)\b")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE_RE = re.compile(r"\+?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}")
+
+
+def _resume_bullets(sections: List[tuple]) -> List[str]:
+    bullets: List[str] = []
+    for _, lines in sections:
+        for line in lines:
+            if line.startswith("- "):
+                bullets.append(line[2:])
+            elif bullets and line[:1].islower():
+                bullets[-1] += " " + line
+    if bullets:
+        return bullets
+    # No bullet glyphs survived extraction: treat the longer lines of the role sections as bullets.
+    return [
+        line
+        for name, lines in sections
+        if name in ("experience", "achievements", "projects")
+        for line in lines[1:]
+        if len(line.split()) >= 6
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _tier_matrix():
+    """TIERS x _TIER_VOCAB keyword membership, built (with the numpy import) on first use."""
+    import numpy as np
+
+    return np.array([[word in TIER_KEYWORDS[tier] for word in _TIER_VOCAB] for tier in TIERS], dtype=np.float64)
+
+
+def _mean(values: "np.ndarray") -> float:
+    return float(values.mean()) if values.size else 0.0
+
+
+def prescore_resume(cleaned: str) -> Dict[str, Any]:
+    """Deterministic ATS-style score of cleaned resume text; a few milliseconds, no network.
+
+    Used as the instant preliminary score, as the analysis when the LLM is unavailable, and to keep
+    documents that are not resumes away from the LLM.
+    """
+    import numpy as np
+
+    sections = split_resume_sections(cleaned)
+    present = {name for name, _ in sections}
+    header = "\n".join(line for name, lines in sections if name == "header" for line in lines)
+    has_contact = bool(_EMAIL_RE.search(header) or _PHONE_RE.search(header))
+    words = _WORD_RE.findall(cleaned.lower())
+    vocabulary = set(words)
+
+    bullets = _resume_bullets(sections)
+    bullet_words = np.array([len(bullet.split()) for bullet in bullets], dtype=np.int64)
+    quantified = np.array([bool(_METRIC_RE.search(bullet)) for bullet in bullets], dtype=bool)
+    leads_with_verb = np.array(
+        [bullet.split()[0].strip(",.;:").lower() in ACTION_VERBS for bullet in bullets if bullet.split()], dtype=bool
+    )
+    in_range = (bullet_words >= BULLET_WORDS_RANGE[0]) & (bullet_words <= BULLET_WORDS_RANGE[1])
+
+    presence = np.array([word in vocabulary for word in _TIER_VOCAB], dtype=np.float64)
+    tier_matrix = _tier_matrix()
+    coverage = (tier_matrix @ presence) / tier_matrix.sum(axis=1)
+    experience_text = " ".join(line for name, lines in sections if name == "experience" for line in lines)
+    years = np.array([int(year) for year in _YEAR_RE.findall(experience_text)], dtype=np.int64)
+    span = int(years.max() - years.min()) if years.size > 1 else 0
+    tier_prior = np.zeros(len(TIERS))
+    if span:
+        tier_prior[int(np.searchsorted(TIER_YEARS, span))] = 0.25
+    tier_scores = coverage + tier_prior
+    tier_index = int(tier_scores.argmax()) if tier_scores.any() else TIERS.index("MID")
+
+    completeness = sum(weight for name, weight in SECTION_WEIGHTS.items() if name in present or (name == "contact" and has_contact))
+    signals = {
+        "impact_density": round(_mean(quantified), 4),
+        "action_verb_ratio": round(_mean(leads_with_verb), 4),
+        # A third of a tier's signal words is treated as full coverage.
+        "keyword_coverage": round(min(1.0, float(coverage[tier_index]) * 3), 4),
+        "bullet_length": round(_mean(in_range), 4),
+        "section_completeness": round(completeness, 4),
+    }
+    weighted = float(np.dot(list(signals.values()), [PRESCORE_WEIGHTS[name] for name in signals]))
+    recognised = len(present - {"header"})
+    is_resume = len(words) >= PRESCORE_MIN_WORDS and (recognised >= 2 or (has_contact and (recognised or len(bullets) >= 3)))
+    score = int(round(PRESCORE_SCORE_RANGE[0] + (PRESCORE_SCORE_RANGE[1] - PRESCORE_SCORE_RANGE[0]) * weighted))
+    return {
+        "score": score if is_resume else min(score, 15),
+        "suggested_tier": TIERS[tier_index],
+        "is_resume": is_resume,
+        "signals": signals,
+        "bullets": len(bullets),
+        "quantified_bullets": int(quantified.sum()),
+        "median_bullet_words": float(np.median(bullet_words)) if bullet_words.size else 0.0,
+        "missing_sections": [name for name in ("experience", "education", "skills", "summary") if name not in present],
+        "keyword_coverage_by_tier": {tier: round(float(value), 4) for tier, value in zip(TIERS, coverage)},
+    }
+
+
+def _local_findings(prescore: Dict[str, Any]) -> List[tuple]:
+    """(shortfall, category, finding, recommendation) for each signal under its target, worst first."""
+    signals = prescore["signals"]
+    findings = []
+    if signals["impact_density"] < 0.6:
+        findings.append((
+            0.6 - signals["impact_density"],
+            "Impact",
+            f"Only {prescore['quantified_bullets']} of {prescore['bullets']} bullets include a measurable result.",
+            "Add hard metrics ($, %, volume, team size) to each role.",
+        ))
+    if signals["action_verb_ratio"] < 0.7:
+        findings.append((
+            0.7 - signals["action_verb_ratio"],
+            "Clarity",
+            f"{round(signals['action_verb_ratio'] * 100)}% of bullets open with an action verb.",
+            "Replace passive phrasing with leadership verbs (Led, Owned, Delivered).",
+        ))
+    if signals["keyword_coverage"] < 0.6:
+        findings.append((
+            0.6 - signals["keyword_coverage"],
+            "Targeting",
+            f"Few {prescore['suggested_tier'].lower()}-level role signals for recruiter and ATS filters to match.",
+            "Strengthen the top section: headline + 6–10 role-specific keywords.",
+        ))
+    if signals["bullet_length"] < 0.6:
+        findings.append((
+            0.6 - signals["bullet_length"],
+            "Clarity",
+            f"Bullets run a median of {prescore['median_bullet_words']:.0f} words; key wins are hard to scan.",
+            "Reduce density: 3–5 bullets per role, one line each where possible.",
+        ))
+    if prescore["missing_sections"]:
+        missing = ", ".join(name.title() for name in prescore["missing_sections"])
+        findings.append((
+            1.0 - signals["section_completeness"],
+            "ATS Compliance",
+            f"No clearly labelled {missing} section.",
+            f"Add standard section headings ({missing}) so ATS parsers can map your content.",
+        ))
+    return sorted(findings, key=lambda finding: -finding[0])
+
+
+LLM_UNAVAILABLE_NOTE = "Detailed analysis is temporarily unavailable, so this is the automated ATS score."
+
+
+def _fallback_analysis(prescore: Dict[str, Any], note: Optional[str] = None) -> Dict[str, Any]:
+    """Full analysis built from the local pre-score, for when the LLM is not configured or failed."""
+    if not prescore["is_resume"]:
+        return {
+            "score": prescore["score"],
+            "summary": "This file does not read like a resume. Upload a text-based PDF or DOCX of your resume for a full review.",
+            "suggested_tier": prescore["suggested_tier"],
+            "bullet_recommendations": [
+                "Upload your resume rather than a cover letter or other document.",
+                "Export the file as a text-based PDF or DOCX (not a scan or image).",
+                "Use standard headings: Summary, Experience, Education, Skills.",
+                "Put your name, email and phone number at the top.",
+            ],
+            "gap_analysis": [
+                {"category": "ATS Compliance", "finding": "No recognisable resume sections or contact details were found."}
+            ],
+            "source": "local",
+        }
+
+    findings = _local_findings(prescore)
+    recommendations = [finding[3] for finding in findings]
+    for generic in (
+        "Add hard metrics ($, %, volume, team size) to each role.",
+        "Strengthen the top section: headline + 6–10 role-specific keywords.",
+        "Lead each role with its biggest measurable win.",
+        "Reduce density: 3–5 bullets per role, one line each where possible.",
+    ):
+        if len(recommendations) >= 4:
+            break
+        if generic not in recommendations:
+            recommendations.append(generic)
+    gaps = [{"category": category, "finding": finding} for _, category, finding, _ in findings[:3]]
+    if not gaps:
+        gaps = [{"category": "Impact", "finding": "Structure and metrics are solid; sharpen the top third for the target role."}]
+    lead = note or f"Automated ATS checks score this resume {prescore['score']}/100."
+    return {
+        "score": prescore["score"],
+        "summary": f"{lead} {gaps[0]['finding']}",
+        "suggested_tier": prescore["suggested_tier"],
+        "bullet_recommendations": recommendations[:4],
+        "gap_analysis": gaps,
+        "source": "local",
+    }
+
+
+class AnalysisCache:
+    """Two-tier cache of LLM analyses: an in-process LRU in front of the `analysis_cache` collection.
+
+    Mongo expires entries through a TTL index on `created_at`; the LRU applies the same TTL on read.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {"memory_hits": 0, "mongo_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _remember(self, key: str, analysis: Dict[str, Any], created_at: datetime) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (created_at, analysis)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        entry = self._entries.get(key)
+        if entry is not None:
+            created_at, analysis = entry
+            if now - created_at < timedelta(seconds=self.ttl_seconds):
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return dict(analysis)
+            del self._entries[key]
+            self.stats["expirations"] += 1
+
+        if db is not None:
+            try:
+                doc = await db.analysis_cache.find_one({"_id": key})
+            except Exception as e:
+                logger.error(f"Analysis cache lookup failed: {e}")
+                doc = None
+            if doc:
+                created_at = doc["created_at"]
+                if created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                # The TTL monitor runs about once a minute, so stale documents can still be returned here.
+                if now - created_at < timedelta(seconds=self.ttl_seconds):
+                    analysis = _unpack_analysis(doc["analysis"])
+                    try:
+                        AnalysisResult.model_validate(analysis)
+                    except ValidationError:
+                        # Written before answers were validated; analyze again rather than serve it.
+                        logger.warning(f"Ignoring invalid cached analysis {key}")
+                    else:
+                        self._remember(key, analysis, created_at)
+                        self.stats["mongo_hits"] += 1
+                        return dict(analysis)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, analysis: Dict[str, Any]) -> None:
+        created_at = datetime.now(timezone.utc)
+        self._remember(key, analysis, created_at)
+        if db is None:
+            return
+        try:
+            await db.analysis_cache.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "analysis": _pack_analysis(analysis),
+                    "model": _openai_model(),
+                    "prompt_version": ANALYSIS_PROMPT_VERSION,
+                    "created_at": created_at,
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            logger.error(f"Analysis cache write failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["memory_hits"] + self.stats["mongo_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["mongo_hits"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+analysis_cache = AnalysisCache(ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL_SECONDS)
+
+
+def _collect_cache_metrics():
+    stats = analysis_cache.snapshot()
+    return [
+        (
+            "resumeshortlist_analysis_cache_events_total",
+            "counter",
+            "Analysis cache lookups and evictions.",
+            [({"event": event}, stats[event]) for event in ("memory_hits", "mongo_hits", "misses", "evictions", "expirations")],
+        ),
+        ("resumeshortlist_analysis_cache_entries", "gauge", "Entries held in the in-process analysis cache.", [({}, stats["entries"])]),
+    ]
+
+
+metrics.add_collector(_collect_cache_metrics)
+
+
+# A repeat of the same file from the same email inside this window gets the earlier result and upload_id
+# instead of a second order (double clicks, retries after a slow response).
+DUPLICATE_SUBMISSION_WINDOW_SECONDS = int(os.environ.get("DUPLICATE_SUBMISSION_WINDOW_SECONDS", "600"))
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+class SingleFlight:
+    """Concurrent callers with the same key share one run of the work instead of each starting their own.
+
+    The work runs as its own task and every caller awaits it shielded, so a caller that disconnects does
+    not cancel the result the others (or its own retry) are waiting for.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, asyncio.Task] = {}
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so a flight nobody is left waiting on does not log a warning
+
+    async def run(self, key: str, start):
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.create_task(start())
+            self._flights[key] = task
+            task.add_done_callback(functools.partial(self._finished, key))
+            metrics.inc("resumeshortlist_coalesced_requests_total", flight=self.name, role="leader")
+        else:
+            metrics.inc("resumeshortlist_coalesced_requests_total", flight=self.name, role="joined")
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+
+analysis_flights = SingleFlight("analyze")
+job_flights = SingleFlight("analyze_job")
+
+
+def _submission_key(file_sha256: str, email: str) -> str:
+    return hashlib.sha256(f"{file_sha256}:{email.strip().lower()}".encode("utf-8")).hexdigest()[:32]
+
+
+async def _recent_submission(submission_key: str, projection: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if db is None:
+        return None
+    since = datetime.now(timezone.utc) - timedelta(seconds=DUPLICATE_SUBMISSION_WINDOW_SECONDS)
+    try:
+        return await db.resume_requests.find_one(
+            {"submission_key": submission_key, "created_at": {"$gte": since}, "job.stage": {"$ne": "failed"}},
+            projection,
+            sort=[("created_at", -1)],
+        )
+    except Exception as e:
+        logger.error(f"Duplicate submission lookup failed: {e}")
+        return None
+
+
+# SingleFlight coalesces within one process. Across worker processes and instances, the first to see a
+# submission takes a lease on it in Mongo and the others wait for its order instead of analyzing again.
+# The lease outlives the slowest analysis (queue wait, every LLM attempt, extraction) so it only lapses
+# when its holder died.
+SUBMISSION_LEASE_SECONDS = OPENAI_QUEUE_TIMEOUT_SECONDS + OPENAI_MAX_ATTEMPTS * OPENAI_TIMEOUT_SECONDS + EXTRACT_TIMEOUT_SECONDS
+SUBMISSION_LEASE_POLL_SECONDS = 0.5
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def _lease_submission(submission_key: str) -> bool:
+    """True if this process now holds the submission's lease (or there is no Mongo to coordinate through)."""
+    from pymongo.errors import DuplicateKeyError
+
+    if db is None:
+        return True
+    now = datetime.now(timezone.utc)
+    try:
+        await db.submission_leases.update_one(
+            {"_id": submission_key, "expires_at": {"$lt": now}},
+            {"$set": {"owner": PROCESS_ID, "expires_at": now + timedelta(seconds=SUBMISSION_LEASE_SECONDS)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    except Exception as e:
+        logger.error(f"Submission lease failed; analyzing without it: {e}")
+    return True
+
+
+async def _release_submission(submission_key: str) -> None:
+    if db is None:
+        return
+    try:
+        await db.submission_leases.delete_one({"_id": submission_key, "owner": PROCESS_ID})
+    except Exception as e:
+        logger.warning(f"Could not release submission lease {submission_key}: {e}")
+
+
+async def _await_leased_submission(submission_key: str, projection: Dict[str, Any], ready) -> Optional[Dict[str, Any]]:
+    """Wait for the lease holder's order. None once this process has taken the lease over instead."""
+    while True:
+        await asyncio.sleep(SUBMISSION_LEASE_POLL_SECONDS)
+        earlier = await _recent_submission(submission_key, projection)
+        if earlier is not None and ready(earlier):
+            metrics.inc("resumeshortlist_duplicate_submissions_total", match="peer")
+            return earlier
+        if await _lease_submission(submission_key):
+            return None
+
+
+def _idempotency_id(scope: str, key: Optional[str], email: str) -> Optional[str]:
+    """Storage id for an Idempotency-Key header; scoped to the caller's email so keys never cross customers."""
+    if not key:
+        return None
+    key = key.strip()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters.")
+    return hashlib.sha256(f"{scope}:{_email_subject(email)}:{key}".encode("utf-8")).hexdigest()
+
+
+async def _idempotent_upload_id(idempotency_id: Optional[str]) -> Optional[str]:
+    if idempotency_id is None or db is None:
+        return None
+    try:
+        doc = await db.idempotency_keys.find_one({"_id": idempotency_id})
+    except Exception as e:
+        logger.error(f"Idempotency key lookup failed: {e}")
+        return None
+    return doc["upload_id"] if doc else None
+
+
+async def _remember_idempotency_key(idempotency_id: Optional[str], upload_id: str) -> None:
+    if idempotency_id is None or db is None:
+        return
+    try:
+        await db.idempotency_keys.update_one(
+            {"_id": idempotency_id},
+            {"$setOnInsert": {"upload_id": upload_id, "created_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+    except Exception as e:
+        logger.error(f"Idempotency key write failed: {e}")
+
+
+def _gap_findings(items: Any) -> List[Dict[str, str]]:
+    """Gap entries as {"category", "finding"} dicts; the model occasionally answers with bare strings."""
+    gaps = []
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict):
+            gaps.append({"category": str(item.get("category") or ""), "finding": str(item.get("finding") or "")})
+        elif isinstance(item, str):
+            gaps.append({"category": "", "finding": item})
+    return [gap for gap in gaps if gap["finding"]]
+
+
+def _normalize_llm_analysis(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Coerce the model's JSON into an analysis.
+
+    Raises if the result is still not a valid AnalysisResult (e.g. a null summary), so the completion counts as an
+    invalid response and is retried instead of being cached, stored and failing later when the response is built.
+    """
+    score = int(data.get("score", 60))
+    score = max(0, min(100, score))
+    bullets = data.get("bullet_recommendations") or []
+    analysis = {
+        "score": score,
+        "summary": data.get("summary", "Analysis incomplete."),
+        "suggested_tier": (data.get("suggested_tier") or "MID").strip().upper(),
+        "bullet_recommendations": [str(bullet) for bullet in bullets[:4]] if isinstance(bullets, list) else [],
+        "gap_analysis": _gap_findings(data.get("gap_analysis"))[:3],
+        "source": "llm",
+    }
+    AnalysisResult.model_validate(analysis)
+    return analysis
+
+
+# resume_requests.analysis and analysis_cache.analysis are written in this compact form: short keys and
+# gaps as [category, finding] pairs. Documents from before it carry no "v" and hold the full dict.
+ANALYSIS_STORAGE_VERSION = 2
+
+
+def _pack_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "v": ANALYSIS_STORAGE_VERSION,
+        "s": analysis["score"],
+        "t": analysis["suggested_tier"],
+        "m": analysis["summary"],
+        "b": analysis["bullet_recommendations"],
+        "g": [[gap["category"], gap["finding"]] for gap in analysis["gap_analysis"]],
+        "o": analysis.get("source"),
+    }
+
+
+def _unpack_analysis(stored: Dict[str, Any]) -> Dict[str, Any]:
+    if stored.get("v") == ANALYSIS_STORAGE_VERSION:
+        return {
+            "score": stored["s"],
+            "summary": stored["m"],
+            "suggested_tier": stored["t"],
+            "bullet_recommendations": list(stored["b"]),
+            "gap_analysis": [{"category": category, "finding": finding} for category, finding in stored["g"]],
+            "source": stored.get("o"),
+        }
+    return {**stored, "gap_analysis": _gap_findings(stored.get("gap_analysis"))}
+
+
+async def _llm_json_completion(system_prompt: str, user_msg: str, parse, interactive: bool = True):
+    """One JSON-mode completion with timeout, retries and metrics.
+
+    `parse` turns the decoded JSON into the result; if it raises, the attempt counts as an invalid response
+    and is retried. Returns None once every attempt has failed. Raises LlmOverloaded if an `interactive`
+    caller cannot get an LLM slot in time.
+    """
+    for attempt in range(OPENAI_MAX_ATTEMPTS):
+        outcome = "error"
+        try:
+            async with llm_admission.slot(interactive):
+                started = time.perf_counter()
+                try:
+                    resp = await asyncio.wait_for(
+                        services.openai.chat.completions.create(
+                            model=_openai_model(),
+                            messages=[
+                                {"role": "system", "content": system_prompt},
+                                {"role": "user", "content": user_msg},
+                            ],
+                            temperature=0.2,
+                            response_format={"type": "json_object"},
+                        ),
+                        timeout=OPENAI_TIMEOUT_SECONDS,
+                    )
+                except asyncio.TimeoutError:
+                    outcome = "timeout"
+                    raise
+                finally:
+                    metrics.observe("resumeshortlist_openai_request_seconds", time.perf_counter() - started, model=_openai_model())
+            if resp.usage:
+                metrics.inc("resumeshortlist_openai_tokens_total", resp.usage.prompt_tokens or 0, kind="prompt")
+                metrics.inc("resumeshortlist_openai_tokens_total", resp.usage.completion_tokens or 0, kind="completion")
+            outcome = "invalid_response"
+            result = parse(json.loads(resp.choices[0].message.content or "{}"))
+            metrics.inc("resumeshortlist_openai_attempts_total", outcome="ok", attempt=str(attempt + 1))
+            return result
+        except LlmOverloaded:
+            raise
+        except Exception as e:
+            metrics.inc("resumeshortlist_openai_attempts_total", outcome=outcome, attempt=str(attempt + 1))
+            logger.error(f"OpenAI error (attempt {attempt+1}/{OPENAI_MAX_ATTEMPTS}): {e!r}")
+            if attempt + 1 < OPENAI_MAX_ATTEMPTS:
+                await asyncio.sleep(0.7 * (attempt + 1))
+    return None
+
+
+async def _llm_analyze(text: str, interactive: bool = True) -> Optional[Dict[str, Any]]:
+    """`text` is expected to be the output of prepare_resume_text()."""
+    return await _llm_json_completion(
+        ANALYSIS_SYSTEM_PROMPT, f"Analyze this resume:\n\n{text}", _normalize_llm_analysis, interactive
+    )
+
+
+async def _llm_analyze_packed(texts: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """Analyze several prepared resumes in one completion; None if the model never returns one result per resume."""
+
+    def parse(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        results = {int(item["resume"]): item for item in data.get("results") or [] if isinstance(item, dict)}
+        return [_normalize_llm_analysis(results[number]) for number in range(1, len(texts) + 1)]
+
+    body = "\n\n".join(f"### Resume {number}\n{text}" for number, text in enumerate(texts, start=1))
+    return await _llm_json_completion(
+        PACKED_ANALYSIS_SYSTEM_PROMPT, f"Analyze these {len(texts)} resumes:\n\n{body}", parse, interactive=False
+    )
+
+
+async def _openai_analyze(text: str, interactive: bool = True) -> Dict[str, Any]:
+    with timed_stage("preprocess"):
+        cleaned = clean_resume_text(text)
+        prescore = prescore_resume(cleaned)
+    if not prescore["is_resume"]:
+        metrics.inc("resumeshortlist_analysis_results_total", source="not_resume")
+        return _fallback_analysis(prescore)
+    if not OPENAI_API_KEY:
+        metrics.inc("resumeshortlist_analysis_results_total", source="local")
+        return _fallback_analysis(prescore)
+
+    prepared = pack_resume_sections(cleaned)
+    cache_key = _analysis_cache_key(prepared)
+    cached = await analysis_cache.get(cache_key)
+    if cached is not None:
+        metrics.inc("resumeshortlist_analysis_results_total", source="cache")
+        return cached
+
+    analysis = await _llm_analyze(prepared, interactive)
+    if analysis is not None:
+        metrics.inc("resumeshortlist_analysis_results_total", source="llm")
+        await analysis_cache.set(cache_key, analysis)
+        return analysis
+
+    metrics.inc("resumeshortlist_analysis_results_total", source="fallback")
+    return _fallback_analysis(prescore, note=LLM_UNAVAILABLE_NOTE)
+
+
+def _serialize_order(order: Dict[str, Any]) -> Dict[str, Any]:
+    if not order:
+        return {}
+    customer = order.get("customer") or {}
+    payment = order.get("payment") or {}
+    delivery = order.get("delivery") or {}
+    return {
+        "upload_id": order.get("upload_id"),
+        "status": order.get("status"),
+        "tier": order.get("tier"),
+        "score": order.get("score"),
+        "created_at": order.get("created_at").isoformat() if order.get("created_at") else None,
+        "original_filename": order.get("original_filename"),
+        "revised_filename": order.get("revised_filename"),
+        "original_r2_key": order.get("original_r2_key"),
+        "revised_r2_key": order.get("revised_r2_key"),
+        "customer": {
+            "name": customer.get("name"),
+            "email": customer.get("email"),
+            "phone": customer.get("phone"),
+        },
+        "payment": {
+            "session_id": payment.get("session_id"),
+            "status": payment.get("status"),
+            "paid_at": payment.get("paid_at").isoformat() if payment.get("paid_at") else None,
+        },
+        "delivery": {
+            "status": delivery.get("status"),
+            "attempts": delivery.get("attempts"),
+            "last_error": delivery.get("last_error"),
+        },
+    }
+
+
+# Only the fields _serialize_order reads; keeps the nested `analysis` blob off the wire.
+ORDER_LIST_PROJECTION = {
+    "_id": 0,
+    "upload_id": 1,
+    "status": 1,
+    "tier": 1,
+    "score": 1,
+    "created_at": 1,
+    "original_filename": 1,
+    "revised_filename": 1,
+    "original_r2_key": 1,
+    "revised_r2_key": 1,
+    "customer": 1,
+    "payment": 1,
+    "delivery": 1,
+}
+ORDER_LIST_SORT = [("created_at", -1), ("upload_id", -1)]
+ORDER_PAGE_DEFAULT = 50
+ORDER_PAGE_MAX = 200
+
+
+def _encode_order_cursor(order: Dict[str, Any]) -> str:
+    raw = json.dumps({"c": order["created_at"].isoformat(), "u": order["upload_id"]})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_order_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return {"created_at": datetime.fromisoformat(data["c"]), "upload_id": str(data["u"])}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _is_full_name(value: str) -> bool:
+    parts = [part for part in (value or "").strip().split() if part]
+    return len(parts) >= 2
+
+
+def _is_valid_email(value: str) -> bool:
+    if not value:
+        return False
+    value = value.strip()
+    if "@" not in value:
+        return False
+    local, _, domain = value.partition("@")
+    return bool(local) and "." in domain
+
+
+def _validated_contact(name: Optional[str], email: Optional[str]) -> tuple:
+    name_value = (name or "").strip()
+    email_value = (email or "").strip()
+    if not _is_full_name(name_value):
+        raise HTTPException(status_code=400, detail="Please provide your first and last name.")
+    if not _is_valid_email(email_value):
+        raise HTTPException(status_code=400, detail="Please provide a valid email address.")
+    return name_value, email_value
+
+
+# `?fields=score,tier` trims an analysis response to what the caller reads; upload_id is always included.
+RESPONSE_FIELD_ALIASES = {"tier": "suggested_tier", "bullets": "bullet_recommendations"}
+
+
+def _response_fields(fields: Optional[str]) -> Optional[set]:
+    if not fields:
+        return None
+    selected = {RESPONSE_FIELD_ALIASES.get(name.strip(), name.strip()) for name in fields.split(",") if name.strip()}
+    unknown = selected - set(AnalysisResponse.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected | {"upload_id"}
+
+
+def _analysis_response(
+    upload_id: str, filename: Optional[str], analysis: Dict[str, Any], fields: Optional[set] = None
+) -> Dict[str, Any]:
+    response = AnalysisResponse(
+        upload_id=upload_id,
+        filename=filename,
+        **{name: analysis[name] for name in AnalysisResult.model_fields},
+    )
+    return response.model_dump(include=fields)
+
+
+def _smtp_config() -> Dict[str, Any]:
+    host = os.environ.get("SMTP_HOST")
+    if not host:
+        return {}
+    return {
+        "host": host,
+        "port": int(os.environ.get("SMTP_PORT", "587")),
+        "username": os.environ.get("SMTP_USER"),
+        "password": os.environ.get("SMTP_PASSWORD"),
+        "sender": os.environ.get("SMTP_FROM") or os.environ.get("SMTP_USER"),
+        "starttls": os.environ.get("SMTP_STARTTLS", "true").lower() not in ("0", "false", "no"),
+    }
+
+
+def _r2_config() -> Dict[str, Any]:
+    bucket = os.environ.get("R2_BUCKET")
+    account_id = os.environ.get("R2_ACCOUNT_ID")
+    access_key = os.environ.get("R2_ACCESS_KEY_ID")
+    secret_key = os.environ.get("R2_SECRET_ACCESS_KEY")
+    if not all([bucket, account_id, access_key, secret_key]):
+        return {}
+    endpoint = os.environ.get("R2_ENDPOINT") or f"https://{account_id}.r2.cloudflarestorage.com"
+    return {
+        "bucket": bucket,
+        "endpoint": endpoint,
+        "access_key": access_key,
+        "secret_key": secret_key,
+    }
+
+
+R2_MAX_POOL_CONNECTIONS = int(os.environ.get("R2_MAX_POOL_CONNECTIONS", "32"))
+R2_STREAM_CHUNK_BYTES = 256 * 1024
+R2_PRESIGNED_DOWNLOADS = os.environ.get("R2_PRESIGNED_DOWNLOADS", "").lower() in ("1", "true", "yes")
+R2_PRESIGNED_TTL_SECONDS = int(os.environ.get("R2_PRESIGNED_TTL_SECONDS", "300"))
+
+_r2_client_instance = None
+_r2_bucket_name: Optional[str] = None
+_r2_client_lock = threading.Lock()
+_r2_executor = ThreadPoolExecutor(max_workers=R2_MAX_POOL_CONNECTIONS, thread_name_prefix="r2")
+
+
+def _r2_client():
+    """The process-wide R2 client, built on first use. boto3 clients are thread-safe and keep a warm TLS pool."""
+    global _r2_client_instance, _r2_bucket_name
+    if _r2_client_instance is not None:
+        return _r2_client_instance
+    config = _r2_config()
+    if not config:
+        return None
+    with _r2_client_lock:
+        if _r2_client_instance is None:
+            import boto3
+            from botocore.config import Config as BotoConfig
+
+            _r2_client_instance = boto3.session.Session().client(
+                "s3",
+                endpoint_url=config["endpoint"],
+                aws_access_key_id=config["access_key"],
+                aws_secret_access_key=config["secret_key"],
+                region_name="auto",
+                config=BotoConfig(
+                    max_pool_connections=R2_MAX_POOL_CONNECTIONS,
+                    tcp_keepalive=True,
+                    connect_timeout=5,
+                    read_timeout=60,
+                    retries={"max_attempts": 3, "mode": "standard"},
+                ),
+            )
+            _r2_bucket_name = config["bucket"]
+    return _r2_client_instance
+
+
+def _r2_bucket() -> str:
+    if _r2_client() is None:
+        raise RuntimeError("R2 is not configured. Set R2_BUCKET, R2_ACCOUNT_ID, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY.")
+    return _r2_bucket_name
+
+
+def _file_suffix(filename: Optional[str]) -> str:
+    extension = ""
+    if filename and "." in filename:
+        extension = filename.split(".")[-1].lower()
+    return f".{extension}" if extension else ""
+
+
+def _r2_key(upload_id: str, filename: str, variant: str) -> str:
+    return f"uploads/{upload_id}/{variant}{_file_suffix(filename)}"
+
+
+def _r2_original_key(file_sha256: str, filename: Optional[str]) -> str:
+    """Originals are content-addressed, so the same bytes are stored once however often they are submitted."""
+    return f"originals/{file_sha256}{_file_suffix(filename)}"
+
+
+R2_MULTIPART_BYTES = 8 * 1024 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def _r2_transfer_config():
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(multipart_threshold=R2_MULTIPART_BYTES, multipart_chunksize=R2_MULTIPART_BYTES)
+
+
+def _r2_upload_fileobj(key: str, fileobj, content_type: str) -> None:
+    """Stream a file object to R2; boto3 switches to a multipart upload above the transfer threshold."""
+    bucket = _r2_bucket()
+    _r2_client().upload_fileobj(
+        fileobj, bucket, key, ExtraArgs={"ContentType": content_type}, Config=_r2_transfer_config()
+    )
+
+
+def _r2_upload_spool(key: str, spool: SpooledUpload) -> None:
+    with spool.open() as handle:
+        _r2_upload_fileobj(key, handle, spool.content_type)
+
+
+def _r2_download_bytes(key: str) -> bytes:
+    bucket = _r2_bucket()
+    response = _r2_client().get_object(Bucket=bucket, Key=key)
+    return response["Body"].read()
+
+
+def _r2_download_to_spool(key: str, spool: SpooledUpload) -> None:
+    body = _r2_client().get_object(Bucket=_r2_bucket(), Key=key)["Body"]
+    try:
+        for chunk in body.iter_chunks(R2_STREAM_CHUNK_BYTES):
+            spool.write(chunk)
+    finally:
+        body.close()
+    spool.finish()
+
+
+def _r2_delete_object(key: str) -> None:
+    bucket = _r2_bucket()
+    _r2_client().delete_object(Bucket=bucket, Key=key)
+
+
+def _r2_get_object(key: str, byte_range: Optional[str] = None, if_none_match: Optional[str] = None) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"Bucket": _r2_bucket(), "Key": key}
+    if byte_range:
+        params["Range"] = byte_range
+    if if_none_match:
+        params["IfNoneMatch"] = if_none_match
+    return _r2_client().get_object(**params)
+
+
+def _r2_presigned_download_url(key: str, filename: str, content_type: str) -> str:
+    return _r2_client().generate_presigned_url(
+        "get_object",
+        Params={
+            "Bucket": _r2_bucket(),
+            "Key": key,
+            "ResponseContentDisposition": f'attachment; filename="{filename}"',
+            "ResponseContentType": content_type,
+        },
+        ExpiresIn=R2_PRESIGNED_TTL_SECONDS,
+    )
+
+
+async def _r2_run(func, *args):
+    # run_in_executor does not carry contextvars across; copy them so R2 log lines keep the request id.
+    call = functools.partial(contextvars.copy_context().run, func, *args)
+    return await asyncio.get_running_loop().run_in_executor(_r2_executor, call)
+
+
+async def _r2_upload(key: str, spool: SpooledUpload) -> None:
+    with timed_stage("r2_upload"):
+        await _r2_run(_r2_upload_spool, key, spool)
+
+
+async def _r2_store_original(key: str, spool: SpooledUpload) -> bool:
+    """Upload an original unless its content-addressed key already exists; True if this call wrote it."""
+    if db is not None:
+        await _claim_original_use(key)
+    if await _r2_run(_r2_object_exists, key):
+        metrics.inc("resumeshortlist_r2_dedup_total", outcome="already_stored")
+        return False
+    await _r2_upload(key, spool)
+    metrics.inc("resumeshortlist_r2_dedup_total", outcome="uploaded")
+    return True
+
+
+async def _r2_download(key: str) -> bytes:
+    with timed_stage("r2_download"):
+        return await _r2_run(_r2_download_bytes, key)
+
+
+async def _r2_delete(key: str) -> None:
+    with timed_stage("r2_delete"):
+        await _r2_run(_r2_delete_object, key)
+
+
+async def _r2_download_spooled(key: str, filename: Optional[str], content_type: Optional[str]) -> SpooledUpload:
+    spool = SpooledUpload(filename, content_type)
+    try:
+        with timed_stage("r2_download"):
+            await _r2_run(_r2_download_to_spool, key, spool)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+async def _r2_stream_body(body):
+    """Relay an R2 object body in fixed-size chunks; each blocking read happens on the R2 executor."""
+    try:
+        while True:
+            chunk = await _r2_run(body.read, R2_STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        body.close()
+
+
+SMTP_TIMEOUT_SECONDS = float(os.environ.get("SMTP_TIMEOUT_SECONDS", "30"))
+EMAIL_WORKERS = int(os.environ.get("EMAIL_WORKERS", "2"))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = float(os.environ.get("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_RETRY_MAX_SECONDS = 30 * 60
+EMAIL_POLL_SECONDS = float(os.environ.get("EMAIL_POLL_SECONDS", "5"))
+EMAIL_LEASE_SECONDS = 5 * 60
+
+
+class SmtpConnectionPool:
+    """Keeps logged-in SMTP connections open between sends instead of a new STARTTLS handshake per email.
+
+    Connections are handed out to one thread at a time and probed with NOOP before reuse.
+    """
+
+    def __init__(self, max_idle: int):
+        self.max_idle = max_idle
+        self._idle: List[smtplib.SMTP] = []
+        self._lock = threading.Lock()
+
+    def _connect(self, config: Dict[str, Any]) -> smtplib.SMTP:
+        connection = smtplib.SMTP(config["host"], config["port"], timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            if config.get("starttls", True):
+                connection.starttls(context=ssl.create_default_context())
+            if config.get("username") and config.get("password"):
+                connection.login(config["username"], config["password"])
+        except Exception:
+            self._discard(connection)
+            raise
+        return connection
+
+    def _checkout(self) -> Optional[smtplib.SMTP]:
+        with self._lock:
+            return self._idle.pop() if self._idle else None
+
+    def _checkin(self, connection: smtplib.SMTP) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                return
+        self._discard(connection)
+
+    @staticmethod
+    def _is_alive(connection: smtplib.SMTP) -> bool:
+        try:
+            return connection.noop()[0] == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(connection: smtplib.SMTP) -> None:
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    @contextmanager
+    def connection(self):
+        config = _smtp_config()
+        if not config:
+            raise RuntimeError("SMTP is not configured. Set SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_FROM.")
+        connection = self._checkout()
+        while connection is not None and not self._is_alive(connection):
+            self._discard(connection)
+            connection = self._checkout()
+        if connection is None:
+            connection = self._connect(config)
+        try:
+            yield connection
+        except Exception:
+            self._discard(connection)
+            raise
+        self._checkin(connection)
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._discard(connection)
+
+
+smtp_pool = SmtpConnectionPool(max_idle=max(1, EMAIL_WORKERS))
+
+
+def _build_revision_email(
+    *,
+    recipient: str,
+    subject: str,
+    body: str,
+    attachment_name: str,
+    attachment_bytes: bytes,
+    attachment_type: str,
+) -> EmailMessage:
+    config = _smtp_config()
+    if not config:
+        raise RuntimeError("SMTP is not configured. Set SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_FROM.")
+
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = config["sender"]
+    msg["To"] = recipient
+    msg.set_content(body)
+    msg.add_attachment(attachment_bytes, maintype=attachment_type.split("/")[0], subtype=attachment_type.split("/")[1], filename=attachment_name)
+    return msg
+
+
+def _send_revision_email(
+    *,
+    recipient: str,
+    customer_name: str,
+    subject: str,
+    body: str,
+    attachment_name: str,
+    attachment_bytes: bytes,
+    attachment_type: str,
+) -> None:
+    msg = _build_revision_email(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        attachment_name=attachment_name,
+        attachment_bytes=attachment_bytes,
+        attachment_type=attachment_type,
+    )
+    with timed_stage("smtp_send"), smtp_pool.connection() as server:
+        server.send_message(msg)
+
+
+def _revision_delivery(order: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything needed to email an order's revised resume. Raises HTTPException if the order is not ready."""
+    upload_id = order.get("upload_id")
+    customer = order.get("customer") or {}
+    recipient = customer.get("email")
+    if not recipient:
+        raise HTTPException(status_code=400, detail="Customer email missing")
+
+    revised_key = order.get("revised_r2_key")
+    if not revised_key:
+        raise HTTPException(status_code=400, detail="Revised resume not uploaded")
+
+    customer_name = customer.get("name") or "there"
+    return {
+        "recipient": recipient,
+        "customer_name": customer_name,
+        "revised_key": revised_key,
+        "attachment_name": order.get("revised_filename") or f"{upload_id}-revised.pdf",
+        "attachment_type": order.get("revised_content_type") or "application/octet-stream",
+        "subject": "Your revised resume is ready",
+        "body": (
+            f"Hi {customer_name},\n\n"
+            "Your revised resume is attached. If you have any questions or want additional edits, reply to this email.\n\n"
+            "Best,\nResume Shortlist Team"
+        ),
+    }
+
+
+email_queue_wakeup = asyncio.Event()
+
+
+def _email_job_upsert(upload_id: str, now: datetime) -> Dict[str, Any]:
+    """Filter and update that (re)queue an order's email job. A job that is mid-send does not match, so the
+    upsert collides with it on _id instead of queueing a second send."""
+    return {
+        "filter": {"_id": upload_id, "status": {"$ne": "sending"}},
+        "update": {
+            "$set": {
+                "status": "queued",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "last_error": None,
+                "updated_at": now,
+            },
+            "$setOnInsert": {"created_at": now},
+        },
+    }
+
+
+def _queued_delivery(now: datetime) -> Dict[str, Any]:
+    return {"$set": {"delivery": {"status": "queued", "queued_at": now, "attempts": 0, "last_error": None}}}
+
+
+async def enqueue_revision_email(upload_id: str) -> Dict[str, Any]:
+    """Queue delivery of an order's revised resume. One job per order; a job that is mid-send is left alone."""
+    from pymongo.errors import DuplicateKeyError
+
+    now = datetime.now(timezone.utc)
+    try:
+        await db.email_jobs.update_one(**_email_job_upsert(upload_id, now), upsert=True)
+    except DuplicateKeyError:
+        return {"status": "sending"}
+    await db.resume_requests.update_one({"upload_id": upload_id}, _queued_delivery(now))
+    email_queue_wakeup.set()
+    return {"status": "queued"}
+
+
+async def _claim_email_job() -> Optional[Dict[str, Any]]:
+    from pymongo import ReturnDocument
+
+    now = datetime.now(timezone.utc)
+    return await db.email_jobs.find_one_and_update(
+        {
+            "$or": [
+                {"status": "queued", "next_attempt_at": {"$lte": now}},
+                # A worker that died mid-send leaves its lease behind; pick the job up once it lapses.
+                {"status": "sending", "lease_until": {"$lt": now}},
+            ]
+        },
+        {
+            "$set": {"status": "sending", "lease_until": now + timedelta(seconds=EMAIL_LEASE_SECONDS), "updated_at": now},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _set_delivery_status(upload_id: str, job_update: Dict[str, Any], order_update: Dict[str, Any]) -> None:
+    await db.email_jobs.update_one({"_id": upload_id}, {"$set": job_update})
+    await db.resume_requests.update_one({"upload_id": upload_id}, {"$set": order_update})
+
+
+async def _release_email_job(upload_id: str) -> None:
+    """Hand a job that was stopped before sending back to the queue, without counting the attempt."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.email_jobs.update_one(
+            {"_id": upload_id, "status": "sending"},
+            {"$set": {"status": "queued", "next_attempt_at": now, "lease_until": None, "updated_at": now}, "$inc": {"attempts": -1}},
+        )
+        await db.resume_requests.update_one({"upload_id": upload_id}, {"$set": {"delivery.status": "queued"}})
+    except Exception as e:
+        logger.warning(f"Could not release email job {upload_id}; it is retried once its lease lapses: {e}")
+
+
+async def _deliver_email_job(job: Dict[str, Any]) -> None:
+    upload_id = job["_id"]
+    attempts = job.get("attempts", 1)
+    await db.resume_requests.update_one(
+        {"upload_id": upload_id}, {"$set": {"delivery.status": "sending", "delivery.attempts": attempts}}
+    )
+    interrupted = False
+    try:
+        order = await db.resume_requests.find_one({"upload_id": upload_id})
+        if not order:
+            raise RuntimeError("Order not found")
+        delivery = _revision_delivery(order)
+        attachment = await _r2_download(delivery["revised_key"])
+        sending = asyncio.ensure_future(
+            asyncio.to_thread(
+                _send_revision_email,
+                recipient=delivery["recipient"],
+                customer_name=delivery["customer_name"],
+                subject=delivery["subject"],
+                body=delivery["body"],
+                attachment_name=delivery["attachment_name"],
+                attachment_bytes=attachment,
+                attachment_type=delivery["attachment_type"],
+            )
+        )
+        try:
+            await asyncio.shield(sending)
+        except asyncio.CancelledError:
+            # Cancelled mid-send (shutdown): the SMTP call cannot be taken back, so let it finish and record
+            # how it went; releasing the job now could send the email twice.
+            interrupted = True
+            await asyncio.wait({sending})
+            sending.result()
+    except asyncio.CancelledError:
+        # Cancelled before anything was sent; hand the job back rather than leave it leased.
+        await _release_email_job(upload_id)
+        raise
+    except Exception as e:
+        # An HTTPException here means the order itself is not deliverable; retrying cannot fix it.
+        permanent = isinstance(e, HTTPException)
+        error = e.detail if permanent else str(e)
+        now = datetime.now(timezone.utc)
+        if permanent or attempts >= EMAIL_MAX_ATTEMPTS:
+            logger.error(f"Email delivery for {upload_id} failed permanently after {attempts} attempts: {error}")
+            await _set_delivery_status(
+                upload_id,
+                {"status": "failed", "last_error": error, "updated_at": now},
+                {"delivery.status": "failed", "delivery.last_error": error, "delivery.failed_at": now},
+            )
+        else:
+            delay = min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * (2 ** (attempts - 1)))
+            logger.warning(f"Email delivery for {upload_id} failed (attempt {attempts}); retrying in {delay:.1f}s: {error}")
+            await _set_delivery_status(
+                upload_id,
+                {"status": "queued", "last_error": error, "next_attempt_at": now + timedelta(seconds=delay), "updated_at": now},
+                {"delivery.status": "queued", "delivery.last_error": error},
+            )
+    else:
+        now = datetime.now(timezone.utc)
+        await _set_delivery_status(
+            upload_id,
+            {"status": "delivered", "last_error": None, "updated_at": now},
+            {"status": "delivered", "delivered_at": now, "delivery.status": "delivered", "delivery.last_error": None},
+        )
+    if interrupted:
+        raise asyncio.CancelledError()
+
+
+async def _email_worker(worker_id: int) -> None:
+    # Polling Mongo would otherwise build the client on the event loop while the instance is coming up.
+    await services.warmed_up.wait()
+    while not services.draining.is_set():
+        try:
+            job = await _claim_email_job()
+        except Exception as e:
+            logger.error(f"Email worker {worker_id} could not claim a job: {e}")
+            job = None
+        if job is None:
+            email_queue_wakeup.clear()
+            try:
+                await asyncio.wait_for(email_queue_wakeup.wait(), timeout=EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await _deliver_email_job(job)
+        except Exception as e:
+            logger.exception(f"Email worker {worker_id} crashed on {job.get('_id')}: {e}")
+
+
+ANALYSIS_JOB_WORKERS = int(os.environ.get("ANALYSIS_JOB_WORKERS", "4"))
+ANALYSIS_JOB_LEASE_SECONDS = 5 * 60
+# The worker running a job extends its lease this often, so a job that is slow (e.g. waiting for an LLM slot)
+# is not mistaken for an abandoned one and run a second time.
+ANALYSIS_JOB_HEARTBEAT_SECONDS = ANALYSIS_JOB_LEASE_SECONDS / 5
+ANALYSIS_JOB_MAX_ATTEMPTS = 3
+ANALYSIS_JOB_POLL_SECONDS = float(os.environ.get("ANALYSIS_JOB_POLL_SECONDS", "2"))
+JOB_EVENTS_POLL_SECONDS = 0.5
+JOB_EVENTS_HEARTBEAT_SECONDS = 15
+JOB_EVENTS_MAX_SECONDS = 10 * 60
+# Stages a job moves through; "stored" and "failed" are terminal.
+JOB_ACTIVE_STAGES = ("extracting", "analyzing")
+JOB_TERMINAL_STAGES = ("stored", "failed")
+
+analysis_job_wakeup = asyncio.Event()
+
+
+class JobLeaseLost(Exception):
+    """Another worker has taken over the job; this one must stop without writing anything more."""
+
+
+async def _set_job_stage(upload_id: str, lease_id: str, stage: str, extra: Optional[Dict[str, Any]] = None) -> None:
+    """Move a job on, as long as this worker still holds its lease. Active stages also extend the lease."""
+    now = datetime.now(timezone.utc)
+    update = {"job.stage": stage, "job.updated_at": now}
+    if stage in JOB_TERMINAL_STAGES:
+        update["job.lease_until"] = None
+    else:
+        update["job.lease_until"] = now + timedelta(seconds=ANALYSIS_JOB_LEASE_SECONDS)
+    update.update(extra or {})
+    result = await db.resume_requests.update_one({"upload_id": upload_id, "job.lease_id": lease_id}, {"$set": update})
+    if result.matched_count == 0:
+        raise JobLeaseLost(upload_id)
+
+
+async def _release_analysis_job(upload_id: str, lease_id: str) -> None:
+    """Put an interrupted job back in the queue, without counting the attempt, if this worker still holds it."""
+    try:
+        await db.resume_requests.update_one(
+            {"upload_id": upload_id, "job.lease_id": lease_id},
+            {
+                "$set": {
+                    "status": "queued",
+                    "job.stage": "queued",
+                    "job.lease_until": None,
+                    "job.lease_id": None,
+                    "job.updated_at": datetime.now(timezone.utc),
+                },
+                "$inc": {"job.attempts": -1},
+            },
+        )
+    except Exception as e:
+        logger.warning(f"Could not release analysis job {upload_id}; it is retried once its lease lapses: {e}")
+
+
+async def _heartbeat_job_lease(upload_id: str, lease_id: str) -> None:
+    while True:
+        await asyncio.sleep(ANALYSIS_JOB_HEARTBEAT_SECONDS)
+        try:
+            result = await db.resume_requests.update_one(
+                {"upload_id": upload_id, "job.lease_id": lease_id},
+                {"$set": {"job.lease_until": datetime.now(timezone.utc) + timedelta(seconds=ANALYSIS_JOB_LEASE_SECONDS)}},
+            )
+        except Exception as e:
+            logger.warning(f"Could not extend the lease on analysis job {upload_id}: {e}")
+            continue
+        if result.matched_count == 0:
+            return
+
+
+async def _claim_analysis_job() -> Optional[Dict[str, Any]]:
+    from pymongo import ReturnDocument
+
+    now = datetime.now(timezone.utc)
+    return await db.resume_requests.find_one_and_update(
+        {
+            "$or": [
+                {"job.stage": "queued"},
+                # The worker that held this job stopped mid-pipeline (restart or crash); resume it.
+                {"job.stage": {"$in": list(JOB_ACTIVE_STAGES)}, "job.lease_until": {"$lt": now}},
+            ]
+        },
+        {
+            "$set": {
+                "status": "extracting",
+                "job.stage": "extracting",
+                "job.lease_until": now + timedelta(seconds=ANALYSIS_JOB_LEASE_SECONDS),
+                # Identifies this claim; stage writes from a worker whose lease was taken over match nothing.
+                "job.lease_id": uuid.uuid4().hex,
+                "job.updated_at": now,
+            },
+            "$inc": {"job.attempts": 1},
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _run_analysis_job(order: Dict[str, Any]) -> None:
+    upload_id = order["upload_id"]
+    job = order.get("job") or {}
+    lease_id = job["lease_id"]
+    if job.get("attempts", 1) > ANALYSIS_JOB_MAX_ATTEMPTS:
+        await _set_job_stage(upload_id, lease_id, "failed", {"status": "analysis_failed", "job.error": "Analysis did not complete."})
+        return
+
+    spool = await _r2_download_spooled(order["original_r2_key"], order.get("original_filename"), order.get("original_content_type"))
+    try:
+        text = await _extract_upload_text(spool)
+    except HTTPException as e:
+        await _set_job_stage(upload_id, lease_id, "failed", {"status": "analysis_failed", "job.error": e.detail})
+        return
+    finally:
+        spool.close()
+
+    prescore = prescore_resume(clean_resume_text(text))
+    await _set_job_stage(
+        upload_id,
+        lease_id,
+        "analyzing",
+        {"status": "analyzing", "job.preliminary": {"score": prescore["score"], "suggested_tier": prescore["suggested_tier"]}},
+    )
+    with timed_stage("analyze"):
+        # The job queue is the backpressure here, so the worker waits for an LLM slot rather than failing.
+        analysis = await _openai_analyze(text, interactive=False)
+    await _set_job_stage(
+        upload_id,
+        lease_id,
+        "stored",
+        {
+            "status": "analysis_complete",
+            "tier": analysis.get("suggested_tier"),
+            "score": analysis.get("score"),
+            "analysis": _pack_analysis(analysis),
+        },
+    )
+
+
+async def _analysis_worker(worker_id: int) -> None:
+    await services.warmed_up.wait()
+    while not services.draining.is_set():
+        try:
+            order = await _claim_analysis_job()
+        except Exception as e:
+            logger.error(f"Analysis worker {worker_id} could not claim a job: {e}")
+            order = None
+        if order is None:
+            analysis_job_wakeup.clear()
+            try:
+                await asyncio.wait_for(analysis_job_wakeup.wait(), timeout=ANALYSIS_JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        heartbeat = asyncio.create_task(_heartbeat_job_lease(order["upload_id"], order["job"]["lease_id"]))
+        try:
+            await _run_analysis_job(order)
+        except asyncio.CancelledError:
+            # Shutdown ran out of drain time; hand the job back so another worker can claim it straight away.
+            await _release_analysis_job(order["upload_id"], order["job"]["lease_id"])
+            raise
+        except JobLeaseLost:
+            logger.warning(f"Analysis job {order.get('upload_id')} was taken over by another worker; dropped its result.")
+        except Exception as e:
+            # Leave the lease in place: the job is retried once it lapses, up to ANALYSIS_JOB_MAX_ATTEMPTS.
+            logger.exception(f"Analysis job {order.get('upload_id')} failed on worker {worker_id}: {e}")
+        finally:
+            heartbeat.cancel()
+
+
+def _job_status(order: Dict[str, Any], fields: Optional[set] = None) -> Dict[str, Any]:
+    job = order.get("job") or {}
+    stage = job.get("stage") or ("stored" if order.get("analysis") else "queued")
+    payload: Dict[str, Any] = {"upload_id": order.get("upload_id"), "status": stage}
+    if job.get("error"):
+        payload["error"] = job["error"]
+    if job.get("preliminary") and stage not in JOB_TERMINAL_STAGES:
+        payload["preliminary"] = job["preliminary"]
+    if stage == "stored" and order.get("analysis"):
+        payload["result"] = _analysis_response(
+            order["upload_id"], order.get("original_filename"), _unpack_analysis(order["analysis"]), fields
+        )
+    return payload
+
+
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "500"))
+# Declared uncompressed size allowed for a zip upload; guards against archive bombs.
+BATCH_MAX_UNCOMPRESSED_BYTES = 4 * BATCH_MAX_UPLOAD_BYTES
+# Entries of any kind (folders, skipped files) a zip may list before it is refused without being read.
+BATCH_MAX_ZIP_ENTRIES = 4 * BATCH_MAX_FILES
+# Resume bytes a batch keeps in memory across all its files; the rest is spooled to disk.
+BATCH_MAX_MEMORY_BYTES = int(float(os.environ.get("BATCH_MAX_MEMORY_MB", "16")) * 1024 * 1024)
+BATCH_EXTRACT_CONCURRENCY = 2 * max(1, EXTRACT_WORKERS)
+# Short resumes share a completion; anything over BATCH_PACK_MAX_RESUME_TOKENS gets its own.
+BATCH_PACK_MAX_RESUMES = int(os.environ.get("BATCH_PACK_MAX_RESUMES", "4"))
+BATCH_PACK_MAX_RESUME_TOKENS = 1500
+BATCH_INSERT_CHUNK = 100
+BATCH_DOCUMENT_SUFFIXES = (".pdf", ".docx", ".doc", ".txt")
+
+
+def _batch_too_many_files() -> HTTPException:
+    return HTTPException(status_code=400, detail=f"A batch can hold at most {BATCH_MAX_FILES} resumes.")
+
+
+def _expand_zip_upload(spool: SpooledUpload, max_members: int, memory_budget: int) -> List[tuple]:
+    """(filename, spool, error) for each resume in a zip; folders, dotfiles and other file types are skipped.
+
+    The member count and declared sizes are checked before anything is extracted. Members share
+    memory_budget bytes of memory between them and are spooled to disk past it.
+    """
+    members = []
+    try:
+        with spool.open() as handle, zipfile.ZipFile(handle) as archive:
+            entries = archive.infolist()
+            if len(entries) > BATCH_MAX_ZIP_ENTRIES:
+                raise _batch_too_many_files()
+            infos = [
+                info
+                for info in entries
+                if not info.is_dir()
+                and "__MACOSX/" not in info.filename
+                and not info.filename.rsplit("/", 1)[-1].startswith(".")
+                and info.filename.lower().endswith(BATCH_DOCUMENT_SUFFIXES)
+            ]
+            if len(infos) > max_members:
+                raise _batch_too_many_files()
+            if sum(info.file_size for info in infos) > BATCH_MAX_UNCOMPRESSED_BYTES:
+                raise HTTPException(status_code=413, detail="The zip archive expands beyond the batch size limit.")
+            for info in infos:
+                filename = info.filename.rsplit("/", 1)[-1]
+                if info.file_size > MAX_UPLOAD_BYTES:
+                    members.append((filename, None, f"File too large. The limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."))
+                    continue
+                member = SpooledUpload(filename, None, min(UPLOAD_SPOOL_THRESHOLD_BYTES, memory_budget))
+                members.append((filename, member, None))
+                with archive.open(info) as source:
+                    while chunk := source.read(UPLOAD_CHUNK_BYTES):
+                        if member.size + len(chunk) > info.file_size:
+                            raise zipfile.BadZipFile(f"{info.filename} is larger than its declared size")
+                        member.write(chunk)
+                member.finish()
+                memory_budget -= member.memory_bytes
+    except BaseException as e:
+        for _, member, _ in members:
+            if member is not None:
+                member.close()
+        if isinstance(e, zipfile.BadZipFile):
+            raise HTTPException(status_code=400, detail=f"{spool.filename} is not a readable zip archive.")
+        raise
+    return members
+
+
+async def _collect_batch_items(files: List[UploadFile]) -> List[tuple]:
+    items: List[tuple] = []
+    memory_left = BATCH_MAX_MEMORY_BYTES
+    try:
+        for file in files:
+            filename = file.filename or "resume"
+            if filename.lower().endswith(".zip"):
+                archive = await spool_upload(file, BATCH_MAX_UPLOAD_BYTES, memory_limit=0)
+                try:
+                    members = await asyncio.to_thread(
+                        _expand_zip_upload, archive, BATCH_MAX_FILES - len(items), memory_left
+                    )
+                finally:
+                    archive.close()
+                items.extend(members)
+                memory_left -= sum(member.memory_bytes for _, member, _ in members if member is not None)
+                continue
+            if len(items) >= BATCH_MAX_FILES:
+                raise _batch_too_many_files()
+            if not filename.lower().endswith(BATCH_DOCUMENT_SUFFIXES):
+                items.append((filename, None, "Unsupported file format"))
+                continue
+            try:
+                spool = await spool_upload(file, memory_limit=min(UPLOAD_SPOOL_THRESHOLD_BYTES, memory_left))
+            except HTTPException as e:
+                items.append((filename, None, e.detail))
+                continue
+            items.append((filename, spool, None))
+            memory_left -= spool.memory_bytes
+    except BaseException:
+        for _, spool, _ in items:
+            if spool is not None:
+                spool.close()
+        raise
+    return items
+
+
+async def _insert_batch_orders(documents: List[Dict[str, Any]]) -> None:
+    try:
+        with timed_stage("mongo_insert"):
+            await db.resume_requests.insert_many(documents, ordered=False)
+    except Exception as e:
+        logger.error(f"DB insert failed for {len(documents)} batch orders: {e}")
+
+
+async def _stream_batch_analysis(
+    batch_id: str, items: List[tuple], customer: Dict[str, str], fields: Optional[set] = None
+):
+    """NDJSON lines: a header, one result per file in completion order, then a summary.
+
+    Files are extracted in parallel; short resumes that miss the cache are packed BATCH_PACK_MAX_RESUMES to
+    a completion, and orders are written with insert_many in chunks of BATCH_INSERT_CHUNK.
+    """
+    results: asyncio.Queue = asyncio.Queue()
+    extract_limiter = asyncio.Semaphore(BATCH_EXTRACT_CONCURRENCY)
+    store_originals = db is not None and bool(_r2_config())
+    uploads: Dict[int, tuple] = {}
+    tasks: List[asyncio.Task] = []
+    pack: List[tuple] = []
+
+    async def analyze_one(index: int, prepared: str, cache_key: str, prescore: Dict[str, Any]) -> None:
+        analysis = await _llm_analyze(prepared, interactive=False)
+        if analysis is None:
+            metrics.inc("resumeshortlist_analysis_results_total", source="fallback")
+            analysis = _fallback_analysis(prescore, note=LLM_UNAVAILABLE_NOTE)
+        else:
+            metrics.inc("resumeshortlist_analysis_results_total", source="llm")
+            await analysis_cache.set(cache_key, analysis)
+        await results.put((index, analysis, None))
+
+    async def analyze_pack(entries: List[tuple]) -> None:
+        # Not awaited by process(), so every entry must get a result here or the stream waits for it forever.
+        outcomes: List[Any] = [None] * len(entries)
+        try:
+            analyses = await _llm_analyze_packed([prepared for _, prepared, _, _ in entries])
+            if analyses is None:
+                # The packed answer never lined up with its inputs; fall back to one completion per resume.
+                outcomes = await asyncio.gather(*(analyze_one(*entry) for entry in entries), return_exceptions=True)
+            else:
+                metrics.inc("resumeshortlist_analysis_results_total", len(entries), source="llm")
+                for position, ((index, _, cache_key, _), analysis) in enumerate(zip(entries, analyses)):
+                    await analysis_cache.set(cache_key, analysis)
+                    await results.put((index, analysis, None))
+                    outcomes[position] = True
+        except Exception as e:
+            # Entries already answered keep their result; the rest are reported as failed.
+            outcomes = [outcome if outcome is True else e for outcome in outcomes]
+        for (index, _, _, _), outcome in zip(entries, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Batch {batch_id}: analysis of {items[index][0]} failed: {outcome}")
+                await results.put((index, None, "Could not analyze this file."))
+
+    def flush_pack() -> None:
+        if pack:
+            tasks.append(asyncio.create_task(analyze_pack(list(pack))))
+            pack.clear()
+
+    async def process(index: int, filename: str, spool: Optional[SpooledUpload], error: Optional[str]) -> None:
+        if error is not None:
+            await results.put((index, None, error))
+            return
+        try:
+            async with extract_limiter:
+                text = await _extract_upload_text(spool)
+            cleaned = clean_resume_text(text)
+            prescore = prescore_resume(cleaned)
+            if not prescore["is_resume"] or not OPENAI_API_KEY:
+                metrics.inc("resumeshortlist_analysis_results_total", source="local" if prescore["is_resume"] else "not_resume")
+                await results.put((index, _fallback_analysis(prescore), None))
+                return
+            prepared = pack_resume_sections(cleaned)
+            cache_key = _analysis_cache_key(prepared)
+            cached = await analysis_cache.get(cache_key)
+            if cached is not None:
+                metrics.inc("resumeshortlist_analysis_results_total", source="cache")
+                await results.put((index, cached, None))
+            elif BATCH_PACK_MAX_RESUMES > 1 and count_tokens(prepared) <= BATCH_PACK_MAX_RESUME_TOKENS:
+                pack.append((index, prepared, cache_key, prescore))
+                if len(pack) >= BATCH_PACK_MAX_RESUMES:
+                    flush_pack()
+            else:
+                await analyze_one(index, prepared, cache_key, prescore)
+        except HTTPException as e:
+            await results.put((index, None, e.detail))
+        except Exception as e:
+            logger.exception(f"Batch {batch_id}: analysis of {filename} failed: {e}")
+            await results.put((index, None, "Could not analyze this file."))
+
+    async def process_all() -> None:
+        await asyncio.gather(*(process(index, *item) for index, item in enumerate(items)))
+        flush_pack()
+
+    for index, (filename, spool, _) in enumerate(items):
+        if spool is not None and store_originals:
+            upload_id = str(uuid.uuid4())
+            key = _r2_original_key(spool.sha256.hexdigest(), filename)
+            uploads[index] = (upload_id, key, asyncio.create_task(_r2_store_original(key, spool)))
+    tasks.append(asyncio.create_task(process_all()))
+
+    documents: List[Dict[str, Any]] = []
+    failed = 0
+    try:
+        yield json.dumps({"batch_id": batch_id, "total": len(items)}) + "\n"
+        for _ in range(len(items)):
+            index, analysis, error = await results.get()
+            filename, spool, _ = items[index]
+            if error is not None:
+                failed += 1
+                if index in uploads:
+                    _, key, upload_task = uploads.pop(index)
+                    spawn_background(_discard_original_upload(key, upload_task, spool))
+                yield json.dumps({"index": index, "filename": filename, "status": "error", "error": error}) + "\n"
+                continue
+            upload_id, key, upload_task = uploads.get(index) or (str(uuid.uuid4()), None, None)
+            if db is not None:
+                storage_status = "failed"
+                if upload_task is not None:
+                    try:
+                        await upload_task
+                        storage_status = "stored"
+                    except Exception as e:
+                        logger.error(f"Batch {batch_id}: R2 upload for {upload_id} failed: {e}")
+                documents.append(
+                    {
+                        "upload_id": upload_id,
+                        "batch_id": batch_id,
+                        "created_at": datetime.now(timezone.utc),
+                        "status": "analysis_complete",
+                        "tier": analysis.get("suggested_tier"),
+                        "score": analysis.get("score"),
+                        "original_filename": filename,
+                        "original_content_type": spool.content_type,
+                        "original_r2_key": key if storage_status == "stored" else None,
+                        "storage": {"status": storage_status, "key": key},
+                        "customer": dict(customer),
+                        "analysis": _pack_analysis(analysis),
+                    }
+                )
+                if len(documents) >= BATCH_INSERT_CHUNK:
+                    await _insert_batch_orders(documents)
+                    documents = []
+            spool.close()
+            yield json.dumps({"index": index, "status": "ok", **_analysis_response(upload_id, filename, analysis, fields)}) + "\n"
+        if documents:
+            await _insert_batch_orders(documents)
+            documents = []
+        yield json.dumps({"batch_id": batch_id, "summary": {"total": len(items), "analyzed": len(items) - failed, "failed": failed}}) + "\n"
+    finally:
+        # Reached early only if the client went away; stop outstanding work and release the spools.
+        for task in tasks + [upload_task for _, _, upload_task in uploads.values()]:
+            task.cancel()
+        for _, spool, _ in items:
+            if spool is not None:
+                spool.close()
+        if documents:
+            spawn_background(_insert_batch_orders(documents))
+
+
+STORAGE_RECONCILE_SECONDS = float(os.environ.get("STORAGE_RECONCILE_SECONDS", "300"))
+STORAGE_PENDING_GRACE_SECONDS = 10 * 60
+# A sweep that claimed an orphaned original this long ago without finishing is taken to have died.
+ORPHAN_SWEEP_STALE_SECONDS = 60
+ORPHAN_SWEEP_POLL_SECONDS = 0.2
+
+_background_tasks: "set[asyncio.Task]" = set()
+
+
+def spawn_background(coro) -> asyncio.Task:
+    """Run a coroutine past the end of the request, keeping a reference so it is not garbage collected."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _mark_original_orphaned(key: str) -> None:
+    """Record an original that its own request will not reference, for the storage reconciler to remove.
+
+    Originals are shared by content hash, so a concurrent submission of the same bytes may already have been
+    told the object exists. Deleting it here could leave that order pointing at nothing; the sweep only
+    removes it once it has stayed unreferenced for the grace period.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    try:
+        await db.orphaned_originals.update_one(
+            {"key": key}, {"$setOnInsert": {"key": key, "created_at": datetime.now(timezone.utc)}}, upsert=True
+        )
+    except DuplicateKeyError:
+        pass
+
+
+async def _claim_original_use(key: str) -> None:
+    """Record that a submission is about to rely on an original, and wait out any sweep already removing it.
+
+    The use is written before the sweep's claim is read, and the sweep writes its claim before it reads uses,
+    so at least one side sees the other: either the sweep keeps the object, or this waits until the delete
+    is done and the existence check that follows uploads the original again.
+    """
+    await db.original_uses.update_one({"_id": key}, {"$set": {"used_at": datetime.now(timezone.utc)}}, upsert=True)
+    while True:
+        live = datetime.now(timezone.utc) - timedelta(seconds=ORPHAN_SWEEP_STALE_SECONDS)
+        if await db.orphaned_originals.find_one({"key": key, "sweeping_at": {"$gt": live}}, {"_id": 1}) is None:
+            return
+        await asyncio.sleep(ORPHAN_SWEEP_POLL_SECONDS)
+
+
+async def _finish_original_upload(upload_id: str, key: str, upload_task: asyncio.Task, spool: SpooledUpload) -> None:
+    try:
+        try:
+            written = await upload_task
+        except Exception as e:
+            logger.warning(f"R2 upload for {upload_id} failed ({e}); retrying once.")
+            written = await _r2_store_original(key, spool)
+        result = await db.resume_requests.update_one(
+            {"upload_id": upload_id, "storage.status": "pending"},
+            {"$set": {"original_r2_key": key, "storage.status": "stored", "storage.stored_at": datetime.now(timezone.utc)}},
+        )
+        if result.matched_count == 0 and written:
+            # The order insert failed, so this order will never reference the object.
+            await _mark_original_orphaned(key)
+    except Exception as e:
+        logger.error(f"R2 upload for {upload_id} failed: {e}")
+        await db.resume_requests.update_one(
+            {"upload_id": upload_id, "storage.status": "pending"},
+            {"$set": {"storage.status": "failed", "storage.error": str(e)}},
+        )
+    finally:
+        spool.close()
+
+
+async def _discard_original_upload(key: str, upload_task: asyncio.Task, spool: SpooledUpload) -> None:
+    """The request failed after storage started; wait for the upload to settle, then mark the object orphaned."""
+    try:
+        if await upload_task and db is not None:
+            await _mark_original_orphaned(key)
+    except Exception as e:
+        logger.warning(f"Could not record orphaned upload {key}: {e}")
+    finally:
+        spool.close()
+
+
+def _r2_object_exists(key: str) -> bool:
+    from botocore.exceptions import ClientError
+
+    try:
+        _r2_client().head_object(Bucket=_r2_bucket(), Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 404:
+            return False
+        raise
+
+
+async def reconcile_pending_storage() -> int:
+    """Settle orders whose background upload never reported back (e.g. the process restarted mid-upload)."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=STORAGE_PENDING_GRACE_SECONDS)
+    orders = await db.resume_requests.find(
+        {"storage.status": "pending", "created_at": {"$lt": cutoff}}, {"_id": 0, "upload_id": 1, "storage": 1}
+    ).to_list(500)
+    for order in orders:
+        key = order["storage"]["key"]
+        exists = await _r2_run(_r2_object_exists, key)
+        update = (
+            {"original_r2_key": key, "storage.status": "stored", "storage.stored_at": datetime.now(timezone.utc)}
+            if exists
+            else {"storage.status": "failed", "storage.error": "Upload never completed"}
+        )
+        await db.resume_requests.update_one({"upload_id": order["upload_id"], "storage.status": "pending"}, {"$set": update})
+        if not exists:
+            logger.error(f"Original for {order['upload_id']} never reached R2; marked storage as failed.")
+    return len(orders)
+
+
+async def sweep_orphaned_originals() -> int:
+    """Remove originals that were marked orphaned over the grace period ago and that nothing uses."""
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=STORAGE_PENDING_GRACE_SECONDS)
+    unclaimed = [{"sweeping_at": None}, {"sweeping_at": {"$lt": now - timedelta(seconds=ORPHAN_SWEEP_STALE_SECONDS)}}]
+    candidates = await db.orphaned_originals.find(
+        {"created_at": {"$lt": cutoff}, "$or": unclaimed}, {"_id": 0, "key": 1}
+    ).to_list(500)
+    removed = 0
+    for candidate in candidates:
+        key = candidate["key"]
+        # Claim the entry before looking for uses; see _claim_original_use for the other half.
+        claimed = await db.orphaned_originals.find_one_and_update(
+            {"key": key, "created_at": {"$lt": cutoff}, "$or": unclaimed},
+            {"$set": {"sweeping_at": datetime.now(timezone.utc)}},
+        )
+        if claimed is None:
+            continue
+        if await db.resume_requests.find_one({"storage.key": key}, {"_id": 1}):
+            await db.orphaned_originals.delete_one({"key": key})
+            continue
+        if await db.original_uses.find_one({"_id": key, "used_at": {"$gte": cutoff}}, {"_id": 1}):
+            # A recent submission relies on the object but has not written its order yet; look again after
+            # another grace period, by when it is either referenced or truly orphaned.
+            await db.orphaned_originals.update_one(
+                {"key": key}, {"$set": {"created_at": datetime.now(timezone.utc), "sweeping_at": None}}
+            )
+            continue
+        try:
+            await _r2_delete(key)
+        except Exception as e:
+            logger.warning(f"Could not remove orphaned original {key}: {e}")
+            await db.orphaned_originals.update_one({"key": key}, {"$set": {"sweeping_at": None}})
+            continue
+        await db.orphaned_originals.delete_one({"key": key})
+        metrics.inc("resumeshortlist_r2_dedup_total", outcome="orphan_removed")
+        removed += 1
+        # Only an order whose use predates the grace period can land here (e.g. an upload stuck for that long).
+        result = await db.resume_requests.update_many(
+            {"storage.key": key, "storage.status": "stored"},
+            {"$set": {"original_r2_key": None, "storage.status": "failed", "storage.error": "Original was removed as orphaned"}},
+        )
+        if result.modified_count:
+            logger.error(f"Orphaned original {key} was referenced by {result.modified_count} new order(s); marked storage as failed.")
+    return removed
 
-    user_msg = f"Analyze this resume:\n\n{text[:12000]}"
 
-    for attempt in range(3):
+async def _storage_reconciler(worker_id: int) -> None:
+    while not services.draining.is_set():
         try:
-            resp = openai_client.chat.completions.create(
-                model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
-                messages=[{"role": "system", "content": system_msg}, {"role": "user", "content": user_msg}],
-                temperature=0.2,
-                response_format={"type": "json_object"},
-            )
-            data = json.loads(resp.choices[0].message.content or "{}")
-            score = int(data.get("score", 60))
-            score = max(0, min(100, score))
-            bullets = data.get("bullet_recommendations") or []
-            gaps = data.get("gap_analysis") or []
-            return {
-                "score": score,
-                "summary": data.get("summary", "Analysis incomplete."),
-                "suggested_tier": (data.get("suggested_tier") or "MID").strip().upper(),
-                "bullet_recommendations": bullets[:4] if isinstance(bullets, list) else [],
-                "gap_analysis": gaps[:3] if isinstance(gaps, list) else [],
-            }
+            await asyncio.wait_for(services.draining.wait(), timeout=STORAGE_RECONCILE_SECONDS)
+            continue
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await reconcile_pending_storage()
+            await sweep_orphaned_originals()
         except Exception as e:
-            logger.error(f"OpenAI error (attempt {attempt+1}/3): {e}")
-            time.sleep(0.7 * (attempt + 1))
+            logger.error(f"Storage reconciliation failed: {e}")
 
-    return {
-        "score": 55,
-        "summary": "Automated analysis failed. Please try again in a minute.",
-        "suggested_tier": "MID",
-        "bullet_recommendations": ["Resubmit for detailed analysis.", "Ensure the file is text-readable (not scanned)."],
-        "gap_analysis": [{"category": "Error", "finding": "System could not process this file deeply."}],
-    }
 
+MONGO_SCHEMA_CHECK = os.environ.get("MONGO_SCHEMA_CHECK", "").lower() in ("1", "true", "yes")
 
-def _serialize_order(order: Dict[str, Any]) -> Dict[str, Any]:
-    if not order:
-        return {}
-    customer = order.get("customer") or {}
-    payment = order.get("payment") or {}
-    return {
-        "upload_id": order.get("upload_id"),
-        "status": order.get("status"),
-        "tier": order.get("tier"),
-        "score": order.get("score"),
-        "created_at": order.get("created_at").isoformat() if order.get("created_at") else None,
-        "original_filename": order.get("original_filename"),
-        "revised_filename": order.get("revised_filename"),
-        "original_r2_key": order.get("original_r2_key"),
-        "revised_r2_key": order.get("revised_r2_key"),
-        "customer": {
-            "name": customer.get("name"),
-            "email": customer.get("email"),
-            "phone": customer.get("phone"),
-        },
-        "payment": {
-            "session_id": payment.get("session_id"),
-            "status": payment.get("status"),
-            "paid_at": payment.get("paid_at").isoformat() if payment.get("paid_at") else None,
-        },
-    }
+# (collection, keys, options). create_index is a no-op when an identical index already exists.
+SCHEMA_INDEXES = [
+    ("resume_requests", [("upload_id", 1)], {"unique": True}),
+    ("resume_requests", [("payment.session_id", 1)], {"sparse": True}),
+    ("resume_requests", [("created_at", -1), ("upload_id", -1)], {}),
+    ("resume_requests", [("status", 1), ("created_at", -1), ("upload_id", -1)], {}),
+    ("resume_requests", [("tier", 1), ("created_at", -1), ("upload_id", -1)], {}),
+    ("analysis_cache", [("created_at", 1)], {"expireAfterSeconds": ANALYSIS_CACHE_TTL_SECONDS}),
+    ("email_jobs", [("status", 1), ("next_attempt_at", 1)], {}),
+    ("resume_requests", [("job.stage", 1), ("job.lease_until", 1)], {"sparse": True}),
+    ("resume_requests", [("storage.status", 1), ("created_at", 1)], {"sparse": True}),
+    ("rate_limits", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ("resume_requests", [("submission_key", 1), ("created_at", -1)], {"sparse": True}),
+    ("resume_requests", [("storage.key", 1)], {"sparse": True}),
+    ("idempotency_keys", [("created_at", 1)], {"expireAfterSeconds": IDEMPOTENCY_KEY_TTL_SECONDS}),
+    ("submission_leases", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ("orphaned_originals", [("key", 1)], {"unique": True}),
+    ("orphaned_originals", [("created_at", 1)], {}),
+    ("original_uses", [("used_at", 1)], {"expireAfterSeconds": 2 * STORAGE_PENDING_GRACE_SECONDS}),
+]
 
+# (description, collection, filter, sort) for every query on a request path that must stay indexed.
+HOT_QUERIES = [
+    ("order by upload_id", "resume_requests", {"upload_id": "plan-check"}, None),
+    ("order by payment session", "resume_requests", {"payment.session_id": "plan-check"}, None),
+    ("admin order list", "resume_requests", {}, ORDER_LIST_SORT),
+    ("admin order list by status", "resume_requests", {"status": "paid"}, ORDER_LIST_SORT),
+    ("admin order list by tier", "resume_requests", {"tier": "MID"}, ORDER_LIST_SORT),
+    ("email job claim", "email_jobs", {"status": "queued", "next_attempt_at": {"$lte": datetime(2000, 1, 1)}}, None),
+    ("analysis job claim", "resume_requests", {"job.stage": "queued"}, None),
+    ("pending storage sweep", "resume_requests", {"storage.status": "pending", "created_at": {"$lt": datetime(2000, 1, 1)}}, None),
+    ("orphaned original sweep", "orphaned_originals", {"created_at": {"$lt": datetime(2000, 1, 1)}}, None),
+    ("duplicate submission", "resume_requests", {"submission_key": "plan-check", "created_at": {"$gte": datetime(2000, 1, 1)}}, [("created_at", -1)]),
+]
 
-def _is_full_name(value: str) -> bool:
-    parts = [part for part in (value or "").strip().split() if part]
-    return len(parts) >= 2
 
+async def ensure_schema(strict: bool = False) -> None:
+    """Create the indexes every hot query relies on. In strict mode a failure aborts startup."""
+    for collection, keys, options in SCHEMA_INDEXES:
+        try:
+            await db[collection].create_index(keys, **options)
+        except Exception as e:
+            message = f"Index {collection} {keys} could not be created: {e}"
+            if strict:
+                raise RuntimeError(message) from e
+            logger.error(message)
 
-def _is_valid_email(value: str) -> bool:
-    if not value:
-        return False
-    value = value.strip()
-    if "@" not in value:
-        return False
-    local, _, domain = value.partition("@")
-    return bool(local) and "." in domain
 
+def _plan_stages(plan: Any) -> List[str]:
+    stages: List[str] = []
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
 
-def _smtp_config() -> Dict[str, Any]:
-    host = os.environ.get("SMTP_HOST")
-    if not host:
-        return {}
-    return {
-        "host": host,
-        "port": int(os.environ.get("SMTP_PORT", "587")),
-        "username": os.environ.get("SMTP_USER"),
-        "password": os.environ.get("SMTP_PASSWORD"),
-        "sender": os.environ.get("SMTP_FROM") or os.environ.get("SMTP_USER"),
-    }
 
+async def verify_query_plans() -> None:
+    """Explain each hot query and fail loudly if the winning plan scans the whole collection."""
+    offenders = []
+    for description, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = await cursor.explain()
+        stages = _plan_stages((explained.get("queryPlanner") or {}).get("winningPlan"))
+        logger.info(f"Query plan for {description}: {' > '.join(stages) or 'unknown'}")
+        if "COLLSCAN" in stages:
+            offenders.append(description)
+    if offenders:
+        raise RuntimeError(f"Collection scans on hot queries: {', '.join(offenders)}")
 
-def _r2_config() -> Dict[str, Any]:
-    bucket = os.environ.get("R2_BUCKET")
-    account_id = os.environ.get("R2_ACCOUNT_ID")
-    access_key = os.environ.get("R2_ACCESS_KEY_ID")
-    secret_key = os.environ.get("R2_SECRET_ACCESS_KEY")
-    if not all([bucket, account_id, access_key, secret_key]):
-        return {}
-    endpoint = os.environ.get("R2_ENDPOINT") or f"https://{account_id}.r2.cloudflarestorage.com"
+
+@api_router.get("/health")
+async def health():
+    # Reports configuration only, so a cold instance answers without building any client.
     return {
-        "bucket": bucket,
-        "endpoint": endpoint,
-        "access_key": access_key,
-        "secret_key": secret_key,
+        "ok": True,
+        "db": db is not None,
+        "openai": bool(OPENAI_API_KEY),
+        "stripe": bool(STRIPE_SECRET_KEY),
+        "warm": services.warmed_up.is_set(),
+        "draining": services.draining.is_set(),
+        "workers": services.worker_counts(),
     }
 
 
-def _r2_client():
-    config = _r2_config()
-    if not config:
-        return None
-    return boto3.client(
-        "s3",
-        endpoint_url=config["endpoint"],
-        aws_access_key_id=config["access_key"],
-        aws_secret_access_key=config["secret_key"],
-        region_name="auto",
-    )
-
-
-def _r2_key(upload_id: str, filename: str, variant: str) -> str:
-    extension = ""
-    if filename and "." in filename:
-        extension = filename.split(".")[-1].lower()
-    suffix = f".{extension}" if extension else ""
-    return f"uploads/{upload_id}/{variant}{suffix}"
+async def _extract_upload_text(spool: SpooledUpload) -> str:
+    filename = (spool.filename or "resume").lower()
+    try:
+        with timed_stage("extract"):
+            if filename.endswith(".pdf"):
+                text = await extract_document_text("pdf", spool.source)
+            elif filename.endswith(".docx") or filename.endswith(".doc"):
+                text = await extract_document_text("docx", spool.source)
+            else:
+                try:
+                    text = spool.read_bytes().decode("utf-8")
+                except Exception:
+                    raise HTTPException(status_code=400, detail="Unsupported file format")
+    except ExtractionTimeout:
+        raise HTTPException(status_code=422, detail="This file took too long to read. Please upload a simpler PDF or DOCX.")
 
+    if not (text or "").strip():
+        if filename.endswith(".pdf"):
+            raise HTTPException(
+                status_code=400,
+                detail="Could not find any text in this PDF. If it is a scan, please upload the original document or a DOCX.",
+            )
+        raise HTTPException(status_code=400, detail="Could not extract text from file")
+    return text
 
-def _r2_upload_bytes(key: str, content: bytes, content_type: str) -> None:
-    client = _r2_client()
-    config = _r2_config()
-    if not client or not config:
-        raise RuntimeError("R2 is not configured. Set R2_BUCKET, R2_ACCOUNT_ID, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY.")
-    client.put_object(Bucket=config["bucket"], Key=key, Body=content, ContentType=content_type)
 
+@api_router.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-def _r2_download_bytes(key: str) -> bytes:
-    client = _r2_client()
-    config = _r2_config()
-    if not client or not config:
-        raise RuntimeError("R2 is not configured. Set R2_BUCKET, R2_ACCOUNT_ID, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY.")
-    response = client.get_object(Bucket=config["bucket"], Key=key)
-    return response["Body"].read()
 
+@api_router.get("/admin/cache")
+async def admin_cache_stats():
+    return {"analysis_cache": analysis_cache.snapshot()}
 
-def _send_revision_email(
-    *,
-    recipient: str,
-    customer_name: str,
-    subject: str,
-    body: str,
-    attachment_name: str,
-    attachment_bytes: bytes,
-    attachment_type: str,
-) -> None:
-    config = _smtp_config()
-    if not config:
-        raise RuntimeError("SMTP is not configured. Set SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_FROM.")
 
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = config["sender"]
-    msg["To"] = recipient
-    msg.set_content(body)
-    msg.add_attachment(attachment_bytes, maintype=attachment_type.split("/")[0], subtype=attachment_type.split("/")[1], filename=attachment_name)
+async def _stored_analysis(upload_id: Optional[str]) -> Optional[tuple]:
+    """(upload_id, filename, analysis) of an order that already has its result, or None."""
+    if upload_id is None or db is None:
+        return None
+    order = await db.resume_requests.find_one(
+        {"upload_id": upload_id}, {"_id": 0, "upload_id": 1, "original_filename": 1, "analysis": 1}
+    )
+    if not order or not order.get("analysis"):
+        return None
+    return order["upload_id"], order.get("original_filename"), _unpack_analysis(order["analysis"])
 
-    context = ssl.create_default_context()
-    with smtplib.SMTP(config["host"], config["port"]) as server:
-        server.starttls(context=context)
-        if config.get("username") and config.get("password"):
-            server.login(config["username"], config["password"])
-        server.send_message(msg)
 
+async def _analyze_submission(spool: SpooledUpload, submission_key: str, name: str, email: str) -> tuple:
+    """Answer a submission from an earlier identical one if there is one, otherwise analyze it under its lease.
 
-@api_router.get("/health")
-async def health():
-    return {"ok": True, "db": db is not None, "openai": bool(openai_client), "stripe": bool(stripe.api_key)}
+    Takes ownership of `spool`. Returns (upload_id, filename, analysis).
+    """
+    projection = {"_id": 0, "upload_id": 1, "original_filename": 1, "analysis": 1}
+    earlier = await _recent_submission(submission_key, projection)
+    if earlier is not None and earlier.get("analysis"):
+        metrics.inc("resumeshortlist_duplicate_submissions_total", match="content")
+    elif not await _lease_submission(submission_key):
+        earlier = await _await_leased_submission(submission_key, projection, lambda order: bool(order.get("analysis")))
+    if earlier is not None and earlier.get("analysis"):
+        spool.close()
+        return earlier["upload_id"], earlier.get("original_filename"), _unpack_analysis(earlier["analysis"])
+    try:
+        return await _analyze_and_store(spool, submission_key, name, email)
+    finally:
+        await _release_submission(submission_key)
 
 
-@api_router.post("/analyze")
-async def analyze_resume(file: UploadFile = File(...), name: str = Form(...), email: str = Form(...)):
-    name_value = (name or "").strip()
-    email_value = (email or "").strip()
-    if not _is_full_name(name_value):
-        raise HTTPException(status_code=400, detail="Please provide your first and last name.")
-    if not _is_valid_email(email_value):
-        raise HTTPException(status_code=400, detail="Please provide a valid email address.")
+async def _analyze_and_store(spool: SpooledUpload, submission_key: str, name: str, email: str) -> tuple:
+    """Extract, analyze and store one upload, taking ownership of `spool`. Returns (upload_id, filename, analysis)."""
+    upload_id = str(uuid.uuid4())
+    original_key = _r2_original_key(spool.sha256.hexdigest(), spool.filename or "resume")
+    # The bytes are known up front, so storage runs alongside extraction and the LLM call.
+    upload_task = asyncio.create_task(_r2_store_original(original_key, spool)) if db is not None and _r2_config() else None
+    try:
+        text = await _extract_upload_text(spool)
+        with timed_stage("analyze"):
+            analysis = await _openai_analyze(text)
+    except BaseException:
+        if upload_task is not None:
+            spawn_background(_discard_original_upload(original_key, upload_task, spool))
+        else:
+            spool.close()
+        raise
 
-    content = await file.read()
-    filename = (file.filename or "resume").lower()
+    if db is None:
+        spool.close()
+        return upload_id, spool.filename, analysis
 
-    if filename.endswith(".pdf"):
-        text = extract_text_from_pdf(content)
-    elif filename.endswith(".docx") or filename.endswith(".doc"):
-        text = extract_text_from_docx(content)
+    if upload_task is None:
+        logger.error("R2 is not configured; storing the order without its original file.")
+        storage_status = "failed"
+    elif upload_task.done() and not upload_task.cancelled() and upload_task.exception() is None:
+        storage_status = "stored"
     else:
-        try:
-            text = content.decode("utf-8")
-        except Exception:
-            raise HTTPException(status_code=400, detail="Unsupported file format")
-
-    if not (text or "").strip():
-        raise HTTPException(status_code=400, detail="Could not extract text from file")
-
-    analysis = _openai_analyze(text)
-    upload_id = str(uuid.uuid4())
-
-    if db:
-        try:
-            original_key = _r2_key(upload_id, file.filename or "resume", "original")
-            _r2_upload_bytes(original_key, content, file.content_type or "application/octet-stream")
+        storage_status = "pending"
+    try:
+        with timed_stage("mongo_insert"):
             await db.resume_requests.insert_one(
                 {
                     "upload_id": upload_id,
@@ -366,31 +3785,219 @@ async def analyze_resume(file: UploadFile = File(...), name: str = Form(...), em
                     "status": "analysis_complete",
                     "tier": analysis.get("suggested_tier"),
                     "score": analysis.get("score"),
-                    "original_filename": file.filename,
-                    "original_content_type": file.content_type or "application/octet-stream",
-                    "original_r2_key": original_key,
-                    "customer": {"name": name_value, "email": email_value},
-                    "analysis": analysis,
+                    "original_filename": spool.filename,
+                    "original_content_type": spool.content_type,
+                    # Only point at the object once it is known to exist; otherwise the background
+                    # upload (or the reconciliation pass) fills this in.
+                    "original_r2_key": original_key if storage_status == "stored" else None,
+                    "storage": {"status": storage_status, "key": original_key},
+                    "submission_key": submission_key,
+                    "customer": {"name": name, "email": email},
+                    "analysis": _pack_analysis(analysis),
                 }
             )
+    except Exception as e:
+        logger.error(f"DB insert failed (resume_requests): {e}")
+
+    if storage_status == "pending":
+        spawn_background(_finish_original_upload(upload_id, original_key, upload_task, spool))
+    else:
+        spool.close()
+    return upload_id, spool.filename, analysis
+
+
+@api_router.post("/analyze")
+async def analyze_resume(
+    file: UploadFile = File(...),
+    name: str = Form(...),
+    email: str = Form(...),
+    fields: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None),
+):
+    selected = _response_fields(fields)
+    name_value, email_value = _validated_contact(name, email)
+    idempotency_id = _idempotency_id("analyze", idempotency_key, email_value)
+    # A retry of a request that already finished is answered from its order, before the upload is even read.
+    replay = await _stored_analysis(await _idempotent_upload_id(idempotency_id))
+    if replay is not None:
+        metrics.inc("resumeshortlist_duplicate_submissions_total", match="idempotency_key")
+        return _analysis_response(*replay, selected)
+    await rate_limiter.take("analyze_email", _email_subject(email_value))
+
+    with timed_stage("upload_spool"):
+        spool = await spool_upload(file)
+    submission_key = _submission_key(spool.sha256.hexdigest(), email_value)
+    leader = False
+
+    def start():
+        nonlocal leader
+        leader = True
+        return _analyze_submission(spool, submission_key, name_value, email_value)
+
+    try:
+        # Identical submissions already in flight (double clicks, impatient retries) wait for that run.
+        upload_id, filename, analysis = await analysis_flights.run(submission_key, start)
+    finally:
+        if not leader:
+            spool.close()
+    await _remember_idempotency_key(idempotency_id, upload_id)
+    return _analysis_response(upload_id, filename, analysis, selected)
+
+
+async def _queue_analysis_job(spool: SpooledUpload, submission_key: str, name: str, email: str) -> tuple:
+    """Store the original and queue its analysis, taking ownership of `spool`. Returns (upload_id, status)."""
+    projection = {"_id": 0, "upload_id": 1, "job": 1, "analysis": 1}
+    try:
+        earlier = await _recent_submission(submission_key, projection)
+        if earlier is not None:
+            metrics.inc("resumeshortlist_duplicate_submissions_total", match="content")
+        elif not await _lease_submission(submission_key):
+            earlier = await _await_leased_submission(submission_key, projection, lambda order: True)
+        if earlier is not None:
+            return earlier["upload_id"], _job_status(earlier)["status"]
+        upload_id = str(uuid.uuid4())
+        # The job's input must outlive this process, so the original is stored before the job is queued.
+        original_key = _r2_original_key(spool.sha256.hexdigest(), spool.filename or "resume")
+        try:
+            await _r2_store_original(original_key, spool)
         except Exception as e:
-            logger.error(f"DB insert failed (resume_requests): {e}")
+            logger.error(f"R2 upload failed: {e}")
+            await _release_submission(submission_key)
+            raise HTTPException(status_code=500, detail="Unable to store resume")
+    finally:
+        spool.close()
 
-    return {
-        "upload_id": upload_id,
-        "filename": file.filename,
-        "score": analysis["score"],
-        "summary": analysis["summary"],
-        "suggested_tier": analysis["suggested_tier"],
-        "bullet_recommendations": analysis["bullet_recommendations"],
-        "bullets": analysis["bullet_recommendations"],
-        "gap_analysis": analysis["gap_analysis"],
-    }
+    now = datetime.now(timezone.utc)
+    try:
+        await db.resume_requests.insert_one(
+            {
+                "upload_id": upload_id,
+                "created_at": now,
+                "status": "queued",
+                "original_filename": spool.filename,
+                "original_content_type": spool.content_type,
+                "original_r2_key": original_key,
+                "storage": {"status": "stored", "key": original_key},
+                "submission_key": submission_key,
+                "customer": {"name": name, "email": email},
+                "job": {"stage": "queued", "attempts": 0, "updated_at": now},
+            }
+        )
+    finally:
+        await _release_submission(submission_key)
+    analysis_job_wakeup.set()
+    return upload_id, "queued"
+
+
+@api_router.post("/analyze/jobs", status_code=202)
+async def create_analysis_job(
+    file: UploadFile = File(...),
+    name: str = Form(...),
+    email: str = Form(...),
+    idempotency_key: Optional[str] = Header(None),
+):
+    name_value, email_value = _validated_contact(name, email)
+    if db is None or not _r2_config():
+        raise HTTPException(status_code=503, detail="Background analysis is unavailable; use /api/analyze.")
+    idempotency_id = _idempotency_id("analyze_job", idempotency_key, email_value)
+    upload_id = await _idempotent_upload_id(idempotency_id)
+    if upload_id is not None:
+        order = await db.resume_requests.find_one({"upload_id": upload_id}, {"_id": 0, "upload_id": 1, "job": 1, "analysis": 1})
+        if order:
+            metrics.inc("resumeshortlist_duplicate_submissions_total", match="idempotency_key")
+            return {"upload_id": upload_id, "status": _job_status(order)["status"]}
+    await rate_limiter.take("analyze_email", _email_subject(email_value))
+
+    spool = await spool_upload(file)
+    submission_key = _submission_key(spool.sha256.hexdigest(), email_value)
+    leader = False
+
+    def start():
+        nonlocal leader
+        leader = True
+        return _queue_analysis_job(spool, submission_key, name_value, email_value)
+
+    try:
+        upload_id, status = await job_flights.run(submission_key, start)
+    finally:
+        if not leader:
+            spool.close()
+    await _remember_idempotency_key(idempotency_id, upload_id)
+    return {"upload_id": upload_id, "status": status}
+
+
+@api_router.get("/analyze/jobs/{upload_id}")
+async def get_analysis_job(upload_id: str, fields: Optional[str] = None):
+    selected = _response_fields(fields)
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not configured")
+    order = await db.resume_requests.find_one({"upload_id": upload_id}, {"_id": 0, "upload_id": 1, "job": 1, "analysis": 1, "original_filename": 1})
+    if not order:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(order, selected)
+
+
+@api_router.get("/analyze/jobs/{upload_id}/events")
+async def stream_analysis_job(upload_id: str, request: Request):
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not configured")
+    projection = {"_id": 0, "upload_id": 1, "job": 1, "analysis": 1, "original_filename": 1}
+    if not await db.resume_requests.find_one({"upload_id": upload_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        # Progress is read back from Mongo so any worker process can be running the job.
+        last_stage = None
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < JOB_EVENTS_MAX_SECONDS:
+            if await request.is_disconnected():
+                return
+            order = await db.resume_requests.find_one({"upload_id": upload_id}, projection)
+            status = _job_status(order or {"upload_id": upload_id})
+            if status["status"] != last_stage:
+                last_stage = status["status"]
+                last_sent = time.monotonic()
+                yield f"event: {last_stage}\ndata: {json.dumps(status)}\n\n"
+                if last_stage in JOB_TERMINAL_STAGES:
+                    return
+            elif time.monotonic() - last_sent > JOB_EVENTS_HEARTBEAT_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@api_router.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...), name: str = Form(...), email: str = Form(...), fields: Optional[str] = None
+):
+    """Score many resumes (individual files and/or zip archives) in one request, streaming NDJSON results."""
+    selected = _response_fields(fields)
+    name_value, email_value = _validated_contact(name, email)
+    items = await _collect_batch_items(files)
+    if not items:
+        raise HTTPException(status_code=400, detail="No PDF, DOCX or TXT resumes found in the upload.")
+    try:
+        await rate_limiter.take("batch_email", _email_subject(email_value), cost=len(items))
+    except RateLimited:
+        for _, spool, _ in items:
+            if spool is not None:
+                spool.close()
+        raise
+    batch_id = str(uuid.uuid4())
+    return StreamingResponse(
+        _stream_batch_analysis(batch_id, items, {"name": name_value, "email": email_value}, selected),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-ID": batch_id, "X-Accel-Buffering": "no"},
+    )
 
 
 @api_router.post("/checkout")
 async def create_checkout_session(request: CheckoutRequest, req: Request):
-    if not stripe.api_key or not str(stripe.api_key).startswith("sk_"):
+    if not STRIPE_SECRET_KEY or not STRIPE_SECRET_KEY.startswith("sk_"):
         raise HTTPException(status_code=500, detail="Stripe not configured correctly (STRIPE_SECRET_KEY must be sk_...)")
 
     name_value = (request.name or "").strip()
@@ -400,15 +4007,16 @@ async def create_checkout_session(request: CheckoutRequest, req: Request):
     if not _is_valid_email(email_value):
         raise HTTPException(status_code=400, detail="Please provide a valid email address.")
 
-    price_id = _price_id_for_key(request.price_key)
-    if not price_id or not str(price_id).startswith("price_"):
+    tier = (request.price_key or "").strip().upper()
+    price_id = STRIPE_PRICE_TABLE.get(tier)
+    if not price_id:
         raise HTTPException(status_code=400, detail=f"Missing/invalid price for tier {request.price_key}. Expected price_...")
 
     line_items = [{"price": price_id, "quantity": 1}]
 
     if request.include_interview_prep:
-        interview_price_id = _interview_price_id()
-        if not interview_price_id or not str(interview_price_id).startswith("price_"):
+        interview_price_id = STRIPE_PRICE_TABLE.get("INTERVIEW")
+        if not interview_price_id:
             raise HTTPException(status_code=400, detail="Interview prep selected but STRIPE_PRICE_INTERVIEW is missing/invalid")
         line_items.append({"price": interview_price_id, "quantity": 1})
 
@@ -416,9 +4024,25 @@ async def create_checkout_session(request: CheckoutRequest, req: Request):
     if req.headers.get("origin"):
         base_url = req.headers.get("origin")
 
-    try:
-        if db and request.upload_id:
-            await db.resume_requests.update_one(
+    create_session = services.stripe.checkout.Session.create_async(
+        mode="payment",
+        line_items=line_items,
+        success_url=f"{base_url}/dashboard?session_id={{CHECKOUT_SESSION_ID}}",
+        cancel_url=f"{base_url}/results",
+        client_reference_id=request.upload_id or "",
+        metadata={
+            "upload_id": request.upload_id or "",
+            "tier": tier,
+            "email": email_value,
+            "name": name_value,
+            "phone": request.phone or "",
+            "interview_prep": str(bool(request.include_interview_prep)),
+        },
+    )
+    steps = [create_session]
+    if db is not None and request.upload_id:
+        steps.append(
+            db.resume_requests.update_one(
                 {"upload_id": request.upload_id},
                 {
                     "$set": {
@@ -427,73 +4051,148 @@ async def create_checkout_session(request: CheckoutRequest, req: Request):
                             "email": email_value,
                             "phone": request.phone,
                         },
-                        "tier": (request.price_key or "").upper(),
+                        "tier": tier,
                         "status": "checkout_started",
                     }
                 },
             )
-        session = stripe.checkout.Session.create(
-            mode="payment",
-            line_items=line_items,
-            success_url=f"{base_url}/dashboard?session_id={{CHECKOUT_SESSION_ID}}",
-            cancel_url=f"{base_url}/results",
-            client_reference_id=request.upload_id or "",
-            metadata={
-                "upload_id": request.upload_id or "",
-                "tier": (request.price_key or "").upper(),
-                "email": email_value,
-                "name": name_value,
-                "phone": request.phone or "",
-                "interview_prep": str(bool(request.include_interview_prep)),
-            },
         )
+
+    try:
+        # Neither call depends on the other, so checkout waits for the slower one rather than both in turn.
+        with timed_stage("checkout"):
+            session, *_ = await asyncio.gather(*steps)
         return {"checkout_url": session.url}
     except Exception as e:
-        # THIS is what you need to see
         logger.exception(f"Stripe checkout failed: {e}")
         raise HTTPException(status_code=500, detail=f"Stripe checkout failed: {str(e)}")
 
 
 @api_router.post("/verify-session")
 async def verify_session(session_id: str = Form(...)):
-    if not stripe.api_key:
+    if not STRIPE_SECRET_KEY:
         raise HTTPException(status_code=500, detail="Stripe not configured")
 
+    cached = payment_status_cache.get(session_id)
+    if cached is not None:
+        return cached
+
+    # The webhook (or an earlier verification) usually got here first.
+    if db is not None:
+        order = await db.resume_requests.find_one(
+            {"payment.session_id": session_id, "payment.status": "paid"}, {"_id": 0, "payment": 1, "customer.email": 1}
+        )
+        if order:
+            result = {"status": "paid", "email": order["payment"].get("email") or (order.get("customer") or {}).get("email")}
+            payment_status_cache.set(session_id, result, PAYMENT_PAID_TTL_SECONDS)
+            return result
+
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
-        if session.payment_status == "paid":
-            if db and session.client_reference_id:
-                await db.resume_requests.update_one(
-                    {"upload_id": session.client_reference_id},
-                    {
-                        "$set": {
-                            "payment": {
-                                "session_id": session_id,
-                                "status": "paid",
-                                "paid_at": datetime.now(timezone.utc),
-                            },
-                            "status": "paid",
-                        }
-                    },
-                )
-            return {"status": "paid", "email": (session.customer_details.email if session.customer_details else None)}
-        return {"status": "unpaid"}
+        session = await services.stripe.checkout.Session.retrieve_async(session_id)
     except Exception as e:
         logger.error(f"Verify session error: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid Session: {str(e)}")
 
+    if session.payment_status != "paid":
+        result = {"status": "unpaid"}
+        payment_status_cache.set(session_id, result, PAYMENT_UNPAID_TTL_SECONDS)
+        return result
+
+    try:
+        await _record_payment(session, "verify-session")
+    except Exception as e:
+        # Stripe says paid; the webhook will still record it, so do not fail the customer's page.
+        logger.error(f"Could not record payment for session {session_id}: {e}")
+    result = {"status": "paid", "email": _session_email(session)}
+    payment_status_cache.set(session_id, result, PAYMENT_PAID_TTL_SECONDS)
+    return result
+
+
+@api_router.post("/stripe/webhook")
+async def stripe_webhook(request: Request):
+    if not STRIPE_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Stripe webhook not configured")
+
+    payload = await request.body()
+    stripe = services.stripe
+    try:
+        event = stripe.Webhook.construct_event(payload, request.headers.get("stripe-signature", ""), STRIPE_WEBHOOK_SECRET)
+    except (ValueError, stripe.SignatureVerificationError) as e:
+        logger.warning(f"Rejected Stripe webhook: {e}")
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
+
+    session = event["data"]["object"]
+    if event["type"] in STRIPE_PAID_EVENTS and session.get("payment_status") == "paid":
+        # A DB error propagates as a 500 so Stripe redelivers the event.
+        if await _record_payment(session, "webhook"):
+            logger.info(f"Payment recorded for session {session['id']}.")
+        payment_status_cache.set(session["id"], {"status": "paid", "email": _session_email(session)}, PAYMENT_PAID_TTL_SECONDS)
+    elif event["type"] == "checkout.session.async_payment_failed":
+        upload_id = session.get("client_reference_id")
+        if db is not None and upload_id:
+            await db.resume_requests.update_one(
+                {"upload_id": upload_id, "payment.status": {"$ne": "paid"}},
+                {"$set": {"payment": {"session_id": session["id"], "status": "failed"}, "status": "payment_failed"}},
+            )
+    return {"received": True}
+
 
 @api_router.get("/admin/orders")
-async def admin_orders():
-    if not db:
+async def admin_orders(
+    limit: int = ORDER_PAGE_DEFAULT,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    tier: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    if db is None:
         raise HTTPException(status_code=503, detail="Database not configured")
-    orders = await db.resume_requests.find().sort("created_at", -1).to_list(200)
-    return {"orders": [_serialize_order(order) for order in orders]}
+
+    limit = max(1, min(limit, ORDER_PAGE_MAX))
+    query: Dict[str, Any] = {}
+    if status:
+        query["status"] = status
+    if tier:
+        query["tier"] = tier.strip().upper()
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from
+        if created_to:
+            query["created_at"]["$lt"] = created_to
+    if cursor:
+        after = _decode_order_cursor(cursor)
+        # Keyset pagination over (created_at, upload_id) descending; upload_id breaks timestamp ties.
+        query = {
+            "$and": [
+                query,
+                {
+                    "$or": [
+                        {"created_at": {"$lt": after["created_at"]}},
+                        {"created_at": after["created_at"], "upload_id": {"$lt": after["upload_id"]}},
+                    ]
+                },
+            ]
+        }
+
+    orders = (
+        await db.resume_requests.find(query, ORDER_LIST_PROJECTION)
+        .sort(ORDER_LIST_SORT)
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        if orders[-1].get("created_at"):
+            next_cursor = _encode_order_cursor(orders[-1])
+    return {"orders": [_serialize_order(order) for order in orders], "next_cursor": next_cursor}
 
 
 @api_router.get("/admin/orders/{upload_id}/file")
-async def admin_download_file(upload_id: str, file_type: str = "original"):
-    if not db:
+async def admin_download_file(request: Request, upload_id: str, file_type: str = "original", redirect: Optional[bool] = None):
+    if db is None:
         raise HTTPException(status_code=503, detail="Database not configured")
 
     order = await db.resume_requests.find_one({"upload_id": upload_id})
@@ -510,33 +4209,71 @@ async def admin_download_file(upload_id: str, file_type: str = "original"):
 
     filename = order.get(name_field) or f"{upload_id}-{file_type}.pdf"
     content_type = order.get(content_field) or "application/octet-stream"
+
+    use_presigned = R2_PRESIGNED_DOWNLOADS if redirect is None else redirect
+    if use_presigned:
+        try:
+            url = await _r2_run(_r2_presigned_download_url, r2_key, filename, content_type)
+        except Exception as e:
+            logger.error(f"R2 presign failed: {e}")
+            raise HTTPException(status_code=500, detail="Unable to download file")
+        return RedirectResponse(url, status_code=307)
+
+    from botocore.exceptions import ClientError
+
+    byte_range = request.headers.get("range")
+    if_none_match = request.headers.get("if-none-match")
     try:
-        file_bytes = _r2_download_bytes(r2_key)
+        obj = await _r2_run(_r2_get_object, r2_key, byte_range, if_none_match)
+    except ClientError as e:
+        error = e.response.get("Error", {})
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status == 304 or error.get("Code") in ("304", "NotModified"):
+            return Response(status_code=304, headers={"ETag": if_none_match})
+        if status == 416 or error.get("Code") == "InvalidRange":
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable")
+        logger.error(f"R2 download failed: {e}")
+        raise HTTPException(status_code=500, detail="Unable to download file")
     except Exception as e:
         logger.error(f"R2 download failed: {e}")
         raise HTTPException(status_code=500, detail="Unable to download file")
-    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-    return Response(content=file_bytes, media_type=content_type, headers=headers)
+
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Accept-Ranges": "bytes"}
+    if obj.get("ContentLength") is not None:
+        headers["Content-Length"] = str(obj["ContentLength"])
+    if obj.get("ETag"):
+        headers["ETag"] = obj["ETag"]
+    if obj.get("LastModified"):
+        headers["Last-Modified"] = obj["LastModified"].strftime("%a, %d %b %Y %H:%M:%S GMT")
+    status_code = 200
+    if obj.get("ContentRange"):
+        headers["Content-Range"] = obj["ContentRange"]
+        status_code = 206
+    return StreamingResponse(
+        _r2_stream_body(obj["Body"]), status_code=status_code, media_type=content_type, headers=headers
+    )
 
 
 @api_router.post("/admin/orders/{upload_id}/revised")
 async def admin_upload_revision(upload_id: str, file: UploadFile = File(...)):
-    if not db:
+    if db is None:
         raise HTTPException(status_code=503, detail="Database not configured")
 
-    content = await file.read()
+    spool = await spool_upload(file)
     revised_key = _r2_key(upload_id, file.filename or "revised", "revised")
     try:
-        _r2_upload_bytes(revised_key, content, file.content_type or "application/octet-stream")
+        await _r2_upload(revised_key, spool)
     except Exception as e:
         logger.error(f"R2 upload failed: {e}")
         raise HTTPException(status_code=500, detail="Unable to upload revised resume")
+    finally:
+        spool.close()
     result = await db.resume_requests.update_one(
         {"upload_id": upload_id},
         {
             "$set": {
                 "revised_filename": file.filename,
-                "revised_content_type": file.content_type or "application/octet-stream",
+                "revised_content_type": spool.content_type,
                 "revised_r2_key": revised_key,
                 "revised_uploaded_at": datetime.now(timezone.utc),
                 "status": "revised_ready",
@@ -550,63 +4287,152 @@ async def admin_upload_revision(upload_id: str, file: UploadFile = File(...)):
 
 @api_router.post("/admin/orders/{upload_id}/send-revision")
 async def admin_send_revision(upload_id: str):
-    if not db:
+    if db is None:
         raise HTTPException(status_code=503, detail="Database not configured")
 
     order = await db.resume_requests.find_one({"upload_id": upload_id})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    _revision_delivery(order)
+    if not _smtp_config():
+        raise HTTPException(status_code=500, detail="Email send failed: SMTP is not configured")
 
-    customer = order.get("customer") or {}
-    recipient = customer.get("email")
-    if not recipient:
-        raise HTTPException(status_code=400, detail="Customer email missing")
+    queued = await enqueue_revision_email(upload_id)
+    return {"ok": True, "delivery_status": queued["status"]}
 
-    revised_key = order.get("revised_r2_key")
-    if not revised_key:
-        raise HTTPException(status_code=400, detail="Revised resume not uploaded")
 
-    customer_name = customer.get("name") or "there"
-    filename = order.get("revised_filename") or f"{upload_id}-revised.pdf"
-    content_type = order.get("revised_content_type") or "application/octet-stream"
-    try:
-        revised_file = _r2_download_bytes(revised_key)
-    except Exception as e:
-        logger.error(f"R2 download failed: {e}")
-        raise HTTPException(status_code=500, detail="Unable to download revised resume")
+# Deliveries in these states already have a job that will send the email; queueing again could send it twice.
+DELIVERY_IN_PROGRESS = ("queued", "sending")
 
-    subject = "Your revised resume is ready"
-    body = (
-        f"Hi {customer_name},\n\n"
-        "Your revised resume is attached. If you have any questions or want additional edits, reply to this email.\n\n"
-        "Best,\nResume Shortlist Team"
-    )
 
-    try:
-        _send_revision_email(
-            recipient=recipient,
-            customer_name=customer_name,
-            subject=subject,
-            body=body,
-            attachment_name=filename,
-            attachment_bytes=revised_file,
-            attachment_type=content_type,
-        )
-    except Exception as e:
-        logger.error(f"Email send failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Email send failed: {str(e)}")
+@api_router.post("/admin/orders/send-revisions")
+async def admin_send_revisions_bulk(request: BulkRevisionRequest):
+    """Queue revision emails for many orders in one batch. They become the same email jobs as single sends, so
+    an order that already has a delivery under way is skipped rather than emailed twice."""
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
 
-    await db.resume_requests.update_one(
-        {"upload_id": upload_id},
-        {"$set": {"status": "delivered", "delivered_at": datetime.now(timezone.utc)}},
-    )
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not configured")
+    if not _smtp_config():
+        raise HTTPException(status_code=500, detail="Email send failed: SMTP is not configured")
 
-    return {"ok": True}
+    upload_ids = list(dict.fromkeys(request.upload_ids))
+    projection = {"_id": 0, "upload_id": 1, "customer": 1, "revised_r2_key": 1, "delivery": 1}
+    orders = await db.resume_requests.find({"upload_id": {"$in": upload_ids}}, projection).to_list(len(upload_ids))
+    orders_by_id = {order["upload_id"]: order for order in orders}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    to_queue: List[str] = []
+    for upload_id in upload_ids:
+        order = orders_by_id.get(upload_id)
+        if not order:
+            results[upload_id] = {"upload_id": upload_id, "status": "not_found", "detail": "Order not found"}
+            continue
+        if (order.get("delivery") or {}).get("status") in DELIVERY_IN_PROGRESS:
+            results[upload_id] = {"upload_id": upload_id, "status": "skipped", "detail": "Delivery already in progress"}
+            continue
+        try:
+            _revision_delivery(order)
+        except HTTPException as e:
+            results[upload_id] = {"upload_id": upload_id, "status": "skipped", "detail": e.detail}
+            continue
+        to_queue.append(upload_id)
+
+    if to_queue:
+        now = datetime.now(timezone.utc)
+        unqueued: Dict[int, Dict[str, Any]] = {}
+        try:
+            await db.email_jobs.bulk_write(
+                [UpdateOne(**_email_job_upsert(upload_id, now), upsert=True) for upload_id in to_queue], ordered=False
+            )
+        except BulkWriteError as e:
+            unqueued = {error["index"]: error for error in e.details.get("writeErrors", [])}
+        except Exception as e:
+            logger.error(f"Could not queue {len(to_queue)} revision email(s): {e}")
+            unqueued = {index: {} for index in range(len(to_queue))}
+
+        queued_ids = []
+        for index, upload_id in enumerate(to_queue):
+            error = unqueued.get(index)
+            if error is None:
+                queued_ids.append(upload_id)
+                results[upload_id] = {"upload_id": upload_id, "status": "queued"}
+            elif error.get("code") == 11000:
+                # The upsert collided with a job that is mid-send.
+                results[upload_id] = {"upload_id": upload_id, "status": "skipped", "detail": "Delivery already in progress"}
+            else:
+                if error:
+                    logger.error(f"Could not queue revision email for {upload_id}: {error.get('errmsg')}")
+                results[upload_id] = {"upload_id": upload_id, "status": "failed", "detail": "Unable to queue email"}
+        if queued_ids:
+            await db.resume_requests.update_many({"upload_id": {"$in": queued_ids}}, _queued_delivery(now))
+            email_queue_wakeup.set()
+
+    ordered_results = [results[upload_id] for upload_id in upload_ids]
+    counts = {status: 0 for status in ("queued", "skipped", "not_found", "failed")}
+    for result in ordered_results:
+        counts[result["status"]] += 1
+    return {"results": ordered_results, **counts}
 
 
 app.include_router(api_router)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    if mongo_client:
-        mongo_client.close()
+
+@app.exception_handler(RateLimited)
+@app.exception_handler(LlmOverloaded)
+async def admission_error_handler(request: Request, exc: Exception):
+    return _admission_error_response(exc)
+
+
+async def _warm_up_services() -> None:
+    """Build the SDK clients on a worker thread once the app is serving, then release whatever waits on them."""
+    await asyncio.sleep(WARM_UP_DELAY_SECONDS)
+    try:
+        with timed_stage("warm_up"):
+            await asyncio.to_thread(services.warm_up)
+    finally:
+        services.warmed_up.set()
+
+
+async def _ensure_schema_after_warm_up() -> None:
+    await services.warmed_up.wait()
+    await ensure_schema()
+
+
+async def _start_background_services() -> None:
+    if RATE_LIMITS_ENABLED and not RATE_LIMIT_TRUSTED_PROXIES and os.environ.get("RENDER"):
+        # Render sets RENDER in every service; its load balancer is always in front of the app.
+        raise RuntimeError("Running on Render behind its proxy: set RATE_LIMIT_TRUSTED_PROXIES=1 so per-IP rate limits see clients.")
+    spawn_background(_warm_up_services())
+    if db is not None:
+        if MONGO_SCHEMA_CHECK:
+            # Strict mode has to be able to abort startup, so it builds the Mongo client up front.
+            await ensure_schema(strict=True)
+            await verify_query_plans()
+        else:
+            spawn_background(_ensure_schema_after_warm_up())
+    if db is not None and _smtp_config():
+        services.start_workers("email", EMAIL_WORKERS, _email_worker)
+    if db is not None and _r2_config():
+        services.start_workers("analysis", ANALYSIS_JOB_WORKERS, _analysis_worker)
+        services.start_workers("storage_reconciler", 1, _storage_reconciler)
+
+
+async def _stop_background_services() -> None:
+    """Drain this worker process: by now the server has stopped accepting requests and finished in-flight ones."""
+    deadline = time.monotonic() + SHUTDOWN_DRAIN_SECONDS
+    services.draining.set()
+    # Idle workers are parked on these; waking them lets them see the drain flag and exit.
+    email_queue_wakeup.set()
+    analysis_job_wakeup.set()
+    await services.drain(deadline - time.monotonic())
+    # Let in-flight background uploads settle so their orders are not left pending.
+    if _background_tasks:
+        await asyncio.wait(list(_background_tasks), timeout=max(1.0, deadline - time.monotonic()))
+    await asyncio.to_thread(smtp_pool.close_all)
+    services.close()
+    for pool in (_extract_pool, _ocr_pool):
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    _r2_executor.shutdown(wait=False)
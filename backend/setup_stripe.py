@@ -1,3 +1,5 @@
+import argparse
+import json
 import stripe
 import os
 from dotenv import load_dotenv
@@ -6,6 +8,10 @@ load_dotenv()
 
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 
+parser = argparse.ArgumentParser()
+parser.add_argument("--output", help="also write the tier -> price table as JSON (point STRIPE_PRICE_TABLE at it)")
+args = parser.parse_args()
+
 products_to_create = [
     {"name": "Entry Level Resume Rebuild", "amount": 5000, "id_key": "PRICE_ENTRY"},
     {"name": "Mid Level Resume Rebuild", "amount": 10000, "id_key": "PRICE_MID"},
@@ -16,6 +22,7 @@ products_to_create = [
 ]
 
 print("--- STRIPE SETUP ---")
+prices = {}
 for p in products_to_create:
     try:
         # Check if product exists roughly by name to avoid dupes if run multiple times
@@ -27,5 +34,11 @@ for p in products_to_create:
             product=product.id,
         )
         print(f"{p['id_key']}='{price.id}'")
+        prices[p["id_key"].replace("PRICE_", "", 1)] = price.id
     except Exception as e:
         print(f"Error creating {p['name']}: {e}")
+
+if args.output:
+    with open(args.output, "w") as f:
+        json.dump({"currency": "usd", "prices": prices}, f, indent=2, sort_keys=True)
+    print(f"Price table written to {args.output}")
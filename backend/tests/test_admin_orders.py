@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+def _page_through(orders, params, limit):
+    async def main():
+        server.db = AsyncMongoMockClient()["admin_orders_test"]
+        try:
+            await server.db.resume_requests.insert_many(orders)
+            seen, pages = [], 0
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                cursor = None
+                while True:
+                    query = {**params, "limit": limit, **({"cursor": cursor} if cursor else {})}
+                    page = (await client.get("/api/admin/orders", params=query)).json()
+                    seen += [order["upload_id"] for order in page["orders"]]
+                    pages += 1
+                    cursor = page["next_cursor"]
+                    if cursor is None:
+                        return seen, pages
+        finally:
+            server.db = None
+
+    return asyncio.run(main())
+
+
+def _orders():
+    # Batch uploads insert many orders with the same created_at, so ties are the common case.
+    shared = datetime(2026, 3, 2, 9, 30, 15, 250000, tzinfo=timezone.utc)
+    orders = [
+        {"upload_id": f"batch-{i:02d}", "created_at": shared, "status": "analysis_complete" if i % 3 else "paid"}
+        for i in range(11)
+    ]
+    orders += [
+        {"upload_id": f"single-{i}", "created_at": shared + timedelta(minutes=i - 2), "status": "paid"} for i in range(5)
+    ]
+    return orders
+
+
+def test_paging_across_tied_timestamps_skips_and_repeats_nothing():
+    orders = _orders()
+    seen, pages = _page_through(orders, {}, limit=4)
+
+    assert sorted(seen) == sorted(order["upload_id"] for order in orders)
+    assert len(seen) == len(set(seen))
+    assert pages == 4
+    expected = sorted(orders, key=lambda order: (order["created_at"], order["upload_id"]), reverse=True)
+    assert seen == [order["upload_id"] for order in expected]
+
+
+def test_paging_with_a_filter_keeps_ties_intact():
+    orders = _orders()
+    seen, _ = _page_through(orders, {"status": "paid"}, limit=2)
+
+    assert sorted(seen) == sorted(order["upload_id"] for order in orders if order["status"] == "paid")
+    assert len(seen) == len(set(seen))
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from benchmarks.corpus import generate_corpus
+
+ANALYSIS = {
+    "score": 58,
+    "summary": "Solid experience, thin on measurable results.",
+    "suggested_tier": "MID",
+    "bullet_recommendations": ["Quantify the migration project."],
+    "gap_analysis": [{"category": "Impact", "finding": "Few metrics."}],
+    "source": "llm",
+}
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    async def analyze(text, interactive=True):
+        calls.append(text)
+        return dict(ANALYSIS)
+
+    monkeypatch.setattr(server, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(server, "_llm_analyze", analyze)
+    return calls
+
+
+def _run(scenario, with_db=True):
+    async def main():
+        server.db = AsyncMongoMockClient()["analysis_cache_test"] if with_db else None
+        try:
+            await scenario()
+        finally:
+            server.db = None
+
+    asyncio.run(main())
+
+
+def test_cache_hit_skips_the_llm(monkeypatch, llm_calls):
+    monkeypatch.setattr(server, "analysis_cache", server.AnalysisCache(16, 3600))
+    text = generate_corpus(1, seed=3)[0][0]
+
+    async def scenario():
+        first = await server._openai_analyze(text)
+        # Whitespace differences normalize to the same key.
+        second = await server._openai_analyze(text.replace("\n", "\n\n"))
+        assert first == second == ANALYSIS
+        assert len(llm_calls) == 1
+        assert server.analysis_cache.stats["memory_hits"] == 1
+
+    _run(scenario)
+
+
+def test_mongo_tier_is_shared_between_processes(llm_calls):
+    async def scenario():
+        await server.AnalysisCache(16, 3600).set("key-1", ANALYSIS)
+        # A fresh in-process tier, as in another worker: the hit comes from Mongo and is then remembered.
+        other = server.AnalysisCache(16, 3600)
+        assert await other.get("key-1") == ANALYSIS
+        assert await other.get("key-1") == ANALYSIS
+        assert (other.stats["mongo_hits"], other.stats["memory_hits"]) == (1, 1)
+
+    _run(scenario)
+
+
+def test_least_recently_used_entry_is_evicted():
+    async def scenario():
+        cache = server.AnalysisCache(2, 3600)
+        await cache.set("a", ANALYSIS)
+        await cache.set("b", ANALYSIS)
+        await cache.get("a")
+        await cache.set("c", ANALYSIS)
+        assert await cache.get("b") is None
+        assert await cache.get("a") == ANALYSIS
+        assert cache.stats["evictions"] == 1
+
+    _run(scenario, with_db=False)
+
+
+def test_expired_entries_are_misses_in_both_tiers():
+    async def scenario():
+        cache = server.AnalysisCache(16, 60)
+        expired = datetime.now(timezone.utc) - timedelta(seconds=120)
+        cache._remember("memory", ANALYSIS, expired)
+        await server.db.analysis_cache.insert_one(
+            {"_id": "mongo", "analysis": server._pack_analysis(ANALYSIS), "created_at": expired}
+        )
+        assert await cache.get("memory") is None
+        assert await cache.get("mongo") is None
+        assert (cache.stats["expirations"], cache.stats["misses"]) == (1, 2)
+
+    _run(scenario)
+
+
+def test_invalid_cached_analysis_is_ignored():
+    async def scenario():
+        invalid = {**ANALYSIS, "summary": None}
+        await server.db.analysis_cache.insert_one(
+            {"_id": "key-1", "analysis": server._pack_analysis(invalid), "created_at": datetime.now(timezone.utc)}
+        )
+        assert await server.AnalysisCache(16, 3600).get("key-1") is None
+
+    _run(scenario)
@@ -0,0 +1,152 @@
+"""Analysis job leases: claiming, reclaiming abandoned jobs, heartbeats, and results from lost leases."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+ANALYSIS = {
+    "score": 55,
+    "summary": "Relevant experience; the summary is generic.",
+    "suggested_tier": "MID",
+    "bullet_recommendations": [],
+    "gap_analysis": [],
+    "source": "llm",
+}
+
+
+def _run(scenario):
+    async def main():
+        server.db = AsyncMongoMockClient()["analysis_jobs_test"]
+        try:
+            await scenario()
+        finally:
+            server.db = None
+
+    asyncio.run(main())
+
+
+async def _add_job(upload_id="job-1", **job):
+    now = datetime.now(timezone.utc)
+    await server.db.resume_requests.insert_one(
+        {
+            "upload_id": upload_id,
+            "created_at": now,
+            "status": "queued",
+            "original_r2_key": f"originals/{upload_id}.txt",
+            "original_filename": "resume.txt",
+            "job": {"stage": "queued", "attempts": 0, "updated_at": now, **job},
+        }
+    )
+
+
+def test_only_one_concurrent_claim_wins():
+    async def scenario():
+        await _add_job()
+        claims = await asyncio.gather(*(server._claim_analysis_job() for _ in range(4)))
+        won = [claim for claim in claims if claim is not None]
+        assert len(won) == 1
+        assert won[0]["job"]["attempts"] == 1
+        assert await server._claim_analysis_job() is None
+
+    _run(scenario)
+
+
+def test_expired_lease_is_reclaimed_under_a_new_lease():
+    async def scenario():
+        now = datetime.now(timezone.utc)
+        await _add_job("live", stage="analyzing", attempts=1, lease_id="a", lease_until=now + timedelta(minutes=1))
+        await _add_job("abandoned", stage="analyzing", attempts=1, lease_id="b", lease_until=now - timedelta(seconds=1))
+
+        claim = await server._claim_analysis_job()
+        assert claim["upload_id"] == "abandoned"
+        assert claim["job"]["attempts"] == 2
+        assert claim["job"]["lease_id"] not in ("a", "b")
+        assert await server._claim_analysis_job() is None
+
+    _run(scenario)
+
+
+def test_heartbeat_extends_the_lease_until_it_is_lost(monkeypatch):
+    monkeypatch.setattr(server, "ANALYSIS_JOB_HEARTBEAT_SECONDS", 0.01)
+
+    async def scenario():
+        await _add_job()
+        claim = await server._claim_analysis_job()
+        heartbeat = asyncio.create_task(server._heartbeat_job_lease("job-1", claim["job"]["lease_id"]))
+        await asyncio.sleep(0.05)
+        renewed = await server.db.resume_requests.find_one({"upload_id": "job-1"})
+        assert renewed["job"]["lease_until"] > claim["job"]["lease_until"]
+
+        await server.db.resume_requests.update_one({"upload_id": "job-1"}, {"$set": {"job.lease_id": "other-worker"}})
+        await asyncio.wait_for(heartbeat, timeout=1)
+
+    _run(scenario)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Stand-ins for R2 and the LLM; `on_analyze` runs while the analysis is in progress."""
+    hooks = {"on_analyze": None}
+
+    async def download(key, filename, content_type):
+        spool = server.SpooledUpload(filename, content_type)
+        spool.write(b"Experience\nSoftware engineer, 2019-2024")
+        spool.finish()
+        return spool
+
+    async def analyze(text, interactive=True):
+        if hooks["on_analyze"] is not None:
+            await hooks["on_analyze"]()
+        return dict(ANALYSIS)
+
+    monkeypatch.setattr(server, "_r2_download_spooled", download)
+    monkeypatch.setattr(server, "_openai_analyze", analyze)
+    return hooks
+
+
+def test_job_is_stored_by_the_lease_holder(pipeline):
+    async def scenario():
+        await _add_job()
+        await server._run_analysis_job(await server._claim_analysis_job())
+        order = await server.db.resume_requests.find_one({"upload_id": "job-1"})
+        assert order["job"]["stage"] == "stored"
+        assert order["job"]["lease_until"] is None
+        assert server._unpack_analysis(order["analysis"]) == ANALYSIS
+
+    _run(scenario)
+
+
+def test_result_from_a_lost_lease_is_dropped(pipeline):
+    async def scenario():
+        await _add_job()
+        claim = await server._claim_analysis_job()
+
+        async def taken_over():
+            # The lease lapsed and another worker claimed the job while this one was waiting on the LLM.
+            await server.db.resume_requests.update_one(
+                {"upload_id": "job-1"}, {"$set": {"job.lease_until": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+            )
+            assert (await server._claim_analysis_job())["upload_id"] == "job-1"
+
+        pipeline["on_analyze"] = taken_over
+        with pytest.raises(server.JobLeaseLost):
+            await server._run_analysis_job(claim)
+        order = await server.db.resume_requests.find_one({"upload_id": "job-1"})
+        assert "analysis" not in order
+        assert order["job"]["stage"] == "extracting"
+        assert order["job"]["lease_id"] != claim["job"]["lease_id"]
+
+    _run(scenario)
+
+
+def test_job_fails_once_its_attempts_are_used_up(pipeline):
+    async def scenario():
+        await _add_job(attempts=server.ANALYSIS_JOB_MAX_ATTEMPTS)
+        await server._run_analysis_job(await server._claim_analysis_job())
+        order = await server.db.resume_requests.find_one({"upload_id": "job-1"})
+        assert (order["status"], order["job"]["stage"]) == ("analysis_failed", "failed")
+
+    _run(scenario)
@@ -0,0 +1,118 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+import server
+from benchmarks.corpus import generate_corpus
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _upload(filename, data):
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+def _collect(files):
+    return asyncio.run(server._collect_batch_items(files))
+
+
+def _close(items):
+    for _, spool, _ in items:
+        if spool is not None:
+            spool.close()
+
+
+def test_zip_over_the_file_limit_is_refused_before_extraction(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_FILES", 3)
+    archive = _zip([(f"resume-{i}.txt", "x") for i in range(4)])
+    extracted = []
+    original_open = zipfile.ZipFile.open
+
+    def recording_open(archive, name, *args, **kwargs):
+        extracted.append(name)
+        return original_open(archive, name, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, "open", recording_open)
+
+    with pytest.raises(HTTPException) as raised:
+        _collect([_upload("resumes.zip", archive)])
+
+    assert raised.value.status_code == 400
+    assert extracted == []
+
+
+def test_zip_members_count_against_files_already_in_the_batch(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_FILES", 3)
+    archive = _zip([("a.txt", "a"), ("b.txt", "b")])
+
+    with pytest.raises(HTTPException):
+        _collect([_upload("one.txt", b"one"), _upload("two.txt", b"two"), _upload("resumes.zip", archive)])
+
+
+def test_plain_files_over_the_limit_are_refused(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_FILES", 2)
+
+    with pytest.raises(HTTPException):
+        _collect([_upload(f"resume-{i}.txt", b"text") for i in range(3)])
+
+
+def test_zip_declaring_too_much_uncompressed_data_is_refused(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_UNCOMPRESSED_BYTES", 1000)
+    archive = _zip([("a.txt", "a" * 600), ("b.txt", "b" * 600)])
+
+    with pytest.raises(HTTPException) as raised:
+        _collect([_upload("resumes.zip", archive)])
+
+    assert raised.value.status_code == 413
+
+
+def test_batch_memory_is_capped_and_the_rest_spooled_to_disk(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_MEMORY_BYTES", 250_000)
+    body = b"resume " * 15_000  # ~100 KB each, compresses to almost nothing
+    archive = _zip([(f"resume-{i}.txt", body) for i in range(10)])
+
+    items = _collect([_upload("resumes.zip", archive), _upload("extra.txt", body)])
+    try:
+        assert len(items) == 11
+        assert sum(spool.memory_bytes for _, spool, _ in items) <= 250_000
+        on_disk = [spool for _, spool, _ in items if spool.path]
+        assert len(on_disk) >= 8
+        assert all(spool.read_bytes() == body for _, spool, _ in items)
+    finally:
+        _close(items)
+
+
+def test_failing_pack_reports_each_resume_instead_of_stalling(monkeypatch):
+    async def broken_pack(texts):
+        raise RuntimeError("model answered with something unparseable")
+
+    monkeypatch.setattr(server, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(server, "db", None)
+    monkeypatch.setattr(server, "_llm_analyze_packed", broken_pack)
+    monkeypatch.setattr(server, "analysis_cache", server.AnalysisCache(0, server.ANALYSIS_CACHE_TTL_SECONDS))
+    texts = [text for text, _ in generate_corpus(3, seed=5)]
+
+    async def run():
+        items = []
+        for i, text in enumerate(texts):
+            spool = server.SpooledUpload(f"resume-{i}.txt", "text/plain")
+            spool.write(text.encode())
+            spool.finish()
+            items.append((spool.filename, spool, None))
+        stream = server._stream_batch_analysis("batch-1", items, {"name": "Sam", "email": "sam@example.com"})
+        return [json.loads(line) async for line in stream]
+
+    lines = asyncio.run(asyncio.wait_for(run(), timeout=10))
+
+    assert sorted(line["status"] for line in lines[1:-1]) == ["error"] * 3
+    assert lines[-1]["summary"] == {"total": 3, "analyzed": 0, "failed": 3}
@@ -0,0 +1,66 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+import server
+
+LIMIT = 1024
+BOUNDARY = "limit-test"
+
+
+def _multipart(size: int) -> bytes:
+    return (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="r.txt"\r\n'
+        f"Content-Type: text/plain\r\n\r\n"
+    ).encode() + b"x" * size + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def _chunked(body: bytes, chunk: int = 256):
+    for start in range(0, len(body), chunk):
+        yield body[start:start + chunk]
+
+
+def _limited_app():
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return server.BodySizeLimitMiddleware(app, max_body_bytes=LIMIT)
+
+
+def _post(app, body, chunked: bool, path: str = "/upload"):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                path,
+                content=_chunked(body) if chunked else body,
+                headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+            )
+
+    return asyncio.run(send())
+
+
+def test_body_under_limit_reaches_the_app():
+    response = _post(_limited_app(), _multipart(100), chunked=True)
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+
+def test_content_length_over_limit_is_refused_up_front():
+    response = _post(_limited_app(), _multipart(2 * LIMIT), chunked=False)
+    assert response.status_code == 413
+
+
+def test_chunked_body_over_limit_gets_413_not_a_parse_error():
+    response = _post(_limited_app(), _multipart(2 * LIMIT), chunked=True)
+    assert response.status_code == 413
+    assert "too large" in response.json()["detail"]
+
+
+def test_chunked_upload_over_the_analyze_limit_gets_413():
+    response = _post(server.app, _multipart(server.MAX_UPLOAD_BYTES + server.REQUEST_BODY_SLACK_BYTES), chunked=True, path="/api/analyze")
+    assert response.status_code == 413
@@ -0,0 +1,13 @@
+import server
+
+
+def test_standalone_years_are_kept():
+    text = "Jane Doe\nExperience\nAcme Corp\n2019\nEngineer\n2023\fJane Doe\n2012\nSchool\nMore"
+    cleaned = server.clean_resume_text(text).split("\n")
+    assert {"2019", "2023", "2012"} <= set(cleaned)
+
+
+def test_page_numbers_are_dropped_only_at_page_edges():
+    text = "Jane Doe\nSkills\n7\nPython\nPage 1 of 2\f2\nMore\n- 2 -"
+    cleaned = server.clean_resume_text(text).split("\n")
+    assert cleaned == ["Jane Doe", "Skills", "7", "Python", "More"]
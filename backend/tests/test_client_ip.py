@@ -0,0 +1,28 @@
+import logging
+
+import server
+
+
+def _scope(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return {"client": (peer, 443), "headers": headers}
+
+
+def test_trusted_proxy_hop_yields_the_client(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_TRUSTED_PROXIES", 1)
+
+    # A client-supplied entry to the left of the proxy's is ignored.
+    assert server._client_ip(_scope("10.0.0.2", "6.6.6.6, 203.0.113.7")) == "203.0.113.7"
+    assert server._client_ip(_scope("10.0.0.2", "198.51.100.4")) == "198.51.100.4"
+    assert server._client_ip(_scope("10.0.0.2")) == "10.0.0.2"
+
+
+def test_untrusted_forwarding_is_reported(monkeypatch, caplog):
+    monkeypatch.setattr(server, "RATE_LIMIT_TRUSTED_PROXIES", 0)
+    monkeypatch.setattr(server, "_untrusted_forwarding_reported", False)
+
+    with caplog.at_level(logging.ERROR, logger=server.logger.name):
+        assert server._client_ip(_scope("10.0.0.2", "203.0.113.7")) == "10.0.0.2"
+        assert server._client_ip(_scope("10.0.0.2", "203.0.113.8")) == "10.0.0.2"
+
+    assert sum("RATE_LIMIT_TRUSTED_PROXIES" in record.message for record in caplog.records) == 1
@@ -0,0 +1,170 @@
+"""Identical submissions share one analysis: SingleFlight within a process, submission leases across them."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+ANALYSIS = {
+    "score": 61,
+    "summary": "Clear progression; bullets list duties rather than results.",
+    "suggested_tier": "MID",
+    "bullet_recommendations": [],
+    "gap_analysis": [],
+    "source": "llm",
+}
+
+
+def _run(scenario):
+    async def main():
+        server.db = AsyncMongoMockClient()["coalescing_test"]
+        try:
+            await scenario()
+        finally:
+            server.db = None
+
+    asyncio.run(main())
+
+
+def test_concurrent_callers_share_one_run():
+    async def scenario():
+        flights = server.SingleFlight("test")
+        release = asyncio.Event()
+        starts = []
+
+        async def work():
+            starts.append(1)
+            await release.wait()
+            return "result"
+
+        callers = [asyncio.create_task(flights.run("key", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert len(flights) == 1
+        release.set()
+        assert await asyncio.gather(*callers) == ["result"] * 5
+        assert starts == [1]
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
+
+
+def test_a_caller_going_away_does_not_cancel_the_shared_run():
+    async def scenario():
+        flights = server.SingleFlight("test")
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "result"
+
+        leaving = asyncio.create_task(flights.run("key", work))
+        staying = asyncio.create_task(flights.run("key", work))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        release.set()
+        assert await staying == "result"
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+
+    asyncio.run(scenario())
+
+
+def test_only_one_concurrent_lease_wins():
+    async def scenario():
+        won = await asyncio.gather(*(server._lease_submission("submission") for _ in range(4)))
+        assert sorted(won) == [False, False, False, True]
+
+    _run(scenario)
+
+
+def test_expired_lease_is_taken_over():
+    async def scenario():
+        await server.db.submission_leases.insert_one(
+            {"_id": "submission", "owner": "dead-host:1", "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}
+        )
+        assert await server._lease_submission("submission") is True
+        lease = await server.db.submission_leases.find_one({"_id": "submission"})
+        assert lease["owner"] == server.PROCESS_ID
+
+    _run(scenario)
+
+
+def test_peer_waits_for_the_lease_holders_order(monkeypatch):
+    monkeypatch.setattr(server, "SUBMISSION_LEASE_POLL_SECONDS", 0.01)
+    analyzed = []
+
+    async def analyze_and_store(spool, submission_key, name, email):
+        analyzed.append(submission_key)
+        await asyncio.sleep(0.05)
+        await server.db.resume_requests.insert_one(
+            {
+                "upload_id": "order-1",
+                "created_at": datetime.now(timezone.utc),
+                "original_filename": spool.filename,
+                "submission_key": submission_key,
+                "analysis": server._pack_analysis(ANALYSIS),
+            }
+        )
+        spool.close()
+        return "order-1", spool.filename, ANALYSIS
+
+    monkeypatch.setattr(server, "_analyze_and_store", analyze_and_store)
+
+    async def scenario():
+        # Two worker processes receiving the same submission: SingleFlight cannot see across them.
+        results = await asyncio.gather(
+            *(
+                server._analyze_submission(server.SpooledUpload("cv.pdf", None), "submission", "Sam", "sam@example.com")
+                for _ in range(2)
+            )
+        )
+        assert analyzed == ["submission"]
+        assert [upload_id for upload_id, _, _ in results] == ["order-1", "order-1"]
+        assert all(analysis == ANALYSIS for _, _, analysis in results)
+        assert await server.db.submission_leases.count_documents({}) == 0
+
+    _run(scenario)
+
+
+def test_idempotency_key_replays_the_first_response(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMITS_ENABLED", False)
+    analyzed = []
+
+    async def analyze(text, interactive=True):
+        analyzed.append(text)
+        return dict(ANALYSIS)
+
+    monkeypatch.setattr(server, "_openai_analyze", analyze)
+
+    async def post(client, content, key, email="sam@example.com"):
+        response = await client.post(
+            "/api/analyze",
+            files={"file": ("resume.txt", content, "text/plain")},
+            data={"name": "Sam Lee", "email": email},
+            headers={"Idempotency-Key": key},
+        )
+        assert response.status_code == 200
+        return response.json()["upload_id"]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await post(client, b"Experience: engineer", "retry-1")
+            # A retry is answered from the first order, even if the client re-encoded the file.
+            assert await post(client, b"Experience: engineer ", "retry-1") == first
+            assert len(analyzed) == 1
+            # Keys are scoped to the customer, so another customer's identical key is a new request.
+            assert await post(client, b"Experience: engineer", "retry-1", email="kim@example.com") != first
+            assert len(analyzed) == 2
+        assert await server.db.idempotency_keys.count_documents({}) == 2
+
+    _run(scenario)
+
+
+def test_malformed_idempotency_key_is_rejected():
+    with pytest.raises(server.HTTPException) as raised:
+        server._idempotency_id("analyze", "k" * (server.IDEMPOTENCY_KEY_MAX_LENGTH + 1), "sam@example.com")
+    assert raised.value.status_code == 400
@@ -0,0 +1,175 @@
+"""The revision email queue against a local aiosmtpd server: delivery, retries and exactly-once sends."""
+import asyncio
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+        self.transient_failures = 0
+        self.delay = 0.0
+
+    async def handle_DATA(self, smtp, session, envelope):
+        await asyncio.sleep(self.delay)
+        if self.transient_failures:
+            self.transient_failures -= 1
+            return "451 4.3.0 Try again later"
+        self.sessions.add(id(session))
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    handler = RecordingHandler()
+    port = _free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(port))
+    monkeypatch.setenv("SMTP_FROM", "orders@example.com")
+    monkeypatch.setenv("SMTP_STARTTLS", "false")
+    monkeypatch.delenv("SMTP_USER", raising=False)
+    monkeypatch.delenv("SMTP_PASSWORD", raising=False)
+    monkeypatch.setattr(server, "EMAIL_RETRY_BASE_SECONDS", 0)
+
+    async def download(key):
+        return b"%PDF-1.4 revised"
+
+    monkeypatch.setattr(server, "_r2_download", download)
+    yield handler
+    server.smtp_pool.close_all()
+    controller.stop()
+
+
+def _run(scenario):
+    async def main():
+        server.db = AsyncMongoMockClient()["email_queue_test"]
+        try:
+            await scenario()
+        finally:
+            server.db = None
+
+    asyncio.run(main())
+
+
+async def _add_order(upload_id: str) -> None:
+    await server.db.resume_requests.insert_one(
+        {
+            "upload_id": upload_id,
+            "customer": {"name": "Jordan", "email": f"{upload_id}@example.com"},
+            "revised_r2_key": f"uploads/{upload_id}/revised.pdf",
+            "revised_filename": "revised.pdf",
+            "revised_content_type": "application/pdf",
+        }
+    )
+
+
+async def _work_queue() -> None:
+    """What an email worker does, until nothing is left to claim."""
+    while (job := await server._claim_email_job()) is not None:
+        await server._deliver_email_job(job)
+
+
+def test_queued_email_is_delivered_over_one_pooled_connection(smtp):
+    async def scenario():
+        for upload_id in ("order-1", "order-2", "order-3"):
+            await _add_order(upload_id)
+            assert (await server.enqueue_revision_email(upload_id))["status"] == "queued"
+        await _work_queue()
+
+        assert sorted(envelope.rcpt_tos[0] for envelope in smtp.messages) == [
+            "order-1@example.com",
+            "order-2@example.com",
+            "order-3@example.com",
+        ]
+        assert b"revised.pdf" in smtp.messages[0].content
+        assert len(smtp.sessions) == 1
+        order = await server.db.resume_requests.find_one({"upload_id": "order-1"})
+        assert order["status"] == "delivered"
+        assert order["delivery"]["status"] == "delivered"
+
+    _run(scenario)
+
+
+def test_transient_smtp_failure_is_retried(smtp):
+    smtp.transient_failures = 1
+
+    async def scenario():
+        await _add_order("order-1")
+        await server.enqueue_revision_email("order-1")
+        await _work_queue()
+
+        assert len(smtp.messages) == 1
+        job = await server.db.email_jobs.find_one({"_id": "order-1"})
+        assert job["status"] == "delivered"
+        assert job["attempts"] == 2
+
+    _run(scenario)
+
+
+def test_email_is_sent_exactly_once(smtp):
+    smtp.delay = 0.3
+
+    async def scenario():
+        await _add_order("order-1")
+        await server.enqueue_revision_email("order-1")
+        workers = [asyncio.create_task(_work_queue()) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        # Re-queueing while the job is mid-send must not start a second delivery.
+        assert (await server.enqueue_revision_email("order-1"))["status"] == "sending"
+        await asyncio.gather(*workers)
+        await _work_queue()
+
+        assert len(smtp.messages) == 1
+        job = await server.db.email_jobs.find_one({"_id": "order-1"})
+        assert (job["status"], job["attempts"]) == ("delivered", 1)
+
+    _run(scenario)
+
+
+def test_bulk_send_queues_in_one_batch_and_counts_each_outcome(smtp):
+    async def scenario():
+        for upload_id in ("ready-1", "ready-2", "in-flight", "mid-send"):
+            await _add_order(upload_id)
+        await server.db.resume_requests.insert_one({"upload_id": "no-revision", "customer": {"email": "a@example.com"}})
+        await server.db.resume_requests.update_one({"upload_id": "in-flight"}, {"$set": {"delivery": {"status": "queued"}}})
+        # A job being sent whose order has not caught up yet: the batch upsert collides with it.
+        await server.db.email_jobs.insert_one({"_id": "mid-send", "status": "sending", "attempts": 1})
+
+        response = await server.admin_send_revisions_bulk(
+            server.BulkRevisionRequest(
+                upload_ids=["ready-1", "ready-2", "in-flight", "mid-send", "no-revision", "missing", "ready-1"]
+            )
+        )
+
+        statuses = {result["upload_id"]: result["status"] for result in response["results"]}
+        assert statuses == {
+            "ready-1": "queued",
+            "ready-2": "queued",
+            "in-flight": "skipped",
+            "mid-send": "skipped",
+            "no-revision": "skipped",
+            "missing": "not_found",
+        }
+        assert (response["queued"], response["skipped"], response["not_found"], response["failed"]) == (2, 3, 1, 0)
+        assert await server.db.email_jobs.count_documents({"status": "queued"}) == 2
+        assert (await server.db.email_jobs.find_one({"_id": "mid-send"}))["status"] == "sending"
+        for upload_id in ("ready-1", "ready-2"):
+            order = await server.db.resume_requests.find_one({"upload_id": upload_id})
+            assert order["delivery"]["status"] == "queued"
+
+    _run(scenario)
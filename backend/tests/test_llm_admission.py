@@ -0,0 +1,72 @@
+import asyncio
+
+import server
+
+
+async def _hold(admission, interactive, started, release):
+    async with admission.slot(interactive):
+        started.append(interactive)
+        await release.wait()
+
+
+def test_background_callers_are_capped_to_their_share():
+    async def run():
+        admission = server.LlmAdmission(4, 64, 1.0, background_share=0.5)
+        release = asyncio.Event()
+        started = []
+        tasks = [asyncio.create_task(_hold(admission, False, started, release)) for _ in range(10)]
+        await asyncio.sleep(0)
+        assert admission.in_flight_background == admission.background_limit == 2
+        # The remaining slots go to interactive callers straight away.
+        tasks += [asyncio.create_task(_hold(admission, True, started, release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert admission.in_flight == 4
+        release.set()
+        await asyncio.gather(*tasks)
+        assert admission.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_freed_slot_goes_to_an_interactive_waiter_first():
+    async def run():
+        admission = server.LlmAdmission(2, 64, 1.0, background_share=0.5)
+        first, second = asyncio.Event(), asyncio.Event()
+        holders = [asyncio.create_task(_hold(admission, True, [], event)) for event in (first, second)]
+        await asyncio.sleep(0)
+        never = asyncio.Event()
+        background = [asyncio.create_task(_hold(admission, False, [], never)) for _ in range(3)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(_hold(admission, True, [], never))
+        await asyncio.sleep(0)
+        # The background callers have waited longer, but the one freed slot goes to the interactive caller.
+        first.set()
+        await holders[0]
+        assert not admission._waiters["interactive"]
+        assert len(admission._waiters["background"]) == 3
+        for task in background + [interactive, holders[1]]:
+            task.cancel()
+        await asyncio.gather(*background, interactive, holders[1], return_exceptions=True)
+        assert admission.in_flight == 0
+        assert not admission._waiters["background"]
+
+    asyncio.run(run())
+
+
+def test_interactive_wait_times_out_with_overloaded():
+    async def run():
+        admission = server.LlmAdmission(1, 64, 0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(admission, True, [], release))
+        await asyncio.sleep(0)
+        try:
+            async with admission.slot(True):
+                raise AssertionError("admitted past the cap")
+        except server.LlmOverloaded:
+            pass
+        assert not admission._waiters["interactive"]
+        release.set()
+        await holder
+        assert admission.in_flight == 0
+
+    asyncio.run(run())
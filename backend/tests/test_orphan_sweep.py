@@ -0,0 +1,137 @@
+"""Orphaned originals: the sweep and a submission deduplicating against the same object must not lose it."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+        self.delete_started = asyncio.Event()
+        self.release_delete = asyncio.Event()
+        self.release_delete.set()
+        self.head_started = asyncio.Event()
+        self.release_head = asyncio.Event()
+        self.release_head.set()
+
+    async def head(self, key):
+        self.head_started.set()
+        await self.release_head.wait()
+        return key in self.objects
+
+    async def upload(self, key, spool):
+        self.objects[key] = spool.read_bytes()
+
+    async def delete(self, key):
+        self.delete_started.set()
+        await self.release_delete.wait()
+        self.objects.pop(key, None)
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    bucket = FakeBucket()
+    monkeypatch.setattr(server, "_r2_upload", bucket.upload)
+    monkeypatch.setattr(server, "_r2_delete", bucket.delete)
+    monkeypatch.setattr(server, "ORPHAN_SWEEP_POLL_SECONDS", 0.01)
+
+    async def run(func, *args):
+        if func is server._r2_object_exists:
+            return await bucket.head(*args)
+        return func(*args)
+
+    monkeypatch.setattr(server, "_r2_run", run)
+    return bucket
+
+
+def _run(scenario):
+    async def main():
+        server.db = AsyncMongoMockClient()["orphan_sweep_test"]
+        try:
+            await scenario()
+        finally:
+            server.db = None
+
+    asyncio.run(main())
+
+
+def _spool(data=b"%PDF original"):
+    spool = server.SpooledUpload("resume.pdf", "application/pdf")
+    spool.write(data)
+    spool.finish()
+    return spool
+
+
+async def _orphan(key, bucket):
+    bucket.objects[key] = b"%PDF original"
+    marked_at = datetime.now(timezone.utc) - timedelta(seconds=2 * server.STORAGE_PENDING_GRACE_SECONDS)
+    await server.db.orphaned_originals.insert_one({"key": key, "created_at": marked_at})
+
+
+def test_unused_orphan_is_removed(bucket):
+    async def scenario():
+        await _orphan("originals/a.pdf", bucket)
+
+        assert await server.sweep_orphaned_originals() == 1
+        assert "originals/a.pdf" not in bucket.objects
+        assert await server.db.orphaned_originals.count_documents({}) == 0
+
+    _run(scenario)
+
+
+def test_submission_arriving_mid_delete_uploads_again(bucket):
+    async def scenario():
+        key = "originals/a.pdf"
+        await _orphan(key, bucket)
+        bucket.release_delete.clear()
+        sweep = asyncio.create_task(server.sweep_orphaned_originals())
+        await bucket.delete_started.wait()
+
+        # The object is still there, but the sweep has decided to delete it.
+        store = asyncio.create_task(server._r2_store_original(key, _spool()))
+        await asyncio.sleep(0.05)
+        assert not store.done()
+
+        bucket.release_delete.set()
+        assert await sweep == 1
+        assert await store is True
+        assert key in bucket.objects
+
+    _run(scenario)
+
+
+def test_sweep_keeps_an_original_a_submission_is_checking(bucket):
+    async def scenario():
+        key = "originals/a.pdf"
+        await _orphan(key, bucket)
+        bucket.release_head.clear()
+        store = asyncio.create_task(server._r2_store_original(key, _spool()))
+        await bucket.head_started.wait()
+
+        assert await server.sweep_orphaned_originals() == 0
+        bucket.release_head.set()
+        assert await store is False
+        assert key in bucket.objects
+        # Looked at again after another grace period, by when the submission's order references it.
+        marker = await server.db.orphaned_originals.find_one({"key": key})
+        assert marker["sweeping_at"] is None
+        assert marker["created_at"].replace(tzinfo=timezone.utc) > datetime.now(timezone.utc) - timedelta(minutes=1)
+
+    _run(scenario)
+
+
+def test_referenced_orphan_is_kept(bucket):
+    async def scenario():
+        key = "originals/a.pdf"
+        await _orphan(key, bucket)
+        await server.db.resume_requests.insert_one({"upload_id": "order-1", "storage": {"key": key, "status": "stored"}})
+
+        assert await server.sweep_orphaned_originals() == 0
+        assert key in bucket.objects
+        assert await server.db.orphaned_originals.count_documents({}) == 0
+
+    _run(scenario)
@@ -0,0 +1,127 @@
+"""Stripe payments: replayed webhooks are recorded once, and verify-session avoids repeat Stripe calls."""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import stripe
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+SECRET = "whsec_test"
+
+
+@pytest.fixture(autouse=True)
+def stripe_config(monkeypatch):
+    monkeypatch.setattr(server, "STRIPE_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(server, "STRIPE_SECRET_KEY", "sk_test")
+    monkeypatch.setattr(server, "payment_status_cache", server.TTLCache(16))
+
+
+def _event(event_id, event_type, payment_status="paid"):
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": event_type,
+        "data": {
+            "object": {
+                "id": "cs_1",
+                "object": "checkout.session",
+                "client_reference_id": "order-1",
+                "payment_status": payment_status,
+                "customer_details": {"email": "sam@example.com"},
+                "amount_total": 4900,
+                "currency": "usd",
+            }
+        },
+    }
+
+
+def _signed(event):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return payload, {"stripe-signature": f"t={timestamp},v1={signature}", "content-type": "application/json"}
+
+
+async def _deliver(client, event):
+    payload, headers = _signed(event)
+    return await client.post("/api/stripe/webhook", content=payload, headers=headers)
+
+
+def _run(scenario):
+    async def main():
+        server.db = AsyncMongoMockClient()["payments_test"]
+        await server.db.resume_requests.insert_one({"upload_id": "order-1", "status": "analysis_complete"})
+        try:
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await scenario(client)
+        finally:
+            server.db = None
+
+    asyncio.run(main())
+
+
+def test_replayed_webhook_is_recorded_once():
+    async def scenario(client):
+        event = _event("evt_1", "checkout.session.completed")
+        assert (await _deliver(client, event)).status_code == 200
+        first = await server.db.resume_requests.find_one({"upload_id": "order-1"})
+
+        # Stripe redelivers, and the async-success event for the same session follows.
+        assert (await _deliver(client, event)).status_code == 200
+        assert (await _deliver(client, _event("evt_2", "checkout.session.async_payment_succeeded"))).status_code == 200
+
+        order = await server.db.resume_requests.find_one({"upload_id": "order-1"})
+        assert order["payment"] == first["payment"]
+        assert (order["status"], order["payment"]["recorded_by"]) == ("paid", "webhook")
+
+    _run(scenario)
+
+
+def test_late_failure_event_does_not_undo_a_payment():
+    async def scenario(client):
+        await _deliver(client, _event("evt_1", "checkout.session.completed"))
+        await _deliver(client, _event("evt_2", "checkout.session.async_payment_failed", payment_status="unpaid"))
+
+        order = await server.db.resume_requests.find_one({"upload_id": "order-1"})
+        assert (order["status"], order["payment"]["status"]) == ("paid", "paid")
+
+    _run(scenario)
+
+
+def test_forged_webhook_is_rejected():
+    async def scenario(client):
+        payload, headers = _signed(_event("evt_1", "checkout.session.completed"))
+        response = await client.post("/api/stripe/webhook", content=payload.replace("4900", "1"), headers=headers)
+        assert response.status_code == 400
+        assert "payment" not in await server.db.resume_requests.find_one({"upload_id": "order-1"})
+
+    _run(scenario)
+
+
+def test_verify_session_asks_stripe_once(monkeypatch):
+    retrieved = []
+
+    async def retrieve_async(session_id):
+        retrieved.append(session_id)
+        return stripe.checkout.Session.construct_from(_event("evt_1", "checkout.session.completed")["data"]["object"], "sk_test")
+
+    fake_stripe = SimpleNamespace(checkout=SimpleNamespace(Session=SimpleNamespace(retrieve_async=retrieve_async)))
+    monkeypatch.setattr(type(server.services), "stripe", property(lambda self: fake_stripe))
+
+    async def scenario(client):
+        for _ in range(3):
+            response = await client.post("/api/verify-session", data={"session_id": "cs_1"})
+            assert response.json() == {"status": "paid", "email": "sam@example.com"}
+        assert retrieved == ["cs_1"]
+        order = await server.db.resume_requests.find_one({"upload_id": "order-1"})
+        assert order["payment"]["recorded_by"] == "verify-session"
+
+    _run(scenario)
@@ -0,0 +1,61 @@
+"""The local pre-score stands in for the LLM, so it must land in the range the LLM is asked to use."""
+import statistics
+
+import server
+from benchmarks.corpus import generate_corpus
+
+STRONG = """Alex Morgan
+alex.morgan@example.com | (415) 555-0142
+
+Summary
+Engineering manager with a record of scaling platform teams and cutting infrastructure cost.
+
+Experience
+Acme Cloud, Engineering Manager, 2016-2024
+- Led a team of 12 engineers to rebuild the billing platform, cutting invoice errors by 38%
+- Reduced cloud spend by $1.2M a year by consolidating 40 services onto shared clusters
+- Delivered the payments API migration 3 weeks early with zero customer-facing downtime
+- Hired and mentored 9 engineers, 4 of whom were promoted to senior roles within 2 years
+Globex, Senior Software Engineer, 2011-2016
+- Built a streaming pipeline that processed 2 billion events a day with 99.95% availability
+- Owned the on-call rotation and cut median incident resolution time from 3 hours to 40 minutes
+
+Education
+B.S. Computer Science, State University, 2011
+
+Skills
+Python, Go, Kubernetes, PostgreSQL, AWS, distributed systems, hiring, roadmap planning
+"""
+
+WEAK = """Jamie Doe
+
+Experience
+Store Associate
+- Responsible for helping with various tasks that were assigned to me by the manager and also the register sometimes
+- Duties included stocking shelves and cleaning and making sure everything looked nice for all of the customers
+- Was involved in training new people sometimes when the manager asked me to do it and also worked on weekends
+- Helped out with inventory counts at the end of the month along with the other people who worked there at the time
+
+Education
+High school diploma
+"""
+
+
+def _score(text):
+    prescore = server.prescore_resume(server.clean_resume_text(text))
+    assert prescore["is_resume"]
+    return server._fallback_analysis(prescore, note=server.LLM_UNAVAILABLE_NOTE)["score"]
+
+
+def test_strong_resume_scores_at_the_top_of_the_llm_range():
+    assert 60 <= _score(STRONG) <= 70
+
+
+def test_weak_resume_scores_well_below_typical():
+    assert 10 <= _score(WEAK) <= 35
+
+
+def test_typical_resumes_fall_in_the_llm_band():
+    scores = [_score(text) for text, _ in generate_corpus(200, seed=11)]
+    assert 45 <= statistics.median(scores) <= 65
+    assert max(scores) <= 70
@@ -5,10 +5,59 @@ import { Card, CardContent } from "./ui/card";
 import { cn } from "../lib/utils";
 import axios from "axios";
 
+const backendUrl = process.env.REACT_APP_BACKEND_URL;
+
+const STAGE_MESSAGES = {
+  queued: "Queued for analysis...",
+  extracting: "Extracting text from your resume...",
+  analyzing: "Scoring impact metrics and structure...",
+};
+
+// Resolves with the finished analysis once the background job reports "stored".
+// onProgress receives each status payload (stage, plus the local preliminary score once extraction is done).
+const waitForAnalysisJob = (uploadId, onProgress) =>
+  new Promise((resolve, reject) => {
+    const events = new EventSource(`${backendUrl}/api/analyze/jobs/${uploadId}/events`);
+    const handle = (event) => {
+      const payload = JSON.parse(event.data);
+      onProgress(payload);
+      if (payload.status === "stored") {
+        events.close();
+        resolve(payload.result);
+      } else if (payload.status === "failed") {
+        events.close();
+        reject(new Error(payload.error || "Analysis failed."));
+      }
+    };
+    ["queued", "extracting", "analyzing", "stored", "failed"].forEach((name) => events.addEventListener(name, handle));
+    events.onerror = () => {
+      // The stream dropped (proxy timeout, network blip); fall back to polling.
+      events.close();
+      const poll = async () => {
+        try {
+          const { data } = await axios.get(`${backendUrl}/api/analyze/jobs/${uploadId}`);
+          onProgress(data);
+          if (data.status === "stored") {
+            resolve(data.result);
+          } else if (data.status === "failed") {
+            reject(new Error(data.error || "Analysis failed."));
+          } else {
+            setTimeout(poll, 1500);
+          }
+        } catch (err) {
+          reject(err);
+        }
+      };
+      poll();
+    };
+  });
+
 const FileUpload = ({ onAnalysisComplete, applicantName, applicantEmail }) => {
   const [isDragging, setIsDragging] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
   const [error, setError] = useState(null);
+  const [stage, setStage] = useState(null);
+  const [preliminary, setPreliminary] = useState(null);
   const trimmedName = applicantName?.trim() || "";
   const trimmedEmail = applicantEmail?.trim() || "";
 
@@ -80,17 +129,40 @@ const FileUpload = ({ onAnalysisComplete, applicantName, applicantEmail }) => {
     formData.append("email", trimmedEmail);
 
     try {
-      const response = await axios.post(`${process.env.REACT_APP_BACKEND_URL}/api/analyze`, formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data'
+      let result;
+      try {
+        const job = await axios.post(`${backendUrl}/api/analyze/jobs`, formData, {
+          headers: {
+            'Content-Type': 'multipart/form-data'
+          }
+        });
+        setStage(job.data.status);
+        result = await waitForAnalysisJob(job.data.upload_id, (payload) => {
+          setStage(payload.status);
+          if (payload.preliminary) {
+            setPreliminary(payload.preliminary);
+          }
+        });
+      } catch (err) {
+        if (err.response?.status !== 503) {
+          throw err;
         }
-      });
-      onAnalysisComplete(response.data);
+        // Background jobs are unavailable on this deployment; analyze inline instead.
+        const response = await axios.post(`${backendUrl}/api/analyze`, formData, {
+          headers: {
+            'Content-Type': 'multipart/form-data'
+          }
+        });
+        result = response.data;
+      }
+      onAnalysisComplete(result);
     } catch (err) {
       console.error(err);
-      setError("Analysis failed. Please try again.");
+      setError(err.response?.data?.detail || err.message || "Analysis failed. Please try again.");
     } finally {
       setIsUploading(false);
+      setStage(null);
+      setPreliminary(null);
     }
   };
 
@@ -120,7 +192,14 @@ const FileUpload = ({ onAnalysisComplete, applicantName, applicantEmail }) => {
             <Loader2 className="h-10 w-10 text-primary animate-spin" />
             <div className="space-y-1">
               <p className="font-medium text-lg">Analyzing your resume...</p>
-              <p className="text-sm text-muted-foreground">Extracting impact metrics and structural data.</p>
+              <p className="text-sm text-muted-foreground">
+                {STAGE_MESSAGES[stage] || "Extracting impact metrics and structural data."}
+              </p>
+              {preliminary && (
+                <p className="text-sm font-medium text-foreground">
+                  Preliminary ATS score: {preliminary.score}/100
+                </p>
+              )}
             </div>
           </div>
         ) : (
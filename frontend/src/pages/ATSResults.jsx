@@ -159,7 +159,7 @@ const ATSResults = () => {
       }
   };
 
-  const { score, summary, bullets, gap_analysis, suggested_tier } = analysis;
+  const { score, summary, bullet_recommendations: bullets = [], gap_analysis, suggested_tier } = analysis;
   
   // Determine color based on score
   const scoreColor = score > 80 ? "text-green-600" : score > 60 ? "text-amber-500" : "text-destructive";
@@ -7,10 +7,13 @@ import { FileText, Loader2, UploadCloud, Mail, RefreshCw } from "lucide-react";
 
 const AdminDashboard = () => {
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [uploadingId, setUploadingId] = useState(null);
   const [sendingId, setSendingId] = useState(null);
+  const [sendingAll, setSendingAll] = useState(false);
 
   const backendUrl = process.env.REACT_APP_BACKEND_URL;
 
@@ -20,6 +23,7 @@ const AdminDashboard = () => {
     try {
       const response = await axios.get(`${backendUrl}/api/admin/orders`);
       setOrders(response.data.orders || []);
+      setNextCursor(response.data.next_cursor || null);
     } catch (e) {
       console.error(e);
       setError(e.response?.data?.detail || "Failed to load admin orders.");
@@ -28,6 +32,23 @@ const AdminDashboard = () => {
     }
   };
 
+  const fetchMoreOrders = async () => {
+    if (!nextCursor) {
+      return;
+    }
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${backendUrl}/api/admin/orders`, { params: { cursor: nextCursor } });
+      setOrders((current) => [...current, ...(response.data.orders || [])]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (e) {
+      console.error(e);
+      alert(e.response?.data?.detail || "Failed to load more orders.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchOrders();
   }, []);
@@ -70,6 +91,39 @@ const AdminDashboard = () => {
     }
   };
 
+  // Orders whose email is already queued or being sent are left to that delivery.
+  const readyToSend = orders.filter(
+    (order) =>
+      order.revised_filename &&
+      order.status !== "delivered" &&
+      !["queued", "sending"].includes(order.delivery?.status)
+  );
+
+  const handleSendAllRevisions = async () => {
+    if (readyToSend.length === 0) {
+      return;
+    }
+    setSendingAll(true);
+    try {
+      const response = await axios.post(`${backendUrl}/api/admin/orders/send-revisions`, {
+        upload_ids: readyToSend.map((order) => order.upload_id),
+      });
+      const { queued, skipped, not_found: notFound, failed } = response.data;
+      if (skipped + notFound + failed > 0) {
+        alert(
+          `Queued ${queued} revision(s); ${skipped} skipped, ${notFound} not found, ${failed} could not be queued. ` +
+            "See the order badges for details."
+        );
+      }
+      await fetchOrders();
+    } catch (e) {
+      console.error(e);
+      alert(e.response?.data?.detail || "Failed to send revision emails.");
+    } finally {
+      setSendingAll(false);
+    }
+  };
+
   return (
     <div className="container py-12">
       <div className="flex flex-col md:flex-row md:items-center md:justify-between gap-4 mb-8">
@@ -77,9 +131,19 @@ const AdminDashboard = () => {
           <h1 className="text-3xl font-serif font-bold">Admin Dashboard</h1>
           <p className="text-muted-foreground">Download, revise, and deliver resumes in one place.</p>
         </div>
-        <Button variant="outline" className="gap-2" onClick={fetchOrders} disabled={loading}>
-          <RefreshCw className="h-4 w-4" /> Refresh
-        </Button>
+        <div className="flex flex-wrap gap-2">
+          <Button
+            className="gap-2"
+            onClick={handleSendAllRevisions}
+            disabled={loading || sendingAll || readyToSend.length === 0}
+          >
+            {sendingAll ? <Loader2 className="h-4 w-4 animate-spin" /> : <Mail className="h-4 w-4" />}
+            Email All Ready ({readyToSend.length})
+          </Button>
+          <Button variant="outline" className="gap-2" onClick={fetchOrders} disabled={loading}>
+            <RefreshCw className="h-4 w-4" /> Refresh
+          </Button>
+        </div>
       </div>
 
       <div className="grid gap-6">
@@ -102,6 +166,11 @@ const AdminDashboard = () => {
                           <div className="font-bold">{order.customer?.name || "Unknown Client"}</div>
                           {order.tier && <Badge variant="secondary">{order.tier}</Badge>}
                           {order.status && <Badge>{order.status.replace("_", " ")}</Badge>}
+                          {order.delivery?.status && order.delivery.status !== "delivered" && (
+                            <Badge variant={order.delivery.status === "failed" ? "destructive" : "outline"}>
+                              email {order.delivery.status}
+                            </Badge>
+                          )}
                         </div>
                         <div className="text-sm text-muted-foreground">
                           {order.customer?.email || "No email provided"} · {order.customer?.phone || "No phone"}
@@ -171,6 +240,12 @@ const AdminDashboard = () => {
                   </div>
                 ))}
                 {orders.length === 0 && <div className="text-muted-foreground">No orders yet.</div>}
+                {nextCursor && (
+                  <Button variant="outline" className="w-full gap-2" onClick={fetchMoreOrders} disabled={loadingMore}>
+                    {loadingMore && <Loader2 className="h-4 w-4 animate-spin" />}
+                    Load more
+                  </Button>
+                )}
               </div>
             )}
           </CardContent>